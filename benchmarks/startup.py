@@ -0,0 +1,103 @@
+"""Startup benchmark for the hot CLI commands.
+
+Runs ``tk toggle`` and ``tk info`` against a throwaway home directory with
+``python -X importtime`` and fails when a command imports a module that
+belongs on the slow path or its median wall time exceeds the budget.
+
+    python benchmarks/startup.py --runs 20 --budget-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# modules the toggle/info fast path must not import
+SLOW_PATH_MODULES = (
+    "argparse",
+    "concurrent.futures",
+    "numpy",
+    "sqlite3",
+    "tempfile",
+    "timekeeper.engines",
+    "timekeeper.services",
+)
+COMMANDS = (["toggle", "bench", "dev"], ["info", "bench"])
+RUNNER = "from timekeeper.cli import main; main()"
+
+
+def prepare_home(home: str) -> dict:
+    env = dict(os.environ, HOME=home)
+    setup = (
+        "from timekeeper.adapters import FileVault, ProjectRegistry\n"
+        "from timekeeper.config import vault_path\n"
+        "from timekeeper.entities import Project, Role\n"
+        "FileVault(vault_path()).save(Project('bench', [Role('dev', 1)]))\n"
+        "ProjectRegistry()\n"
+    )
+    subprocess.run([sys.executable, "-c", setup], env=env, check=True)
+    return env
+
+
+def imported_modules(stderr: str) -> dict:
+    """Module name to cumulative import microseconds from -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure(command: list, env: dict, runs: int) -> tuple:
+    wall_times, modules = [], {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", RUNNER, *command],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        wall_times.append((time.perf_counter() - started) * 1000)
+        modules = imported_modules(process.stderr)
+    return statistics.median(wall_times), modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as home:
+        env = prepare_home(home)
+        for command in COMMANDS:
+            median_ms, modules = measure(command, env, args.runs)
+            cli_ms = modules.get("timekeeper.cli", 0) / 1000
+            print(
+                f"tk {' '.join(command):<18} median {median_ms:7.1f} ms"
+                f"  timekeeper imports {cli_ms:6.1f} ms  modules {len(modules)}"
+            )
+            slow = [name for name in SLOW_PATH_MODULES if name in modules]
+            if slow:
+                failures.append(f"tk {command[0]} imports {', '.join(slow)}")
+            if median_ms > args.budget_ms:
+                failures.append(
+                    f"tk {command[0]} took {median_ms:.1f} ms,"
+                    f" budget {args.budget_ms:.1f} ms"
+                )
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
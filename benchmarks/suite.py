@@ -0,0 +1,185 @@
+"""Synthetic-load benchmarks for the vault, registry and summary hot paths.
+
+Builds throwaway vaults of ``--projects`` projects with ``--roles`` roles
+and every entry count of ``--sizes``, then times registry lookups, vault
+loads and snapshots, toggling, ``Project.last_time_entry`` and summaries
+against the default JournalVault backend. Every case reports throughput,
+latency percentiles and peak traced memory. Run it as a module from the
+repository root so ``timekeeper`` imports without being installed:
+
+    python -m benchmarks.suite --sizes 100,1000,10000 --save-baseline base.json
+    python -m benchmarks.suite --sizes 100,1000,10000 --baseline base.json
+
+With ``--baseline`` the run fails when a case's median latency or peak
+memory grows more than ``--tolerance`` over the saved numbers.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from timekeeper.adapters import JournalVault, ProjectRegistry
+from timekeeper.config import vault_path
+from timekeeper.entities import Project, Role, TimeEntry
+from timekeeper.use_cases import SummarizeTime, ToggleTrackingInteractor
+
+PERCENTILES = (50, 90, 99)
+# latency growth below this is timer noise, whatever the tolerance says
+NOISE_FLOOR_MS = 0.05
+
+
+def synthetic_project(name: str, roles: int, entries: int) -> Project:
+    """A project with one closed hour-long entry per role-cycle step."""
+    role_names = [f"role-{index}" for index in range(roles)]
+    started = datetime(2020, 1, 1, 9)
+    time_entries = []
+    for index in range(entries):
+        start = started + timedelta(hours=2 * index)
+        time_entries.append(
+            TimeEntry(
+                role_names[index % roles],
+                str(start),
+                str(start + timedelta(hours=1)),
+            )
+        )
+    return Project(
+        name=name,
+        roles=[Role(role_name, 100) for role_name in role_names],
+        time_entries=time_entries,
+    )
+
+
+def build_vault(home: str, projects: int, roles: int, entries: int) -> list:
+    """Write the synthetic projects into the default vault under ``home``."""
+    os.environ["HOME"] = home
+    vault = JournalVault(vault_path())
+    names = [f"project-{index}" for index in range(projects)]
+    for name in names:
+        vault.save(synthetic_project(name, roles, entries))
+    return names
+
+
+def percentile(samples: list, percent: int) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    rank = max(1, -(-percent * len(samples) // 100))
+    return samples[rank - 1]
+
+
+def measure(operation, runs: int) -> dict:
+    """Latency percentiles, throughput and peak memory of ``operation``."""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            started = time.perf_counter()
+            operation()
+            samples.append((time.perf_counter() - started) * 1000)
+
+        # traced separately, tracemalloc slows the timed runs down
+        tracemalloc.start()
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    samples.sort()
+    result = {f"p{percent}_ms": percentile(samples, percent) for percent in PERCENTILES}
+    result["ops_per_s"] = 1000 / result["p50_ms"] if result["p50_ms"] else 0.0
+    result["peak_kb"] = peak / 1024
+    return result
+
+
+def cases(names: list) -> dict:
+    """Benchmark name to a zero-argument operation on the built vault."""
+    registry = ProjectRegistry()
+    vault = JournalVault(vault_path())
+    project = vault.load(names[0])
+    role_name = project.roles[-1].name
+    # toggles append to their own project's journal, not the loaded one's
+    toggled = vault.load(names[-1])
+    lookups = iter(names * 1000)
+
+    def toggle():
+        ToggleTrackingInteractor().execute(toggled, role_name)
+        vault.save(toggled)
+
+    return {
+        "registry.lookup": lambda: registry.get_project_vault_path(next(lookups)),
+        "vault.load": lambda: vault.load(names[0]),
+        "vault.snapshot": lambda: vault.snapshot(project),
+        "toggle": toggle,
+        "project.last_time_entry": lambda: project.last_time_entry(role_name),
+        "summarize.weekly": lambda: SummarizeTime().execute("weekly", project),
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    failures = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = base["p50_ms"] * (1 + tolerance)
+        if result["p50_ms"] > max(limit, base["p50_ms"] + NOISE_FLOOR_MS):
+            failures.append(
+                f"{key} median {result['p50_ms']:.3f} ms,"
+                f" baseline {base['p50_ms']:.3f} ms"
+            )
+        if result["peak_kb"] > base["peak_kb"] * (1 + tolerance) + 1:
+            failures.append(
+                f"{key} peak {result['peak_kb']:.1f} KiB,"
+                f" baseline {base['peak_kb']:.1f} KiB"
+            )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--roles", type=int, default=3)
+    parser.add_argument("--sizes", type=str, default="100,1000,10000")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--baseline", type=str, help="Fail on regressions vs this.")
+    parser.add_argument("--save-baseline", type=str, help="Write results here.")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = {}
+    home = os.environ.get("HOME", "")
+    try:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            with tempfile.TemporaryDirectory() as temp_home:
+                names = build_vault(temp_home, args.projects, args.roles, size)
+                for name, operation in cases(names).items():
+                    key = f"{name}/{size}"
+                    results[key] = result = measure(operation, args.runs)
+                    print(
+                        f"{key:<30} p50 {result['p50_ms']:9.3f} ms"
+                        f"  p90 {result['p90_ms']:9.3f} ms"
+                        f"  p99 {result['p99_ms']:9.3f} ms"
+                        f"  {result['ops_per_s']:10.1f} ops/s"
+                        f"  peak {result['peak_kb']:9.1f} KiB"
+                    )
+    finally:
+        os.environ["HOME"] = home
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            failures = regressions(results, json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
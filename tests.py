@@ -1,17 +1,60 @@
+import asyncio
+import io
 import json
 import os
 import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
 import unittest
-from datetime import datetime
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
 from unittest.mock import call, patch
 
-from timekeeper.adapters import FileVault
-from timekeeper.entities import Project, Role, TimeEntry
+from timekeeper import client, daemon, instrumentation
+from timekeeper.adapters import (
+    ArchiveStore,
+    BinaryVault,
+    FileVault,
+    JournalVault,
+    ProjectRegistry,
+    RollupStore,
+    SegmentedVault,
+    SqliteProjectRegistry,
+    SqliteVault,
+    SyncStore,
+    convert_registry,
+    iter_json_members,
+    open_registry,
+    open_vault,
+    write_json_atomically,
+)
+from timekeeper.aio import AsyncFileVault, AsyncProjectRegistry
+from timekeeper.cli import CommandLineInterface
+from timekeeper.engines import NumpySummaryEngine, ParallelSummaryEngine, np
+from timekeeper.entities import CompactTimeEntries, Project, Role, TimeEntry
+from timekeeper.errors import (
+    DaemonCommandError,
+    ProjectNotFoundError,
+    RoleNotFoundError,
+)
+from timekeeper.periods import from_day, get_period, is_period, to_day
+from timekeeper.services import ProjectWorkflowService
 from timekeeper.use_cases import (
+    CompactProject,
+    ExpandArchive,
+    ImportTimeEntries,
     InitializeProject,
+    MigrateVault,
     StartTracking,
     StopTracking,
+    SummarizeEarnings,
+    SummarizeProjects,
     SummarizeTime,
+    SyncVaults,
+    ToggleTrackingInteractor,
 )
 
 
@@ -69,12 +112,863 @@ class ProjectFileStorageTests(unittest.TestCase):
         self.assertEqual(project, storage.load(project))
 
 
+class StreamingLoaderTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = "test_store"
+        self.project = Project(
+            name="timekeeper",
+            roles=[Role(name="el jefe", hourly_rate=100), Role("intern", 12345)],
+            time_entries=[
+                TimeEntry(
+                    "el jefe", f"2023-01-0{day} 12:00:00", f"2023-01-0{day} 13:00:00"
+                )
+                for day in range(1, 10)
+            ],
+        )
+        self.project.time_entries.append(TimeEntry("intern", "2023-01-10 12:00:00"))
+
+    def tearDown(self):
+        destroy_storage(self.storage_dir)
+
+    def test_iter_json_members(self):
+        document = json.dumps(
+            {"name": "x", "numbers": [1, 22, 333, 4444], "empty": [], "n": 12345},
+            indent=4,
+        )
+        for chunk_size in (1, 3, 7, 1 << 16):
+            self.assertEqual(
+                list(iter_json_members(io.StringIO(document), chunk_size)),
+                [
+                    ("name", "x"),
+                    ("numbers", 1),
+                    ("numbers", 22),
+                    ("numbers", 333),
+                    ("numbers", 4444),
+                    ("n", 12345),
+                ],
+            )
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_members(io.StringIO('{"a": [1, 2'), 3))
+
+    def test_file_vault_stream(self):
+        storage = FileVault(self.storage_dir)
+        storage.save(self.project)
+        stream = storage.stream("timekeeper")
+        self.assertEqual(stream.name, "timekeeper")
+        self.assertEqual(stream.roles, self.project.roles)
+        self.assertEqual(list(stream.time_entries), self.project.time_entries)
+
+        storage.save(Project(name="empty"))
+        self.assertEqual(list(storage.stream("empty").time_entries), [])
+        with self.assertRaises(ProjectNotFoundError):
+            storage.stream("missing")
+
+        opened = []
+
+        def spy(*args):
+            opened.append(io.open(*args))
+            return opened[-1]
+
+        with patch("builtins.open", spy):
+            storage.stream("timekeeper")
+            time_entries = storage.stream("timekeeper").time_entries
+            next(time_entries)
+            del time_entries
+        self.assertEqual(len(opened), 3)
+        self.assertTrue(all(f.closed for f in opened))
+
+    def test_journal_vault_stream(self):
+        vault = JournalVault(self.storage_dir)
+        vault.save(self.project)
+        self.project.end_time_entry("intern")
+        self.project.start_time_entry("el jefe")
+        vault.save(self.project)
+        stream = JournalVault(self.storage_dir).stream("timekeeper")
+        self.assertEqual(list(stream.time_entries), self.project.time_entries)
+
+    def test_last_time_entry_reads_the_tail(self):
+        vault = JournalVault(self.storage_dir)
+        vault.tail_block = 16
+        self.project.roles.append(Role("x {]}", 1))
+        self.project.time_entries.append(TimeEntry("x {]}", "2023-01-11 12:00:00"))
+        vault.save(self.project)
+        with patch.object(FileVault, "stream") as stream:
+            self.assertEqual(
+                vault.last_time_entry("timekeeper"), self.project.last_time_entry()
+            )
+            self.project.end_time_entry("x {]}")
+            self.project.start_time_entry("intern")
+            vault.save(self.project)
+            self.assertEqual(
+                JournalVault(self.storage_dir).last_time_entry("timekeeper"),
+                self.project.last_time_entry(),
+            )
+        stream.assert_not_called()
+
+        # time entries that aren't the last member are streamed
+        project_dict = json.loads(json.dumps(asdict(self.project)))
+        project_dict["name"] = project_dict.pop("name")
+        with open(FileVault(self.storage_dir).path("timekeeper"), "w") as f:
+            json.dump(project_dict, f)
+        self.assertEqual(
+            FileVault(self.storage_dir).last_time_entry("timekeeper"),
+            self.project.last_time_entry(),
+        )
+        FileVault(self.storage_dir).save(Project(name="empty"))
+        self.assertIsNone(FileVault(self.storage_dir).last_time_entry("empty"))
+
+    def test_sqlite_vault_stream(self):
+        with SqliteVault(self.storage_dir) as vault:
+            vault.save(self.project)
+            stream = vault.stream("timekeeper")
+            self.assertEqual(stream.roles, self.project.roles)
+            self.assertEqual(list(stream.time_entries), self.project.time_entries)
+
+    def test_summarize_stream(self):
+        FileVault(self.storage_dir).save(self.project)
+        stream = FileVault(self.storage_dir).stream("timekeeper")
+        rollups = RollupStore(self.storage_dir)
+        self.assertEqual(
+            SummarizeTime(rollups=rollups).summarize("weekly", stream),
+            SummarizeTime().summarize("weekly", self.project),
+        )
+
+
+class JournalVaultTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = "test_store"
+        self.project = Project(
+            name="timekeeper",
+            roles=[Role(name="el jefe", hourly_rate=100)],
+            time_entries=[
+                TimeEntry(
+                    role_name="el jefe",
+                    start_time="2023-01-01 12:00:00",
+                    end_time="2023-01-01 13:00:00",
+                )
+            ],
+        )
+        JournalVault(self.storage_dir).save(self.project)
+
+    def tearDown(self):
+        destroy_storage(self.storage_dir)
+
+    def journal_lines(self, vault):
+        with open(vault.journal_path("timekeeper"), "r") as f:
+            return [json.loads(line) for line in f]
+
+    def test_toggle_appends_events(self):
+        vault = JournalVault(self.storage_dir)
+        project = vault.load("timekeeper")
+        project.start_time_entry("el jefe")
+        vault.save(project)
+        project.end_time_entry("el jefe")
+        vault.save(project)
+
+        start, stop = self.journal_lines(vault)
+        self.assertEqual(start["op"], "start")
+        self.assertEqual(stop["op"], "stop")
+        self.assertEqual(stop["start_time"], start["start_time"])
+
+        # the snapshot is untouched, the journal is replayed on load
+        self.assertEqual(
+            len(FileVault(self.storage_dir).load("timekeeper").time_entries), 1
+        )
+        reloaded = JournalVault(self.storage_dir).load("timekeeper")
+        self.assertEqual(reloaded, project)
+
+    def test_snapshot_after_threshold(self):
+        vault = JournalVault(self.storage_dir)
+        vault.snapshot_every = 2
+        project = vault.load("timekeeper")
+        project.start_time_entry("el jefe")
+        project.end_time_entry("el jefe")
+        vault.save(project)
+        project.start_time_entry("el jefe")
+        vault.save(project)
+
+        self.assertFalse(os.path.exists(vault.journal_path("timekeeper")))
+        self.assertEqual(FileVault(self.storage_dir).load("timekeeper"), project)
+
+    def test_role_change_rewrites_snapshot(self):
+        vault = JournalVault(self.storage_dir)
+        project = vault.load("timekeeper")
+        project.start_time_entry("el jefe")
+        vault.save(project)
+        project.add_role(Role(name="intern", hourly_rate=10))
+        vault.save(project)
+
+        self.assertFalse(os.path.exists(vault.journal_path("timekeeper")))
+        self.assertEqual(FileVault(self.storage_dir).load("timekeeper"), project)
+
+    def test_replay_is_idempotent(self):
+        vault = JournalVault(self.storage_dir)
+        project = vault.load("timekeeper")
+        project.start_time_entry("el jefe")
+        vault.save(project)
+        # a snapshot written without truncating the journal
+        FileVault(self.storage_dir).save(project)
+
+        self.assertEqual(JournalVault(self.storage_dir).load("timekeeper"), project)
+
+
+class SegmentedVaultTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = "test_store"
+        self.project = Project(
+            name="timekeeper",
+            roles=[Role(name="el jefe", hourly_rate=100)],
+            time_entries=[
+                TimeEntry(
+                    role_name="el jefe",
+                    start_time=f"2023-{month:02}-{day:02} 12:00:00",
+                    end_time=f"2023-{month:02}-{day:02} 13:00:00",
+                )
+                for month in (1, 2, 3)
+                for day in (1, 15)
+            ],
+        )
+        self.vault = SegmentedVault(self.storage_dir)
+        self.vault.save(self.project)
+
+    def tearDown(self):
+        destroy_storage(self.storage_dir)
+
+    def test_save_and_load(self):
+        self.assertEqual(
+            sorted(os.listdir(self.vault.segments_path("timekeeper"))),
+            ["2023-01.json", "2023-02.json", "2023-03.json", "manifest.json"],
+        )
+        self.assertEqual(self.vault.load("timekeeper"), self.project)
+        self.assertEqual(
+            self.vault.last_time_entry("timekeeper"), self.project.time_entries[-1]
+        )
+        compact = SegmentedVault(self.storage_dir, compact=True).load("timekeeper")
+        self.assertIsInstance(compact.time_entries, CompactTimeEntries)
+        self.assertEqual(compact, self.project)
+        self.assertIsInstance(
+            open_vault(self.storage_dir, "timekeeper"), SegmentedVault
+        )
+
+    def test_save_rewrites_changed_segments_only(self):
+        january = self.vault.segment_path("timekeeper", "2023-01")
+        march = self.vault.segment_path("timekeeper", "2023-03")
+        os.utime(january, (0, 0))
+        os.utime(march, (0, 0))
+
+        self.project.start_time_entry("el jefe")
+        self.project.time_entries[-1].start_time = "2023-03-20 12:00:00"
+        self.vault.save(self.project)
+
+        self.assertEqual(os.stat(january).st_mtime, 0)
+        self.assertNotEqual(os.stat(march).st_mtime, 0)
+        self.assertEqual(
+            self.vault.load_manifest("timekeeper")["2023-03"]["entries"], 3
+        )
+        self.assertTrue(self.vault.load("timekeeper").last_time_entry().is_open())
+
+    def test_toggles_touch_their_month_only(self):
+        project = self.vault.load("timekeeper")
+        project.time_entries.append(
+            TimeEntry(role_name="el jefe", start_time="2023-03-20 12:00:00")
+        )
+        opened = []
+        read_segment = self.vault._read_segment
+
+        def spy(project_name, month):
+            opened.append(month)
+            return read_segment(project_name, month)
+
+        with (
+            patch.object(self.vault, "_read_segment", spy),
+            patch(
+                "timekeeper.adapters.write_json_atomically", wraps=write_json_atomically
+            ) as write,
+        ):
+            self.vault.save(project)
+            project.time_entries[-1].end_time = "2023-03-20 14:00:00"
+            self.vault.save(project)
+
+        self.assertEqual(opened, ["2023-03", "2023-03"])
+        written = {os.path.basename(c.args[0]) for c in write.call_args_list}
+        self.assertEqual(written, {"2023-03.json", "manifest.json"})
+        self.assertEqual(self.vault.load("timekeeper"), project)
+        self.assertEqual(
+            self.vault.load_manifest("timekeeper")["2023-03"]["last"],
+            "2023-03-20 12:00:00",
+        )
+
+    def test_stream_opens_overlapping_segments(self):
+        opened = []
+        read_segment = self.vault._read_segment
+
+        def spy(project_name, month):
+            opened.append(month)
+            return read_segment(project_name, month)
+
+        with patch.object(self.vault, "_read_segment", spy):
+            project = self.vault.stream("timekeeper", "2023-01-10", "2023-02-15")
+            start_times = [te.start_time for te in project.time_entries]
+
+        self.assertEqual(opened, ["2023-01", "2023-02"])
+        self.assertEqual(start_times, ["2023-01-15 12:00:00", "2023-02-01 12:00:00"])
+
+    def test_stream_matches_other_vaults_with_mixed_spellings(self):
+        self.project.time_entries[1].start_time = "2023-01-15T12:00:00"
+        self.project.time_entries[2].start_time = "2023-02-01T11:00:00"
+        self.vault.rewrite(self.project)
+        FileVault("test_store/plain").save(self.project)
+        for since, until in [
+            ("2023-01-15", "2023-02-01"),
+            ("2023-02-01", ""),
+            ("", "2023-01-16"),
+            ("2023-01-15 13:00", ""),
+            ("", "2023-01-15 13:00"),
+        ]:
+            self.assertEqual(
+                list(self.vault.stream("timekeeper", since, until).time_entries),
+                list(
+                    FileVault("test_store/plain")
+                    .stream("timekeeper", since, until)
+                    .time_entries
+                ),
+            )
+
+    @patch("builtins.print")
+    def test_summarize_range(self, mock_print):
+        SummarizeTime().execute(
+            "monthly", self.vault.load("timekeeper"), since="2023-02-01"
+        )
+        mock_print.assert_has_calls(
+            [
+                call('monthly summary for "timekeeper"'),
+                call("\n2023-02-01 (February):"),
+                call("  el jefe: 2.00"),
+                call("\n2023-03-01 (March):"),
+                call("  el jefe: 2.00"),
+            ]
+        )
+        self.assertEqual(mock_print.call_count, 5)
+
+
+class BinaryVaultTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = "test_store"
+        self.project = Project(
+            name="timekeeper",
+            roles=[Role(name="el jefe", hourly_rate=100)],
+            time_entries=[
+                TimeEntry(
+                    role_name="el jefe",
+                    start_time="2023-01-01 12:00:00",
+                    end_time="2023-01-01 13:00:00.250000",
+                ),
+                TimeEntry(
+                    role_name="intern",
+                    start_time="2023-01-02T09:00:00",
+                    end_time="2023-01-02 10:00:00",
+                ),
+                TimeEntry(role_name="el jefe", start_time="2023-01-03 12:00:00"),
+            ],
+        )
+        self.vault = BinaryVault(self.storage_dir)
+        self.vault.save(self.project)
+
+    def tearDown(self):
+        destroy_storage(self.storage_dir)
+
+    def test_save_and_load(self):
+        self.assertEqual(
+            os.path.getsize(self.vault.entries_path("timekeeper")),
+            8 + len(self.read_header()) + 3 * BinaryVault.record_struct.size,
+        )
+        self.assertEqual(self.vault.load("timekeeper"), self.project)
+        compact = BinaryVault(self.storage_dir, compact=True).load("timekeeper")
+        self.assertIsInstance(compact.time_entries, CompactTimeEntries)
+        self.assertEqual(compact, self.project)
+        self.assertIsInstance(open_vault(self.storage_dir, "timekeeper"), BinaryVault)
+
+    @patch("builtins.print")
+    def test_toggles_patch_records_in_place(self, mock_print):
+        entries_path = self.vault.entries_path("timekeeper")
+        vault = BinaryVault(self.storage_dir)
+        project = vault.load("timekeeper")
+        inode, size = os.stat(entries_path).st_ino, os.path.getsize(entries_path)
+
+        ToggleTrackingInteractor().execute(project, "el jefe")
+        vault.save(project)
+        ToggleTrackingInteractor().execute(project, "el jefe")
+        vault.save(project)
+        self.assertEqual(os.stat(entries_path).st_ino, inode)
+        self.assertEqual(
+            os.path.getsize(entries_path), size + BinaryVault.record_struct.size
+        )
+        self.assertEqual(BinaryVault(self.storage_dir).load("timekeeper"), project)
+
+        # an edited closed entry is only written by rewrite
+        project.time_entries[0].end_time = "2023-01-01 12:30:00"
+        vault.rewrite(project)
+        self.assertNotEqual(os.stat(entries_path).st_ino, inode)
+        self.assertEqual(BinaryVault(self.storage_dir).load("timekeeper"), project)
+
+    def read_header(self):
+        with open(self.vault.entries_path("timekeeper"), "rb") as f:
+            magic, size = BinaryVault.header_struct.unpack(f.read(8))
+            self.assertEqual(magic, b"TKB1")
+            return f.read(size)
+
+    def test_stream_and_last_time_entry(self):
+        project = self.vault.stream("timekeeper", since="2023-01-02")
+        self.assertEqual(list(project.time_entries), self.project.time_entries[1:])
+        self.assertEqual(
+            self.vault.last_time_entry("timekeeper"), self.project.time_entries[-1]
+        )
+
+        self.vault.save(Project(name="empty", roles=[]))
+        self.assertIsNone(self.vault.last_time_entry("empty"))
+        self.assertEqual(self.vault.load("empty").time_entries, [])
+
+
+class SqliteVaultTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = "test_store"
+        self.vault = SqliteVault(self.storage_dir)
+        self.project = Project(
+            name="timekeeper",
+            roles=[Role(name="el jefe", hourly_rate=100)],
+            time_entries=[
+                TimeEntry("el jefe", "2023-01-01 12:00:00", "2023-01-01 13:00:00"),
+                TimeEntry("el jefe", "2023-02-01 12:00:00"),
+            ],
+        )
+        self.vault.save(self.project)
+
+    def tearDown(self):
+        self.vault.close()
+        destroy_storage(self.storage_dir)
+
+    def test_save_and_load(self):
+        self.assertTrue(self.vault.exists("timekeeper"))
+        self.assertFalse(self.vault.exists("missing"))
+        self.assertEqual(self.vault.load("timekeeper"), self.project)
+        self.assertEqual(self.vault.list_projects(), ["timekeeper"])
+        with self.assertRaises(ProjectNotFoundError):
+            self.vault.load("missing")
+
+    def test_incremental_save(self):
+        self.project.time_entries[1].end_time = "2023-02-01 13:00:00"
+        self.project.time_entries.append(TimeEntry("intern", "2023-02-02 09:00:00"))
+        self.project.add_role(Role(name="intern", hourly_rate=10))
+        self.vault.save(self.project)
+        self.assertEqual(self.vault.load("timekeeper"), self.project)
+
+        del self.project.time_entries[-1]
+        self.vault.save(self.project)
+        self.assertEqual(self.vault.load("timekeeper"), self.project)
+
+        self.project.time_entries[0].end_time = "2023-01-01 14:00:00"
+        self.vault.rewrite(self.project)
+        self.assertEqual(self.vault.load("timekeeper"), self.project)
+
+    def test_partial_loads(self):
+        self.assertEqual(
+            self.vault.load_open_entries("timekeeper"), self.project.time_entries[1:]
+        )
+        self.assertEqual(
+            self.vault.load_entries("timekeeper", since="2023-01-15"),
+            self.project.time_entries[1:],
+        )
+        self.assertEqual(
+            self.vault.load_entries("timekeeper", until="2023-01-15"),
+            self.project.time_entries[:1],
+        )
+        self.assertEqual(self.vault.load_entries("timekeeper", role_name="intern"), [])
+
+    def test_open_vault(self):
+        FileVault(self.storage_dir).save(Project(name="json-project"))
+        self.assertIsInstance(open_vault(self.storage_dir, "timekeeper"), SqliteVault)
+        self.assertIsInstance(
+            open_vault(self.storage_dir, "json-project"), JournalVault
+        )
+
+    @patch("builtins.print")
+    def test_migrate(self, mock_print):
+        source = FileVault("test_source")
+        source.save(Project(name="json-project", roles=[Role("dev", 1)]))
+        stats = MigrateVault(source, self.vault).execute(["json-project"])
+        self.assertEqual(stats, {"projects": 1, "entries": 0})
+        destroy_storage("test_source")
+        self.assertEqual(
+            self.vault.load("json-project"),
+            Project(name="json-project", roles=[Role("dev", 1)]),
+        )
+
+
+class ProjectRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = os.path.abspath("test_store")
+        patcher = patch("timekeeper.adapters.vault_path", return_value=self.storage_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        FileVault(self.storage_dir).save(Project(name="indexed"))
+
+    def tearDown(self):
+        destroy_storage(self.storage_dir)
+
+    def test_index_is_cached_until_file_changes(self):
+        registry = ProjectRegistry()
+        self.assertIs(registry._load_index(), ProjectRegistry()._load_index())
+        self.assertTrue(registry.exists("indexed"))
+
+        with open(registry.lookup_file, "w") as f:
+            json.dump({"projects": {"other": "/vault/other.json"}}, f)
+        self.assertFalse(registry.exists("indexed"))
+        self.assertEqual(registry.get_project_vault_path("other"), "/vault")
+
+    def test_update_index(self):
+        registry = ProjectRegistry()
+        registry.update_index("/vault", "new")
+        self.assertEqual(sorted(ProjectRegistry().list_projects()), ["indexed", "new"])
+        self.assertEqual(
+            sorted(os.listdir(self.storage_dir)), ["indexed.json", "lookup.json"]
+        )
+
+    @patch("builtins.print")
+    def test_running_timers_follow_toggles(self, mock_print):
+        for registry_class in (ProjectRegistry, SqliteProjectRegistry):
+            registry = registry_class()
+            vault = FileVault(self.storage_dir)
+            project = Project(name="indexed", roles=[Role("dev", 1), Role("qa", 1)])
+            index = registry.lookup_file
+            index_signature = os.stat(index).st_mtime_ns
+
+            def toggle(role_name):
+                ToggleTrackingInteractor().execute(project, role_name)
+                vault.save(project)
+                registry.update_running(project)
+
+            toggle("dev")
+            toggle("qa")
+            started = project.last_time_entry("dev").start_time
+            self.assertEqual(
+                registry_class().running_timers()["indexed"]["dev"], started
+            )
+
+            toggle("qa")
+            self.assertEqual(registry.running_timers(), {"indexed": {"dev": started}})
+            if registry_class is ProjectRegistry:
+                # toggles leave the index and its scan records alone
+                self.assertEqual(os.stat(index).st_mtime_ns, index_signature)
+
+            # a table out of step with the projects is rebuilt from them
+            registry._save_running({"gone": {"dev": started}})
+            self.assertEqual(registry.rebuild_running(), {"indexed": {"dev": started}})
+            self.assertEqual(registry.running_timers(), {"indexed": {"dev": started}})
+
+            toggle("dev")
+            self.assertEqual(registry.running_timers(), {})
+            vault.save(Project(name="indexed"))
+            if registry_class is SqliteProjectRegistry:
+                registry.close()
+
+    def test_rebuild_scans_every_known_vault(self):
+        custom = f"{self.storage_dir}/custom"
+        FileVault(custom).save(Project(name="my.project"))
+        registry = ProjectRegistry()
+        registry.update_index(custom, "my.project")
+        os.remove(registry.lookup_file)
+
+        # a lost index only knows the default vault again
+        registry = ProjectRegistry()
+        self.assertEqual(registry.list_projects(), ["indexed"])
+        registry.update_index(custom, "my.project")
+        FileVault(custom).save(Project(name="added"))
+
+        stats = registry.rebuild_index()
+        self.assertEqual(stats["vaults"], 2)
+        self.assertEqual(
+            sorted(registry.list_projects()), ["added", "indexed", "my.project"]
+        )
+        self.assertEqual(registry.get_project_vault_path("my.project"), custom)
+
+        with patch("os.scandir", wraps=os.scandir) as scandir:
+            stats = registry.rebuild_index()
+        self.assertEqual(stats["rescanned"], 1)
+        self.assertEqual(
+            [call.args[0] for call in scandir.call_args_list], [self.storage_dir]
+        )
+
+        os.remove(f"{custom}/added.json")
+        registry.rebuild_index()
+        self.assertNotIn("added", registry.list_projects())
+
+    def test_rebuild_keeps_unreachable_vaults(self):
+        registry = ProjectRegistry()
+        registry.update_index("/unmounted/vault", "remote")
+        stats = registry.rebuild_index()
+        self.assertEqual(stats["unreachable"], 1)
+        self.assertEqual(registry.get_project_vault_path("remote"), "/unmounted/vault")
+
+    def test_sqlite_registry(self):
+        registry = convert_registry("sqlite")
+        self.addCleanup(registry.close)
+        self.assertIsInstance(open_registry(), SqliteProjectRegistry)
+        registry.update_index("/vault", "new")
+        self.assertTrue(registry.exists("new"))
+        self.assertEqual(registry.get_project_vault_path("new"), "/vault")
+        self.assertEqual(
+            registry.get_index()["projects"]["indexed"],
+            f"{self.storage_dir}/indexed.json",
+        )
+        with self.assertRaises(ProjectNotFoundError):
+            registry.get_project_vault_path("missing")
+
+        registry = convert_registry("json")
+        self.assertIsInstance(open_registry(), ProjectRegistry)
+        self.assertEqual(sorted(registry.list_projects()), ["indexed", "new"])
+
+
+class AsyncAdapterTests(unittest.TestCase):
+    def setUp(self):
+        self.storage_dir = os.path.abspath("test_store")
+        patcher = patch("timekeeper.adapters.vault_path", return_value=self.storage_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.projects = [
+            Project(
+                name=f"project-{index}",
+                roles=[Role(name="dev", hourly_rate=1)],
+                time_entries=[TimeEntry("dev", "2023-01-01 12:00:00")],
+            )
+            for index in range(6)
+        ]
+
+    def tearDown(self):
+        destroy_storage(self.storage_dir)
+
+    def test_file_vault(self):
+        async def round_trip():
+            async with AsyncFileVault(f"{self.storage_dir}/a") as vault:
+                self.assertFalse(await vault.exists("project-0"))
+                await asyncio.gather(*(vault.save(p) for p in self.projects))
+                return await asyncio.gather(
+                    *(vault.load(p.name) for p in self.projects)
+                )
+
+        self.assertEqual(asyncio.run(round_trip()), self.projects)
+
+    def test_registry_batches_across_vaults(self):
+        async def batch():
+            async with AsyncProjectRegistry(max_workers=3) as registry:
+                for index, project in enumerate(self.projects):
+                    vault_path = f"{self.storage_dir}/vault-{index % 2}"
+                    await registry.save(project, vault_path)
+                loaded = await registry.load_many(
+                    reversed([p.name for p in self.projects])
+                )
+                for project in loaded.values():
+                    project.end_time_entry("dev")
+                await registry.save_many(loaded.values())
+                return await registry.list_vaults(), await registry.load_many(
+                    p.name for p in self.projects
+                )
+
+        vaults, loaded = asyncio.run(batch())
+        self.assertEqual(len(vaults), 2)
+        self.assertEqual(list(loaded), [p.name for p in self.projects])
+        self.assertTrue(all(p.last_time_entry().is_closed() for p in loaded.values()))
+        self.assertEqual(
+            JournalVault(f"{self.storage_dir}/vault-1").load("project-1"),
+            loaded["project-1"],
+        )
+
+
 class TimeEntryTests(unittest.TestCase):
     def test_bool(self):
         self.assertFalse(TimeEntry())
         self.assertTrue(TimeEntry(role_name="el jefe"))
 
 
+class ProjectTests(unittest.TestCase):
+    def setUp(self):
+        self.project = Project(
+            name="some-project",
+            roles=[Role("some-role", 100), Role("another-role", 50)],
+            time_entries=[
+                TimeEntry("some-role", "2023-01-01 12:00:00", "2023-01-01 13:00:00"),
+                TimeEntry("another-role", "2023-01-01 12:00:00"),
+            ],
+        )
+
+    def test_get_role(self):
+        self.assertEqual(self.project.get_role("another-role").hourly_rate, 50)
+        self.assertTrue(self.project.has_role("some-role"))
+        self.project.add_role(Role("third-role", 10))
+        self.assertTrue(self.project.has_role("third-role"))
+        self.assertFalse(self.project.has_role("missing"))
+        with self.assertRaises(RoleNotFoundError):
+            self.project.get_role("")
+
+    def test_last_time_entry(self):
+        self.assertEqual(
+            self.project.last_time_entry("some-role"), self.project.time_entries[0]
+        )
+        self.assertEqual(self.project.last_time_entry(), self.project.time_entries[1])
+        self.assertFalse(self.project.last_time_entry("missing"))
+
+        self.project.time_entries.append(TimeEntry("some-role", "2023-01-02"))
+        self.assertEqual(
+            self.project.last_time_entry("some-role"), self.project.time_entries[2]
+        )
+
+        self.project.time_entries = self.project.time_entries[:1]
+        self.assertFalse(self.project.last_time_entry("another-role"))
+
+        self.project.time_entries.insert(0, TimeEntry("another-role"))
+        self.project.reindex()
+        self.assertEqual(
+            self.project.last_time_entry("some-role"), self.project.time_entries[1]
+        )
+
+    @patch(
+        "timekeeper.entities.TimeEntry.now", return_value=datetime(2023, 1, 2, 12, 0)
+    )
+    def test_open_timers(self, mock_datetime):
+        self.assertEqual(self.project.open_timers(), {"another-role": 1})
+        self.project.start_time_entry("some-role")
+        self.project.end_time_entry("another-role")
+        self.assertEqual(self.project.open_timers(), {"some-role": 2})
+
+
+class CompactTimeEntriesTests(unittest.TestCase):
+    def setUp(self):
+        self.time_entries = [
+            TimeEntry("el jefe", "2023-01-01 12:00:00", "2023-01-01 13:00:00.250000"),
+            TimeEntry("intern", "2023-01-01T12:00:00", ""),
+            TimeEntry("el jefe", "2023-01-02 09:30:00.000000"),
+        ]
+
+    def test_round_trip(self):
+        entries = CompactTimeEntries(self.time_entries)
+        self.assertEqual(list(entries), self.time_entries)
+        self.assertEqual(entries, self.time_entries)
+        self.assertEqual(entries.role_names, ["el jefe", "intern"])
+        self.assertEqual(
+            CompactTimeEntries.from_dicts(entries.to_dicts()), self.time_entries
+        )
+
+    def test_mutation(self):
+        entries = CompactTimeEntries(self.time_entries)
+        entries[1] = TimeEntry("intern", "2023-01-01 12:00:00", "2023-01-01 12:30:00")
+        del entries[0]
+        entries.insert(0, TimeEntry("boss"))
+        self.assertEqual(
+            entries,
+            [
+                TimeEntry("boss"),
+                TimeEntry("intern", "2023-01-01 12:00:00", "2023-01-01 12:30:00"),
+                self.time_entries[2],
+            ],
+        )
+
+    def test_spellings_are_kept_per_row(self):
+        # two spellings of one instant, and one with a UTC offset
+        time_entries = [
+            TimeEntry("r", "2023-01-01T12:00:00", "2023-01-01 13:00:00.000000"),
+            TimeEntry("r", "2023-01-01 12:00:00.000000", "2023-01-01T13:00:00"),
+            TimeEntry("r", "2023-01-02 12:00:00+00:00", "2023-01-02 13:00:00+00:00"),
+        ]
+        entries = CompactTimeEntries(time_entries)
+        self.assertEqual(entries, time_entries)
+        self.assertEqual(entries[1:], time_entries[1:])
+        self.assertEqual(entries[::-2], time_entries[::-2])
+        self.assertEqual(entries.ends[2] - entries.starts[2], 3_600_000_000)
+
+        del entries[0]
+        entries[0] = TimeEntry("r", "2023-01-01 12:00:00", "2023-01-01 13:00:00")
+        self.assertEqual(len(entries.spellings), 2)
+        self.assertEqual(entries[1], time_entries[2])
+
+    @patch("builtins.print")
+    @patch(
+        "timekeeper.entities.TimeEntry.now", return_value=datetime(2023, 1, 1, 12, 0)
+    )
+    def test_project_tracking(self, mock_datetime, mock_print):
+        project = Project(name="some-project", time_entries=CompactTimeEntries())
+        role = Role(name="some-role", hourly_rate=100)
+        project.add_role(role)
+        StartTracking.execute(project, role)
+        StopTracking.execute(project, role)
+        self.assertEqual(
+            project.time_entries,
+            [TimeEntry("some-role", "2023-01-01 12:00:00", "2023-01-01 12:00:00")],
+        )
+
+    def test_file_vault(self):
+        storage = FileVault("test_store", compact=True)
+        project = Project(name="timekeeper", time_entries=self.time_entries)
+        storage.save(project)
+        loaded = storage.load("timekeeper")
+        self.assertIsInstance(loaded.time_entries, CompactTimeEntries)
+        self.assertEqual(loaded, project)
+        storage.save(loaded)
+        self.assertEqual(FileVault("test_store").load("timekeeper"), project)
+        destroy_storage("test_store")
+
+
+class PeriodTests(unittest.TestCase):
+    def labels(self, name, *days):
+        period = get_period(name)
+        return [period.key(to_day(date.fromisoformat(day))) for day in days]
+
+    def test_labels(self):
+        days = ("2023-12-31", "2024-01-01", "2024-04-03")
+        self.assertEqual(
+            self.labels("daily", *days),
+            ["2023-12-31 (Sunday)", "2024-01-01 (Monday)", "2024-04-03 (Wednesday)"],
+        )
+        self.assertEqual(
+            self.labels("weekly", *days),
+            ["2023-12-25 (52)", "2024-01-01 (1)", "2024-04-01 (14)"],
+        )
+        self.assertEqual(
+            self.labels("quarterly", *days),
+            ["2023-10-01 (Q4 2023)", "2024-01-01 (Q1 2024)", "2024-04-01 (Q2 2024)"],
+        )
+        self.assertEqual(
+            self.labels("yearly", *days),
+            ["2023-01-01 (2023)", "2024-01-01 (2024)", "2024-01-01 (2024)"],
+        )
+        self.assertEqual(
+            self.labels("fiscal-weekly:4", *days),
+            [
+                "2023-12-30 (FY2024 W40)",
+                "2023-12-30 (FY2024 W40)",
+                "2024-04-01 (FY2025 W01)",
+            ],
+        )
+        self.assertEqual(
+            self.labels("custom:2024-01-01,2024-04-01,2024-07-01", *days),
+            [None, "2024-01-01 (to 2024-03-31)", "2024-04-01 (to 2024-06-30)"],
+        )
+
+    def test_table_matches_period_starts(self):
+        period = get_period("monthly")
+        self.assertIs(period, get_period("monthly"))
+        first, last = to_day(date(1999, 11, 5)), to_day(date(2001, 3, 1))
+        table = period.table(first, last)
+        self.assertEqual(len(table), last - first + 1)
+        for day in range(first, last + 1):
+            start = from_day(day).replace(day=1)
+            self.assertEqual(table[day - first], to_day(start))
+            self.assertEqual(period.bucket(day), to_day(start))
+
+    def test_invalid_periods(self):
+        for name in ("hourly", "fiscal-weekly:13", "custom:2024-01-01", "custom:x,y"):
+            self.assertFalse(is_period(name))
+            self.assertRaises(ValueError, get_period, name)
+
+
 class InitializeProjectTests(unittest.TestCase):
     def setUp(self) -> None:
         self.storage_dir = "test_store"
@@ -159,15 +1053,991 @@ class SummarizeTimeTests(unittest.TestCase):
         )
 
         SummarizeTime().execute("daily", self.project, True)
+        expected = [
+            call('daily summary for "some-project"'),
+            call("\n2023-01-01 (Sunday):"),
+            call("  some-role: 1.00"),
+            call("\n2023-01-02 (Monday):"),
+            call("  some-role: 1.00"),
+            call("\n2023-01-03 (Tuesday):"),
+            call("  another-role: 1.00"),
+        ]
+        self.assertEqual(mock_print.call_args_list, expected)
+
+        mock_print.reset_mock()
+        self.project.time_entries = CompactTimeEntries(self.project.time_entries)
+        SummarizeTime().execute("daily", self.project, True)
+        self.assertEqual(mock_print.call_args_list, expected)
+
+
+class SummarizeTimeRollupTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.storage_dir = "test_store"
+        self.rollups = RollupStore(FileVault(self.storage_dir).base_path)
+        self.project = Project(name="some-project")
+        for day in range(1, 5):
+            self.project.time_entries.append(
+                TimeEntry(
+                    role_name="some-role",
+                    start_time=f"2023-01-0{day} 12:00:00",
+                    end_time=f"2023-01-0{day} 13:00:00",
+                )
+            )
+        self.project.time_entries.append(
+            TimeEntry(role_name="some-role", start_time="2023-01-05 12:00:00")
+        )
+
+    def tearDown(self) -> None:
+        destroy_storage(self.storage_dir)
+
+    def summarize(self, period="daily"):
+        return SummarizeTime(rollups=self.rollups).summarize(period, self.project)
+
+    def test_folds_closed_prefix(self):
+        self.assertEqual(
+            self.summarize(), SummarizeTime().summarize("daily", self.project)
+        )
+        rollup = self.rollups.load("some-project")["daily"]
+        self.assertEqual(rollup["folded"], 5)
+        self.assertEqual(rollup["pending"], [[4, "some-role", "2023-01-05 12:00:00"]])
+
+        self.project.time_entries[-1].end_time = "2023-01-05 14:00:00"
+        with patch.object(
+            SummarizeTime, "_aggregate", wraps=SummarizeTime()._aggregate
+        ) as aggregate:
+            summary = self.summarize()
+        pending_project = aggregate.call_args_list[0].args[1]
+        self.assertEqual(len(pending_project.time_entries), 1)
+        self.assertEqual(summary["2023-01-05 (Thursday)"]["some-role"].seconds, 7200)
+        self.assertEqual(self.rollups.load("some-project")["daily"]["pending"], [])
+
+        with patch.object(SummarizeTime, "_aggregate") as aggregate:
+            self.assertEqual(self.summarize(), summary)
+        aggregate.assert_not_called()
+
+    def test_parameterised_periods_are_not_rolled_up(self):
+        for period in ("custom:2023-01-01,2023-01-03", "fiscal-weekly:4"):
+            self.assertEqual(
+                self.summarize(period), SummarizeTime().summarize(period, self.project)
+            )
+        self.summarize("fiscal-weekly")
+        self.assertEqual(list(self.rollups.load("some-project")), ["fiscal-weekly"])
+
+    def test_edit_invalidates_rollup(self):
+        self.summarize("weekly")
+        self.project.time_entries[1].end_time = "2023-01-02 22:00:00"
+        self.assertEqual(
+            self.summarize("weekly"), SummarizeTime().summarize("weekly", self.project)
+        )
+        self.project.time_entries[2].role_name = "another-role"
+        self.assertEqual(
+            self.summarize("weekly"), SummarizeTime().summarize("weekly", self.project)
+        )
+
+    def test_insert_invalidates_rollup(self):
+        self.summarize("weekly")
+        self.project.time_entries.insert(
+            0,
+            TimeEntry(
+                role_name="some-role",
+                start_time="2022-12-31 12:00:00",
+                end_time="2022-12-31 15:00:00",
+            ),
+        )
+        self.assertEqual(
+            self.summarize("weekly"), SummarizeTime().summarize("weekly", self.project)
+        )
+        del self.project.time_entries[0:2]
+        self.assertEqual(
+            self.summarize("weekly"), SummarizeTime().summarize("weekly", self.project)
+        )
+
+    def test_compact_entries(self):
+        self.project.time_entries = CompactTimeEntries(self.project.time_entries)
+        expected = SummarizeTime().summarize("monthly", self.project)
+        self.assertEqual(self.summarize("monthly"), expected)
+        self.assertEqual(self.summarize("monthly"), expected)
+        rollup = self.rollups.load("some-project")["monthly"]
+        self.assertTrue(rollup["checksum"].startswith("compact:"))
+
+        self.project.time_entries[-1] = TimeEntry(
+            "some-role", "2023-01-05 12:00:00", "2023-01-05 13:00:00"
+        )
+        self.project.time_entries[0] = TimeEntry(
+            "some-role", "2023-01-01 12:00:00", "2023-01-01 18:00:00"
+        )
+        expected = SummarizeTime().summarize("monthly", self.project)
+        self.assertEqual(self.summarize("monthly"), expected)
+
+
+class SummarizeProjectsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.projects = {}
+        for index, vault_path in enumerate(["test_store/a", "test_store/b"] * 2):
+            project = Project(name=f"project-{index}", roles=[Role("dev", 10)])
+            for day in range(1, 10):
+                project.time_entries.append(
+                    TimeEntry(
+                        role_name="dev",
+                        start_time=f"2023-01-0{day} 12:00:00",
+                        end_time=f"2023-01-0{day} {13 + index}:00:00",
+                    )
+                )
+            FileVault(vault_path).save(project)
+            self.projects[project.name] = vault_path
+
+    def tearDown(self) -> None:
+        destroy_storage("test_store")
+
+    def test_matches_per_project_summaries(self):
+        for max_workers in (1, 2):
+            summary = SummarizeProjects(open_vault, max_workers=max_workers).summarize(
+                "weekly", self.projects
+            )
+            for project_name, vault_path in self.projects.items():
+                expected = SummarizeTime().summarize(
+                    "weekly", FileVault(vault_path).load(project_name)
+                )
+                self.assertEqual(
+                    {
+                        key: projects[project_name]
+                        for key, projects in summary.items()
+                        if project_name in projects
+                    },
+                    expected,
+                )
+
+    def test_closes_sqlite_vaults(self):
+        vaults = []
+
+        def open_sqlite(vault_path, project_name):
+            vaults.append(SqliteVault(vault_path))
+            return vaults[-1]
+
+        with SqliteVault("test_store/c") as vault:
+            vault.save(FileVault("test_store/a").load("project-0"))
+        summary = SummarizeProjects(open_sqlite, max_workers=1).summarize(
+            "weekly", {"project-0": "test_store/c"}
+        )
+        self.assertTrue(summary)
+        self.assertEqual([vault.connection for vault in vaults], [None])
+
+    @patch("builtins.print")
+    def test_execute(self, mock_print):
+        SummarizeProjects(open_vault, use_rollups=False).execute(
+            "monthly", {"project-1": "test_store/b"}, "all projects"
+        )
+        self.assertEqual(
+            mock_print.call_args_list,
+            [
+                call("monthly summary for all projects"),
+                call("\n2023-01-01 (January):"),
+                call("  project-1/dev: 18.00"),
+            ],
+        )
+
+
+class SummarizeEarningsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.projects = {"alpha": "test_store/a", "beta": "test_store/b"}
+        FileVault("test_store/a").save(
+            Project(
+                name="alpha",
+                roles=[Role("dev", 100), Role("qa", 33.33)],
+                time_entries=[
+                    TimeEntry("dev", "2023-01-02 09:00:00", "2023-01-02 10:30:00"),
+                    TimeEntry("qa", "2023-01-09 09:00:00", "2023-01-09 09:20:00"),
+                    TimeEntry("qa", "2023-01-10 09:00:00", "2023-01-10 09:20:00"),
+                    TimeEntry("qa", "2023-01-11 09:00:00", "2023-01-11 09:20:00"),
+                    TimeEntry("dev", "2023-01-12 09:00:00"),
+                ],
+            )
+        )
+        FileVault("test_store/b").save(
+            Project(
+                name="beta",
+                roles=[Role("ops", 80)],
+                time_entries=[
+                    TimeEntry("ops", "2023-01-03 09:00:00", "2023-01-03 09:45:00"),
+                ],
+            )
+        )
+
+    def tearDown(self) -> None:
+        destroy_storage("test_store")
+
+    def test_totals_in_exact_cents(self):
+        earnings = SummarizeEarnings(open_vault).summarize("weekly", self.projects)
+        # three times a third of 33.33 is exactly 33.33, not 33.33 rounded thrice
+        self.assertEqual(
+            earnings,
+            {
+                "periods": {"2023-01-02 (1)": 21000, "2023-01-09 (2)": 3333},
+                "projects": {"alpha": 18333, "beta": 6000},
+                "vaults": {"test_store/a": 18333, "test_store/b": 6000},
+                "total": 24333,
+            },
+        )
+
+    @patch("builtins.print")
+    def test_execute(self, mock_print):
+        SummarizeEarnings(open_vault).execute(
+            "monthly", {"beta": "test_store/b"}, "all projects"
+        )
         self.assertEqual(
             mock_print.call_args_list,
             [
-                call('daily summary for "some-project"'),
-                call("\n2023-01-01 (Sunday):"),
-                call("  some-role: 1.00"),
-                call("\n2023-01-02 (Monday):"),
-                call("  some-role: 1.00"),
-                call("\n2023-01-03 (Tuesday):"),
-                call("  another-role: 1.00"),
+                call("monthly earnings for all projects"),
+                call("\nPeriods:"),
+                call("  2023-01-01 (January): 60.00"),
+                call("\nProjects:"),
+                call("  beta: 60.00"),
+                call("\nVaults:"),
+                call("  test_store/b: 60.00"),
+                call("\nTotal: 60.00"),
+            ],
+        )
+
+
+class CompactProjectTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path = os.path.abspath("test_archive")
+        self.vault = JournalVault(self.path)
+        self.archives = ArchiveStore(self.path)
+        time_entries = []
+        for day in range(1, 29):
+            role_name = "dev" if day % 3 else "qa"
+            time_entries.append(
+                TimeEntry(
+                    role_name,
+                    f"2023-02-{day:02d} 09:00:00",
+                    f"2023-02-{day:02d} 1{day % 5}:15:00",
+                )
+            )
+        time_entries.append(TimeEntry("dev", "2023-03-01 09:00:00"))
+        self.project = Project(
+            name="demo",
+            roles=[Role("dev", 10), Role("qa", 20)],
+            time_entries=time_entries,
+        )
+        self.vault.save(self.project)
+
+    def tearDown(self) -> None:
+        destroy_storage(self.path)
+
+    def summaries(self):
+        project = self.vault.load("demo")
+        summarize = SummarizeTime(archives=self.archives)
+        return [
+            summarize.summarize("weekly", project),
+            summarize.summarize("daily", project, "2023-02-10", "2023-02-20 09:00"),
+            SummarizeEarnings(open_vault).summarize("monthly", {"demo": self.path}),
+        ]
+
+    @patch("builtins.print")
+    def test_compact_keeps_summaries_and_expands_losslessly(self, mock_print):
+        expected = self.summaries()
+
+        project = self.vault.load("demo")
+        archived = CompactProject(self.vault, self.archives).execute(
+            project, "2023-02-20"
+        )
+        self.assertEqual(archived, 19)
+        project = JournalVault(self.path).load("demo")
+        self.assertEqual(len(project.time_entries), 10)
+        self.assertEqual(project.time_entries[0].start_time, "2023-02-20 09:00:00")
+        self.assertEqual(self.summaries(), expected)
+
+        # a second compaction adds a segment, the first one is left alone
+        CompactProject(self.vault, self.archives).execute(project, "2023-02-25")
+        self.assertEqual(len(self.archives.load_manifest("demo")), 2)
+        self.assertEqual(self.summaries(), expected)
+
+        ExpandArchive(self.vault, self.archives).execute(self.vault.load("demo"))
+        self.assertFalse(self.archives.exists("demo"))
+        self.assertEqual(JournalVault(self.path).load("demo"), self.project)
+
+    @patch("builtins.print")
+    def test_compact_compares_parsed_start_times(self, mock_print):
+        # 2023-02-02 11:00 UTC, on February 2nd in any zone east of UTC-12
+        project = self.vault.load("demo")
+        project.time_entries[0].start_time = "2023-02-01T23:00:00-12:00"
+        self.vault.rewrite(project)
+        CompactProject(self.vault, self.archives).execute(project, "2023-02-02")
+        self.assertEqual(len(self.vault.load("demo").time_entries), 29)
+
+        CompactProject(self.vault, self.archives).execute(project, "2023-02-03")
+        self.assertEqual(len(self.vault.load("demo").time_entries), 27)
+
+
+class ImportTimeEntriesTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path = os.path.abspath("test_import")
+        self.vault = JournalVault(self.path)
+        self.vault.save(
+            Project(
+                name="demo",
+                roles=[Role("dev", 1), Role("ops", 1)],
+                time_entries=[
+                    TimeEntry("dev", "2023-01-02 09:00:00", "2023-01-02 10:00:00"),
+                    TimeEntry("dev", "2023-01-04 09:00:00", "2023-01-04 10:00:00"),
+                ],
+            )
+        )
+
+    def tearDown(self) -> None:
+        destroy_storage(self.path)
+
+    def open_project(self, project_name):
+        if not self.vault.exists(project_name):
+            raise ProjectNotFoundError(project_name)
+        return self.vault, self.vault.load(project_name)
+
+    def rows(self, *rows):
+        return enumerate(rows, 1)
+
+    @patch("builtins.print")
+    def test_merges_in_start_order_across_batches(self, mock_print):
+        stats = ImportTimeEntries(self.open_project, batch_size=2).execute(
+            self.rows(
+                {"role": "ops", "start": "2023-01-05 09:00", "end": "2023-01-05 10:00"},
+                {"role": "ops", "start": "2023-01-03 09:00", "end": "2023-01-03 10:00"},
+                {"role": "dev", "start": "2023-01-01 09:00", "end": "2023-01-01 10:00"},
+            ),
+            "demo",
+        )
+        self.assertEqual(stats["imported"], 3)
+
+        project = JournalVault(self.path).load("demo")
+        starts = [time_entry.start_time for time_entry in project.time_entries]
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(len(starts), 5)
+        self.assertEqual(project.last_time_entry("ops").start_time[:10], "2023-01-05")
+
+    @patch("builtins.print")
+    def test_skips_duplicates_and_invalid_rows(self, mock_print):
+        importer = ImportTimeEntries(self.open_project, {"developer": "dev"})
+        stats = importer.execute(
+            self.rows(
+                {
+                    "project": "demo",
+                    "role": "developer",
+                    "start": "2023-01-02 09:00:00",
+                    "end": "2023-01-02 10:00:00",
+                },
+                {"project": "demo", "role": "qa", "start": "2023-01-06 09:00"},
+                {"project": "demo", "role": "dev", "start": "soon", "end": "later"},
+                {
+                    "project": "nope",
+                    "role": "dev",
+                    "start": "2023-01-06",
+                    "end": "2023-01-06",
+                },
+                None,
+                {
+                    "project": "demo",
+                    "role": "developer",
+                    "start": "2023-01-06T09:00:00Z",
+                    "end": "2023-01-06T10:00:00Z",
+                },
+            )
+        )
+        self.assertEqual(stats["imported"], 1)
+        self.assertEqual(stats["duplicates"], 1)
+        self.assertEqual(stats["skipped"], 4)
+        mock_print.assert_any_call("  line 3: invalid timestamp 'soon'")
+        mock_print.assert_any_call('  line 4: project "nope" does not exist')
+        mock_print.assert_any_call(
+            "Imported 1 entries into 1 projects, skipped 1 duplicates and"
+            " 4 invalid rows."
+        )
+
+        project = JournalVault(self.path).load("demo")
+        self.assertEqual(len(project.time_entries), 3)
+        self.assertEqual(project.time_entries[-1].role_name, "dev")
+
+
+class SyncVaultsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.local_path = os.path.abspath("test_sync_local")
+        self.remote_path = os.path.abspath("test_sync_remote")
+        self.local = JournalVault(self.local_path)
+        self.remote = JournalVault(self.remote_path)
+        self.local.save(
+            Project(
+                name="demo",
+                roles=[Role("dev", 10)],
+                time_entries=[
+                    TimeEntry("dev", "2023-01-02 09:00:00", "2023-01-02 10:00:00"),
+                    TimeEntry("dev", "2023-01-03 09:00:00", "2023-01-03 10:00:00"),
+                    TimeEntry("dev", "2023-01-04 09:00:00"),
+                ],
+            )
+        )
+
+    def tearDown(self) -> None:
+        destroy_storage(self.local_path)
+        destroy_storage(self.remote_path)
+
+    def sync(self) -> dict:
+        stores = SyncStore(self.local_path), SyncStore(self.remote_path)
+        return SyncVaults(open_vault, *stores).execute(["demo"])
+
+    @patch("builtins.print")
+    def test_sync_merges_changes_of_both_sides(self, mock_print):
+        # a project only one side has is copied over
+        self.assertEqual(self.sync()["pushed"], 3)
+        self.assertEqual(self.remote.load("demo"), self.local.load("demo"))
+
+        # the local copy closes the open entry and adds one, the remote copy
+        # backdates an entry, changes a role's rate and removes an old entry
+        project = self.local.load("demo")
+        project.time_entries[-1].end_time = "2023-01-04 12:00:00"
+        project.time_entries.append(TimeEntry("dev", "2023-01-06 09:00:00"))
+        self.local.save(project)
+        project = self.remote.load("demo")
+        project.roles[0].hourly_rate = 12
+        del project.time_entries[0]
+        project.time_entries.insert(
+            0, TimeEntry("dev", "2023-01-01 09:00:00", "2023-01-01 11:00:00")
+        )
+        self.remote.rewrite(project)
+
+        stats = self.sync()
+        self.assertEqual((stats["pulled"], stats["pushed"]), (2, 2))
+        merged = JournalVault(self.local_path).load("demo")
+        self.assertEqual(JournalVault(self.remote_path).load("demo"), merged)
+        self.assertEqual(merged.roles, [Role("dev", 12)])
+        self.assertEqual(
+            [(te.start_time, te.end_time) for te in merged.time_entries],
+            [
+                ("2023-01-01 09:00:00", "2023-01-01 11:00:00"),
+                ("2023-01-03 09:00:00", "2023-01-03 10:00:00"),
+                ("2023-01-04 09:00:00", "2023-01-04 12:00:00"),
+                ("2023-01-06 09:00:00", ""),
+            ],
+        )
+
+        # both sides agree on the merge and nothing is reloaded
+        local, remote = SyncStore(self.local_path), SyncStore(self.remote_path)
+        state = local.load("demo", remote.replica_id())
+        self.assertEqual(
+            state["entries"], remote.load("demo", local.replica_id())["entries"]
+        )
+        self.assertEqual(self.sync()["synced"], 0)
+
+    @patch("builtins.print")
+    def test_change_on_one_side_wins(self, mock_print):
+        self.sync()
+        project = self.local.load("demo")
+        project.time_entries[1].end_time = "2023-01-03 09:30:00"
+        project.roles[0].hourly_rate = 11
+        self.local.rewrite(project)
+        project = self.remote.load("demo")
+        project.roles[0].hourly_rate = 14
+        self.remote.rewrite(project)
+
+        self.sync()
+        for path in (self.local_path, self.remote_path):
+            project = JournalVault(path).load("demo")
+            self.assertEqual(project.time_entries[1].end_time, "2023-01-03 09:30:00")
+            # both changed the rate, the higher one wins on either side
+            self.assertEqual(project.roles, [Role("dev", 14)])
+
+    @patch("builtins.print")
+    def test_archived_entries_are_kept_and_copied(self, mock_print):
+        self.sync()
+        CompactProject(self.local, ArchiveStore(self.local_path)).execute(
+            self.local.load("demo"), "2023-01-04"
+        )
+        self.assertEqual(self.sync()["pushed"], 0)
+        self.assertEqual(
+            len(JournalVault(self.remote_path).load("demo").time_entries), 3
+        )
+
+        # a new copy gets the archived entries in its own archive
+        copy_path = os.path.abspath("test_sync_copy")
+        self.addCleanup(destroy_storage, copy_path)
+        stores = SyncStore(self.local_path), SyncStore(copy_path)
+        SyncVaults(open_vault, *stores).execute(["demo"])
+        copy_archives = ArchiveStore(copy_path)
+        self.assertEqual(len(list(copy_archives.time_entries("demo"))), 2)
+        self.assertEqual(
+            SummarizeTime(archives=copy_archives).summarize(
+                "weekly", JournalVault(copy_path).load("demo")
+            ),
+            SummarizeTime(archives=ArchiveStore(self.local_path)).summarize(
+                "weekly", JournalVault(self.local_path).load("demo")
+            ),
+        )
+
+
+class ParallelSummaryEngineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.project = Project(name="some-project")
+        start = datetime(2023, 12, 20, 23, 30)
+        for hour in range(0, 24 * 60, 7):
+            self.project.time_entries.append(
+                TimeEntry(
+                    role_name=["some-role", "another-role", "third"][hour % 3],
+                    start_time=str(start + timedelta(hours=hour)),
+                    end_time=str(start + timedelta(hours=hour, minutes=hour % 90)),
+                )
+            )
+        self.project.time_entries.insert(
+            50, TimeEntry(role_name="some-role", start_time=str(start))
+        )
+
+    def test_matches_serial_summary(self):
+        engine = ParallelSummaryEngine(max_workers=2, chunk_size=37)
+        for period in SummarizeTime.periods + ("custom:2023-12-25,2024-01-08",):
+            expected = SummarizeTime().summarize(period, self.project)
+            summary = SummarizeTime(engine).summarize(period, self.project)
+            self.assertEqual(summary, expected)
+            self.assertEqual(
+                [(key, list(roles)) for key, roles in summary.items()],
+                [(key, list(roles)) for key, roles in expected.items()],
+            )
+
+        expected = SummarizeTime().summarize("weekly", self.project)
+        self.project.time_entries = CompactTimeEntries(self.project.time_entries)
+        for engine in (engine, ParallelSummaryEngine(max_workers=1)):
+            summary = SummarizeTime(engine).summarize("weekly", self.project)
+            self.assertEqual(summary, expected)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class NumpySummaryEngineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.project = Project(name="some-project")
+        start = datetime(2023, 12, 20, 23, 30)
+        for hour in range(0, 24 * 60, 7):
+            self.project.time_entries.append(
+                TimeEntry(
+                    role_name=["some-role", "another-role", "third"][hour % 3],
+                    start_time=str(start + timedelta(hours=hour)),
+                    end_time=str(start + timedelta(hours=hour, minutes=hour % 90)),
+                )
+            )
+        self.project.time_entries.append(
+            TimeEntry(role_name="some-role", start_time=str(start))
+        )
+
+    def test_matches_python_engine(self):
+        custom = ("fiscal-weekly:4", "custom:2023-12-25,2024-01-08,2024-02-01")
+        for period in SummarizeTime.periods + custom:
+            expected = SummarizeTime().summarize(period, self.project)
+            summary = SummarizeTime(NumpySummaryEngine()).summarize(
+                period, self.project
+            )
+            self.assertEqual(summary, expected)
+            self.assertEqual(
+                [list(roles) for roles in summary.values()],
+                [list(roles) for roles in expected.values()],
+            )
+
+    def test_compact_entries(self):
+        expected = SummarizeTime().summarize("weekly", self.project)
+        self.project.time_entries = CompactTimeEntries(self.project.time_entries)
+        summary = SummarizeTime(NumpySummaryEngine()).summarize("weekly", self.project)
+        self.assertEqual(summary, expected)
+
+    def test_no_closed_entries(self):
+        project = Project(name="empty", time_entries=[TimeEntry("a", "2023-01-01")])
+        self.assertEqual(
+            SummarizeTime(NumpySummaryEngine()).summarize("daily", project), {}
+        )
+
+
+class CommandLineInterfaceTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.home = os.path.abspath("test_home")
+        self.env = dict(os.environ, HOME=self.home)
+        patcher = patch.dict(os.environ, {"HOME": self.home})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        FileVault(f"{self.home}/.config/timekeeper").save(
+            Project(name="demo", roles=[Role(name="dev", hourly_rate=1)])
+        )
+
+    def tearDown(self) -> None:
+        destroy_storage(self.home)
+
+    def test_fast_path_dispatch(self):
+        cli = CommandLineInterface()
+        with patch.object(cli, "toggle_tracking") as toggle_tracking:
+            self.assertTrue(cli.run_fast(["t", "demo"]))
+            toggle_tracking.assert_called_with("demo", None)
+            self.assertTrue(cli.run_fast(["toggle", "demo", "dev"]))
+            toggle_tracking.assert_called_with("demo", "dev")
+        with patch.object(cli, "project_info") as project_info:
+            self.assertTrue(cli.run_fast(["info", "demo"]))
+            project_info.assert_called_with("demo")
+        self.assertFalse(cli.run_fast(["t", "--help"]))
+        self.assertFalse(cli.run_fast(["sum", "--project", "demo"]))
+        self.assertFalse(cli.run_fast([]))
+
+    @patch("builtins.print")
+    def test_export_import_round_trip(self, mock_print):
+        vault_path = f"{self.home}/.config/timekeeper"
+        project = Project(
+            name="demo",
+            roles=[Role(name="dev", hourly_rate=1)],
+            time_entries=[
+                TimeEntry("dev", "2023-01-01T12:00:00", "2023-01-01 13:00:00"),
+                TimeEntry("dev", "2023-01-02 12:00:00"),
+            ],
+        )
+        JournalVault(vault_path).save(project)
+        export_path = f"{self.home}/demo-export.json"
+
+        cli = CommandLineInterface()
+        cli.run(["export", "demo", export_path])
+        cli.run(["import", export_path, "--binary"])
+        self.assertIsInstance(open_vault(vault_path, "demo"), BinaryVault)
+        self.assertEqual(open_vault(vault_path, "demo").load("demo"), project)
+
+        cli.run(["export", "demo", f"{export_path}.2"])
+        with open(export_path) as f, open(f"{export_path}.2") as g:
+            self.assertEqual(f.read(), g.read())
+
+        cli.run(["import", export_path])
+        self.assertIsInstance(open_vault(vault_path, "demo"), JournalVault)
+        self.assertEqual(open_vault(vault_path, "demo").load("demo"), project)
+
+    @patch("builtins.print")
+    def test_import_into_segmented_project(self, mock_print):
+        vault_path = f"{self.home}/.config/timekeeper"
+        cli = CommandLineInterface()
+        cli.run(["segment", "demo"])
+        project = Project(
+            name="demo",
+            roles=[Role(name="dev", hourly_rate=1)],
+            time_entries=[TimeEntry("dev", "2023-01-01 12:00:00")],
+        )
+        export_path = f"{self.home}/demo-export.json"
+        with open(export_path, "w") as f:
+            FileVault(vault_path).write_project(project, f)
+
+        cli.run(["import", export_path])
+        self.assertIsInstance(open_vault(vault_path, "demo"), SegmentedVault)
+        self.assertEqual(open_vault(vault_path, "demo").load("demo"), project)
+        with self.assertRaises(SystemExit):
+            cli.run(["import", export_path, "--binary"])
+
+    @patch("builtins.print")
+    def test_import_csv_entries(self, mock_print):
+        csv_path = f"{self.home}/entries.csv"
+        with open(csv_path, "w") as f:
+            f.write("project,role,start,end\n")
+            f.write("demo,developer,2023-01-01 09:00:00,2023-01-01 10:30:00\n")
+            f.write("demo,developer,2023-01-02 09:00:00,2023-01-02 10:00:00\n")
+
+        cli = CommandLineInterface()
+        cli.run(["import", csv_path, "--role-map", "developer=dev"])
+        mock_print.assert_called_with(
+            "Imported 2 entries into 1 projects,"
+            " skipped 0 duplicates and 0 invalid rows."
+        )
+        _, project = cli.load_project("demo")
+        self.assertEqual(
+            [(te.role_name, te.end_time) for te in project.time_entries],
+            [("dev", "2023-01-01 10:30:00"), ("dev", "2023-01-02 10:00:00")],
+        )
+
+    @patch("builtins.print")
+    def test_sync_vaults(self, mock_print):
+        other_path = f"{self.home}/laptop"
+        JournalVault(other_path).save(
+            Project(
+                name="other",
+                roles=[Role(name="qa", hourly_rate=2)],
+                time_entries=[TimeEntry("qa", "2023-01-02 09:00:00")],
+            )
+        )
+        cli = CommandLineInterface()
+        cli.run(["sync", other_path])
+        mock_print.assert_called_with(
+            "Synced 2 of 2 projects, 1 entries pulled and 0 pushed."
+        )
+        self.assertTrue(JournalVault(other_path).exists("demo"))
+        _, project = cli.load_project("other")
+        self.assertEqual(project.last_time_entry().start_time, "2023-01-02 09:00:00")
+        self.assertEqual(
+            cli.registry.running_timers(), {"other": {"qa": "2023-01-02 09:00:00"}}
+        )
+
+        cli.run(["sync", other_path])
+        mock_print.assert_called_with(
+            "Synced 0 of 2 projects, 0 entries pulled and 0 pushed."
+        )
+
+    def test_export_entries_and_summary_rows(self):
+        vault_path = f"{self.home}/.config/timekeeper"
+        JournalVault(vault_path).save(
+            Project(
+                name="demo",
+                roles=[Role(name="dev", hourly_rate=1)],
+                time_entries=[
+                    TimeEntry("dev", "2023-01-02 09:00:00", "2023-01-02 10:30:00"),
+                    TimeEntry("dev", "2023-01-03 09:00:00"),
+                ],
+            )
+        )
+        cli = CommandLineInterface()
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            cli.run(["export", "demo", "--format", "csv"])
+        self.assertEqual(
+            stdout.getvalue(),
+            "project,role,start,end\n"
+            "demo,dev,2023-01-02 09:00:00,2023-01-02 10:30:00\n"
+            "demo,dev,2023-01-03 09:00:00,\n",
+        )
+
+        export_path = f"{self.home}/entries.jsonl"
+        cli.run(["export", "demo", export_path])
+        with open(export_path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows[0]["end"], "2023-01-02 10:30:00")
+        self.assertEqual(len(rows), 2)
+
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            cli.run(["sum", "--project", "demo", "--format", "json"])
+        self.assertEqual(
+            json.loads(stdout.getvalue()),
+            {"period": "2023-01-02 (1)", "role": "dev", "hours": 1.5},
+        )
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            cli.run(["sum", "--all", "--period", "monthly", "--format", "csv"])
+        self.assertEqual(
+            stdout.getvalue(),
+            "period,project,role,hours\n2023-01-01 (January),demo,dev,1.5\n",
+        )
+
+    @patch("builtins.print")
+    def test_init_adds_role_to_project_in_sqlite_vault(self, mock_print):
+        vault_path = f"{self.home}/sqlite"
+        with SqliteVault(vault_path) as vault:
+            vault.save(Project(name="stored", roles=[Role("dev", 1)]))
+        registry = ProjectRegistry()
+        registry.update_index(vault_path, "stored")
+        answers = ["", "stored", "role", "qa", "5"]
+        with patch("builtins.input", side_effect=answers):
+            ProjectWorkflowService(registry).initialize_project_workflow()
+
+        with SqliteVault(vault_path) as vault:
+            self.assertEqual(
+                [role.name for role in vault.load("stored").roles], ["dev", "qa"]
+            )
+        self.assertEqual(registry.get_project_vault_path("stored"), vault_path)
+
+    @patch("builtins.print")
+    def test_failed_toggle_save_starts_no_timer(self, mock_print):
+        cli = CommandLineInterface()
+        with patch.object(cli, "save_project", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                cli.toggle_tracking("demo", "dev")
+        self.assertEqual(cli.registry.running_timers(), {})
+
+        cli.toggle_tracking("demo", "dev")
+        self.assertEqual(list(cli.registry.running_timers()), ["demo"])
+
+    def test_summarize_range_dates(self):
+        FileVault(f"{self.home}/.config/timekeeper").save(
+            Project(
+                name="demo",
+                roles=[Role(name="dev", hourly_rate=1)],
+                time_entries=[
+                    TimeEntry("dev", "2023-01-01T23:00:00", "2023-01-01 23:30:00"),
+                    TimeEntry("dev", "2023-01-02T09:00:00", "2023-01-02 10:00:00"),
+                ],
+            )
+        )
+        cli = CommandLineInterface()
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            cli.run(
+                ["sum", "--project", "demo", "--format", "json"]
+                + ["--period", "daily", "--since", "2023-01-02"]
+            )
+        self.assertEqual(
+            json.loads(stdout.getvalue()),
+            {"period": "2023-01-02 (Monday)", "role": "dev", "hours": 1.0},
+        )
+        for bound in ("--since", "--until"):
+            with self.assertRaises(SystemExit) as context:
+                cli.run(["sum", "--project", "demo", bound, "Jan 2"])
+            self.assertIn("YYYY-MM-DD", str(context.exception.code))
+        with self.assertRaises(SystemExit):
+            cli.run(["sum", "--project", "demo", "--stream", "--engine", "numpy"])
+        for option in (
+            ["--stream"],
+            ["--since", "2023-01-02"],
+            ["--until", "2023-01-03"],
+        ):
+            with self.assertRaises(SystemExit) as context:
+                cli.run(["sum", "--all"] + option)
+            self.assertIn("single project", str(context.exception.code))
+        with self.assertRaises(SystemExit):
+            cli.run(["compact", "demo", "--before", "last week"])
+
+    def test_profile_and_trace(self):
+        trace_path = f"{self.home}/trace.json"
+        cli = CommandLineInterface()
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with patch("sys.stdout", new_callable=io.StringIO):
+                cli.run(["--profile", "toggle", "demo", "dev"])
+        self.assertIn("vault.parse", stderr.getvalue())
+        self.assertIn("bytes_read=", stderr.getvalue())
+
+        with patch("timekeeper.instrumentation.run_profiled") as run_profiled:
+            cli.run(["--profile", "cprofile", "toggle", "demo", "dev"])
+            cli.run(["--profile=tracemalloc", "info", "demo"])
+        self.assertEqual(
+            [c.args[1:3] for c in run_profiled.call_args_list],
+            [
+                (["toggle", "demo", "dev"], "cprofile"),
+                (["info", "demo"], "tracemalloc"),
             ],
         )
+
+        with patch.dict(os.environ, {"TK_TRACE": trace_path}):
+            with patch("builtins.print"):
+                cli.run(["sum", "--project", "demo"])
+        with open(trace_path) as f:
+            trace = json.load(f)
+        self.assertEqual(trace["argv"], ["sum", "--project", "demo"])
+        phases = {record["phase"]: record for record in trace["phases"]}
+        self.assertEqual(phases["vault.build"]["entries"], 0)
+        self.assertIn("summarize.aggregate", phases)
+        self.assertFalse(instrumentation.is_enabled())
+
+    def test_phases_are_off_by_default(self):
+        instrumentation.reset()
+        with instrumentation.phase("unused") as record:
+            record["entries"] = 1
+        self.assertEqual(instrumentation.phases(), [])
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_daemon_serves_and_writes_back(self, server_stdout):
+        socket_path = f"{self.home}/.config/timekeeper/daemon.sock"
+        server = threading.Thread(target=daemon.serve, args=(socket_path, 0.01))
+        server.start()
+        self.addCleanup(server.join)
+        self.addCleanup(client.stop, socket_path)
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.01)
+
+        cli = CommandLineInterface()
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            cli.run(["toggle", "demo", "dev"])
+            cli.run(["info", "demo"])
+        self.assertIn("Started tracking", stdout.getvalue())
+        self.assertIn("Timer Running.", stdout.getvalue())
+        with self.assertRaises(DaemonCommandError):
+            cli.run(["info", "missing"])
+
+        self.assertTrue(client.stop(socket_path))
+        server.join()
+        self.assertFalse(os.path.exists(socket_path))
+        vault = open_vault(f"{self.home}/.config/timekeeper", "demo")
+        self.assertTrue(vault.load("demo").last_time_entry().is_open())
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_daemon_survives_malformed_requests(self, server_stdout):
+        socket_path = f"{self.home}/.config/timekeeper/daemon.sock"
+        server = threading.Thread(target=daemon.serve, args=(socket_path, 0.01))
+        server.start()
+        self.addCleanup(server.join)
+        self.addCleanup(client.stop, socket_path)
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.01)
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with connection:
+            connection.connect(socket_path)
+            connection.sendall(b"not json")
+            connection.shutdown(socket.SHUT_WR)
+            response = json.loads(client.read_all(connection))
+        self.assertEqual(response["status"], 1)
+        self.assertIn("Malformed request", response["error"])
+        response = client.request(socket_path, {"argv": ["info", "demo"]})
+        self.assertIn("KeyError", response["error"])
+
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            CommandLineInterface().run(["toggle", "demo", "dev"])
+        self.assertIn("Started tracking", stdout.getvalue())
+        self.assertTrue(client.stop(socket_path))
+        server.join()
+
+    def test_daemon_runs_commands_where_the_client_is(self):
+        vault_path = f"{self.home}/.config/timekeeper"
+        interface = daemon.DaemonInterface(daemon.ProjectCache())
+        cwd = os.getcwd()
+        response = interface.handle(
+            ["sum", "--vault", "."], vault_path, {"TK_NO_DAEMON": "1"}
+        )
+        self.assertEqual(response["error"], "")
+        self.assertIn(f'vault "{vault_path}"', response["stdout"])
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertNotIn("TK_NO_DAEMON", os.environ)
+
+    def test_daemon_keeps_changes_made_on_disk(self):
+        vault_path = f"{self.home}/.config/timekeeper"
+        cache = daemon.ProjectCache()
+        interface = daemon.DaemonInterface(cache)
+        interface.handle(["toggle", "demo", "dev"])
+        # the timer is listed once the toggle is written back
+        self.assertEqual(interface.registry.running_timers(), {})
+
+        # another process adds an entry before the toggle is written back
+        vault = JournalVault(vault_path)
+        project = vault.load("demo")
+        project.time_entries.append(
+            TimeEntry("dev", "2022-01-01 09:00:00", "2022-01-01 10:00:00")
+        )
+        vault.rewrite(project)
+        cache.flush()
+
+        project = JournalVault(vault_path).load("demo")
+        self.assertEqual(len(project.time_entries), 2)
+        self.assertEqual(project.time_entries[0].start_time, "2022-01-01 09:00:00")
+        self.assertTrue(project.last_time_entry().is_open())
+        self.assertEqual(list(interface.registry.running_timers()), ["demo"])
+
+    @patch("builtins.print")
+    def test_stale_daemon_socket_falls_back(self, mock_print):
+        with open(f"{self.home}/.config/timekeeper/daemon.sock", "w"):
+            pass
+        CommandLineInterface().run(["info", "demo"])
+        mock_print.assert_called_with("No timer running.")
+
+    def test_hot_commands_import_budget(self):
+        slow_path_modules = {
+            "argparse",
+            "concurrent.futures",
+            "numpy",
+            "sqlite3",
+            "timekeeper.engines",
+            "timekeeper.services",
+        }
+        for command in (["toggle", "demo", "dev"], ["info", "demo"]):
+            process = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c"]
+                + ["from timekeeper.cli import main; main()"]
+                + command,
+                env=self.env,
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(process.returncode, 0, process.stderr)
+            imported = {
+                line.rsplit("|", 1)[-1].strip()
+                for line in process.stderr.splitlines()
+                if line.startswith("import time:")
+            }
+            self.assertIn("timekeeper.adapters", imported)
+            self.assertFalse(imported & slow_path_modules, command)
@@ -1,18 +1,260 @@
+import copy
 import json
+import mmap
 import os
+import re
+import struct
+import sys
+import zlib
 from abc import ABC, abstractmethod
-from dataclasses import asdict
+from array import array
+from collections.abc import Iterable, Iterator, MutableSequence
+from contextlib import contextmanager
+from dataclasses import asdict, replace
+from typing import TYPE_CHECKING, Optional
 
-from timekeeper.config import INDEX_FILENAME, vault_path
-from timekeeper.entities import Project, Role, TimeEntry
+from timekeeper.config import (
+    ARCHIVE_SUFFIX,
+    BINARY_SUFFIX,
+    INDEX_DB_FILENAME,
+    INDEX_FILENAME,
+    JOURNAL_SUFFIX,
+    PROJECT_SUFFIX,
+    REPLICA_FILENAME,
+    ROLLUP_SUFFIX,
+    RUNNING_FILENAME,
+    SEGMENTS_SUFFIX,
+    SQLITE_FILENAME,
+    SYNC_SUFFIX,
+    vault_path,
+)
+from timekeeper.entities import (
+    CompactTimeEntries,
+    Project,
+    ProjectStream,
+    Role,
+    TimeEntry,
+    to_ticks,
+)
 from timekeeper.errors import ProjectNotFoundError
+from timekeeper.instrumentation import file_size, phase
+
+if TYPE_CHECKING:
+    import sqlite3
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# files of the registry that share the project file suffix
+REGISTRY_FILENAMES = (INDEX_FILENAME, RUNNING_FILENAME)
+
+
+def write_json_atomically(path: str, data, indent=None, compress=False) -> None:
+    """Write JSON, gzipped if ``compress``, to a temp file renamed over ``path``."""
+    temp_path = f"{path}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+    try:
+        with (
+            phase("json.write") as record,
+            open(temp_path, "xb" if compress else "x") as f,
+        ):
+            if compress:
+                import gzip
+
+                f.write(gzip.compress(json.dumps(data).encode()))
+            else:
+                json.dump(data, f, indent=indent)
+            record["file"] = os.path.basename(path)
+            record["bytes_written"] = f.tell()
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class _JsonReader:
+    """Reads JSON values from a file chunk by chunk."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def peek(self) -> str:
+        """The next non-whitespace character, without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of data", self.buffer, 0)
+
+    def expect(self, *chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            expected = " or ".join(repr(c) for c in chars)
+            raise json.JSONDecodeError(f"Expecting {expected}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+
+def iter_json_members(f, chunk_size: int = 1 << 16) -> Iterator[tuple]:
+    """Yield the members of the JSON object in ``f`` as (key, value) pairs.
+
+    The object is never parsed whole: array members are yielded element by
+    element under their key, other members once.
+    """
+    reader = _JsonReader(f, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if reader.peek() != "[":
+            yield key, reader.value()
+        else:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield key, reader.value()
+                    if reader.expect(",", "]") == "]":
+                        break
+        if reader.expect(",", "}") == "}":
+            return
+
+
+ENTRY_FIELDS = ("project", "role", "start", "end")
+
+
+def iter_entry_rows(f, file_format: str) -> Iterator[tuple]:
+    """Yield (line number, row) of a CSV or JSON lines file of time entries.
+
+    Rows are dicts of the file's fields. A JSON line that doesn't parse is
+    yielded as None so the caller can report it with its line number.
+    """
+    if file_format == "csv":
+        import csv
+
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def write_records(records: Iterable[tuple], fields: tuple, file_format: str, f) -> int:
+    """Write rows of ``fields`` as CSV with a header or as JSON lines.
+
+    Rows are consumed one at a time and handed to the file's own buffer, so
+    any number of them is written in constant memory. Returns the count.
+    """
+    count = 0
+    if file_format == "csv":
+        import csv
+
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(fields)
+        for record in records:
+            writer.writerow(record)
+            count += 1
+        return count
+
+    for record in records:
+        f.write(json.dumps(dict(zip(fields, record))))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def in_range(time_entries, since: str = "", until: str = "") -> Iterator[TimeEntry]:
+    """Entries starting in [since, until), an empty bound is open.
+
+    Start times are compared as parsed timestamps, so kept spellings with a
+    ``T`` separator or a UTC offset fall on the right side of a bound.
+    """
+    low = to_ticks(since) if since else None
+    high = to_ticks(until) if until else None
+    for time_entry in time_entries:
+        start = to_ticks(time_entry.start_time)
+        if (low is None or start >= low) and (high is None or start < high):
+            yield time_entry
+
+
+def _start_bounds(te_dicts: list) -> dict:
+    """Earliest and latest start of a segment's entries, in ticks."""
+    ticks = [to_ticks(te_dict["start_time"]) for te_dict in te_dicts]
+    return {"earliest": min(ticks), "latest": max(ticks)}
+
+
+def _overlaps(segment: dict, since: str = "", until: str = "") -> bool:
+    """Whether a segment can hold entries starting in [since, until).
+
+    Segments recorded before their tick bounds were kept are always read.
+    """
+    if "earliest" not in segment:
+        return True
+    return (not since or segment["latest"] >= to_ticks(since)) and (
+        not until or segment["earliest"] < to_ticks(until)
+    )
+
+
+def _file_signature(path: str) -> Optional[list]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
 
 
 class ProjectRegistry:
+    """Global index of which vault every project lives in.
+
+    The parsed index is cached per process and reused while the file's
+    inode, size and mtime are unchanged. Writes go to a temp file that is
+    renamed over the index, so readers never see a partial file.
+    """
+
+    _cache: dict = {}
+
     def __init__(self):
         self.projects_path = vault_path()
         self.lookup_filename = INDEX_FILENAME
         self.lookup_file = f"{self.projects_path}/{self.lookup_filename}"
+        self.running_file = f"{self.projects_path}/{RUNNING_FILENAME}"
 
         if not os.path.exists(self.projects_path):
             os.makedirs(self.projects_path)
@@ -21,34 +263,151 @@ class ProjectRegistry:
             self._index_projects()
 
     def _load_index(self) -> dict:
-        with open(self.lookup_file, "r") as f:
-            return json.load(f)
+        stat = os.stat(self.lookup_file)
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._cache.get(self.lookup_file)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with phase("registry.load_index") as record, open(self.lookup_file) as f:
+            projects_dict = json.load(f)
+            record["bytes_read"] = file_size(f)
+        self._cache[self.lookup_file] = (signature, projects_dict)
+        return projects_dict
 
     def _save_index(self, projects_dict: dict) -> None:
-        with open(self.lookup_file, "w") as f:
-            json.dump(projects_dict, f, indent=4)
+        write_json_atomically(self.lookup_file, projects_dict, indent=4)
+        stat = os.stat(self.lookup_file)
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self._cache[self.lookup_file] = (signature, projects_dict)
 
     def _index_projects(self, projects_path: str = "") -> None:
-        projects_path = projects_path or self.projects_path
+        projects_path = os.path.abspath(projects_path or self.projects_path)
+        self._save_index(self._scan_vaults({"projects": {}}, [projects_path]))
 
-        projects_dict: dict = {"projects": {}}
-        files = os.listdir(projects_path)
+    def rebuild_index(self, max_workers: int = 8) -> dict:
+        """Rescan every known vault and return how many were re-read.
 
-        # check if the project file exists
-        for file in files:
-            if file not in [self.lookup_filename, ".DS_Store"]:
-                projects_dict["projects"][file.split(".")[0]] = os.path.abspath(
-                    f"{projects_path}/{file}"
+        Each vault's directory mtime and the stat of every project file are
+        kept in the index's ``scan`` section. Vaults whose directory and
+        SQLite database are unchanged since the last pass are not listed
+        again, the others are scanned in parallel. Writing the index touches
+        its own directory, so the default vault is always listed.
+        """
+        projects_dict = self.get_index()
+        vault_paths = {os.path.abspath(path) for path in self.list_vaults()}
+        vault_paths.update(projects_dict.get("scan", {}))
+        vault_paths.add(os.path.abspath(self.projects_path))
+        stats: dict = {}
+        projects_dict = self._scan_vaults(
+            projects_dict, sorted(vault_paths), max_workers, stats
+        )
+        self._save_index(projects_dict)
+        return stats
+
+    def _scan_vaults(
+        self,
+        projects_dict: dict,
+        vault_paths: list,
+        max_workers: int = 1,
+        stats: Optional[dict] = None,
+    ) -> dict:
+        previous_scan = projects_dict.get("scan", {})
+        jobs = [(path, previous_scan.get(path)) for path in vault_paths]
+        if max_workers > 1 and len(jobs) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(min(max_workers, len(jobs))) as executor:
+                results = list(executor.map(lambda job: self._scan_vault(*job), jobs))
+        else:
+            results = [self._scan_vault(*job) for job in jobs]
+
+        scan: dict = {}
+        found: dict = {}
+        unreachable = set()
+        for (directory, previous), result in zip(jobs, results):
+            if result is None:
+                # keep what we knew about vaults that can't be read right now
+                unreachable.add(directory)
+                if previous is not None:
+                    scan[directory] = previous
+                continue
+            scan[directory] = result
+            for project_name in result["projects"]:
+                found.setdefault(project_name, []).append(
+                    f"{directory}/{project_name}{PROJECT_SUFFIX}"
                 )
 
-        self._save_index(projects_dict)
+        projects = {}
+        for project_name, project_path in projects_dict["projects"].items():
+            if os.path.dirname(os.path.abspath(project_path)) in unreachable:
+                projects[project_name] = project_path
+        for project_name, paths in found.items():
+            # a name found in several vaults stays where the index had it
+            current = os.path.abspath(projects_dict["projects"].get(project_name, ""))
+            projects[project_name] = current if current in paths else paths[0]
+
+        if stats is not None:
+            stats["vaults"] = len(jobs)
+            stats["rescanned"] = sum(
+                1
+                for (_, previous), result in zip(jobs, results)
+                if result is not None and result is not previous
+            )
+            stats["unreachable"] = len(unreachable)
+            stats["projects"] = len(projects)
+        return {**projects_dict, "projects": projects, "scan": scan}
+
+    def _scan_vault(self, directory: str, previous: Optional[dict]):
+        """Scan record of a vault directory, ``previous`` if it is unchanged."""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        database = _file_signature(f"{directory}/{SQLITE_FILENAME}")
+        if (
+            previous is not None
+            and previous["mtime_ns"] == mtime_ns
+            and previous["database"] == database
+        ):
+            return previous
+
+        files = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = entry.name
+                # only project files are indexed, sidecar files share the name
+                if not name.endswith(PROJECT_SUFFIX) or name in REGISTRY_FILENAMES:
+                    continue
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[name] = [stat.st_mtime_ns, stat.st_size]
+        projects = [name[: -len(PROJECT_SUFFIX)] for name in sorted(files)]
+
+        database_projects: list = []
+        if database is not None:
+            if previous is not None and previous["database"] == database:
+                database_projects = previous["database_projects"]
+            else:
+                with SqliteVault(directory) as vault:
+                    database_projects = sorted(vault.list_projects())
+
+        return {
+            "mtime_ns": mtime_ns,
+            "files": files,
+            "database": database,
+            "database_projects": database_projects,
+            "projects": sorted(set(projects) | set(database_projects)),
+        }
 
     def get_index(self) -> dict:
-        return self._load_index()
+        return copy.deepcopy(self._load_index())
 
     def update_index(self, project_path: str, project_name: str) -> None:
-        projects_dict = self._load_index()
-        projects_dict["projects"][project_name] = f"{project_path}/{project_name}.json"
+        projects_dict = copy.deepcopy(self._load_index())
+        projects_dict["projects"][project_name] = (
+            f"{project_path}/{project_name}{PROJECT_SUFFIX}"
+        )
         self._save_index(projects_dict)
 
     def list_vaults(self) -> list:
@@ -65,7 +424,7 @@ class ProjectRegistry:
         return list(self._load_index()["projects"].keys())
 
     def exists(self, project_name: str) -> bool:
-        return project_name in self.list_projects()
+        return project_name in self._load_index()["projects"]
 
     def get_project_vault_path(self, project_name: str) -> str:
         try:
@@ -75,6 +434,209 @@ class ProjectRegistry:
         except KeyError:
             raise ProjectNotFoundError(project_name)
 
+    def running_timers(self) -> dict:
+        """Start time by project and role of every timer that is running.
+
+        The table lives in its own small file next to the index, so toggles
+        never rewrite the index and its scan records.
+        """
+        try:
+            with open(self.running_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def update_running(self, project: Project) -> None:
+        """Replace a project's row with the timers open in it."""
+        running = self.running_timers()
+        role_names = {
+            role_name: project.time_entries[index].start_time
+            for role_name, index in sorted(project.open_timers().items())
+        }
+        if role_names == running.get(project.name, {}):
+            return
+        if role_names:
+            running[project.name] = role_names
+        else:
+            del running[project.name]
+        self._save_running(running)
+
+    def rebuild_running(self) -> dict:
+        """Rebuild the active-timers table from every project's open entries.
+
+        Projects that can't be read keep no timers; the rebuilt table is
+        returned as well as saved.
+        """
+        running: dict = {}
+        for project_name in sorted(self.list_projects()):
+            directory = self.get_project_vault_path(project_name)
+            try:
+                project = self._load_project(directory, project_name)
+            except (OSError, ValueError, ProjectNotFoundError):
+                continue
+            open_timers = project.open_timers()
+            if open_timers:
+                running[project_name] = {
+                    role_name: project.time_entries[index].start_time
+                    for role_name, index in sorted(open_timers.items())
+                }
+        self._save_running(running)
+        return running
+
+    def _load_project(self, directory: str, project_name: str) -> Project:
+        vault = open_vault(directory, project_name)
+        if isinstance(vault, SqliteVault):
+            with vault:
+                return vault.load(project_name)
+        return vault.load(project_name)
+
+    def _save_running(self, running: dict) -> None:
+        write_json_atomically(self.running_file, running)
+
+
+class SqliteProjectRegistry(ProjectRegistry):
+    """Project registry kept in an indexed SQLite table.
+
+    Name lookups and updates touch a single row instead of parsing and
+    rewriting the whole index. Other sections of the index are stored as
+    JSON documents next to the project table.
+    """
+
+    def __init__(self):
+        self.projects_path = vault_path()
+        os.makedirs(self.projects_path, exist_ok=True)
+        self.lookup_filename = INDEX_DB_FILENAME
+        self.lookup_file = f"{self.projects_path}/{self.lookup_filename}"
+        indexed = os.path.exists(self.lookup_file)
+        # sqlite3 is imported on demand to keep CLI startup fast
+        import sqlite3
+
+        self.connection = sqlite3.connect(self.lookup_file)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS projects (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sections (
+                name TEXT PRIMARY KEY,
+                document TEXT NOT NULL
+            );
+            """
+        )
+        if not indexed:
+            self._index_projects()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _load_index(self) -> dict:
+        projects_dict: dict = {"projects": dict(self._rows("projects"))}
+        for name, document in self._rows("sections"):
+            projects_dict[name] = json.loads(document)
+        return projects_dict
+
+    def _save_index(self, projects_dict: dict) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM projects")
+            self.connection.execute("DELETE FROM sections")
+            self.connection.executemany(
+                "INSERT INTO projects (name, path) VALUES (?, ?)",
+                projects_dict["projects"].items(),
+            )
+            self.connection.executemany(
+                "INSERT INTO sections (name, document) VALUES (?, ?)",
+                (
+                    (name, json.dumps(section))
+                    for name, section in projects_dict.items()
+                    if name != "projects"
+                ),
+            )
+
+    def get_index(self) -> dict:
+        return self._load_index()
+
+    def update_index(self, project_path: str, project_name: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO projects (name, path) VALUES (?, ?)",
+                (project_name, f"{project_path}/{project_name}{PROJECT_SUFFIX}"),
+            )
+
+    def list_vaults(self) -> list:
+        rows = self.connection.execute("SELECT path FROM projects")
+        return list(set(os.path.dirname(path) for (path,) in rows))
+
+    def list_projects(self) -> list:
+        return [
+            name for (name,) in self.connection.execute("SELECT name FROM projects")
+        ]
+
+    def exists(self, project_name: str) -> bool:
+        return self._project_path(project_name) is not None
+
+    def get_project_vault_path(self, project_name: str) -> str:
+        project_filepath = self._project_path(project_name)
+        if project_filepath is None:
+            raise ProjectNotFoundError(project_name)
+        return str(os.path.dirname(project_filepath))
+
+    def running_timers(self) -> dict:
+        row = self.connection.execute(
+            "SELECT document FROM sections WHERE name = 'running'"
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _project_path(self, project_name: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT path FROM projects WHERE name = ?", (project_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _save_running(self, running: dict) -> None:
+        self._save_section("running", running)
+
+    def _save_section(self, name: str, section: dict) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sections (name, document) VALUES (?, ?)",
+                (name, json.dumps(section)),
+            )
+
+    def _rows(self, table: str) -> list:
+        return self.connection.execute(f"SELECT * FROM {table}").fetchall()
+
+
+def open_registry() -> ProjectRegistry:
+    """The SQLite registry once it has been created, else the JSON one."""
+    if os.path.exists(os.path.join(vault_path(), INDEX_DB_FILENAME)):
+        return SqliteProjectRegistry()
+    return ProjectRegistry()
+
+
+def convert_registry(target_format: str) -> ProjectRegistry:
+    """Copy the current registry into the JSON or SQLite format."""
+    source = open_registry()
+    projects_dict = copy.deepcopy(source._load_index())
+    # running timers are a section of the SQLite registry, a file otherwise
+    projects_dict.pop("running", None)
+    running = source.running_timers()
+    database = os.path.join(vault_path(), INDEX_DB_FILENAME)
+    if target_format == "sqlite":
+        target: ProjectRegistry = SqliteProjectRegistry()
+        target._save_index(projects_dict)
+        target._save_running(running)
+        return target
+
+    if isinstance(source, SqliteProjectRegistry):
+        source.close()
+    if os.path.exists(database):
+        os.remove(database)
+    target = ProjectRegistry()
+    target._save_index(projects_dict)
+    target._save_running(running)
+    return target
+
 
 class VaultAdapter(ABC):
     """Abstract interface for vault storage backends"""
@@ -100,40 +662,1275 @@ class VaultAdapter(ABC):
     def exists(self, project_name: str) -> bool:
         """Check if a project exists"""
 
+    def stream(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> ProjectStream:
+        """Load a project's roles, its time entries are read on iteration"""
+        project = self.load(project_name)
+        time_entries = in_range(project.time_entries, since, until)
+        return ProjectStream(project.name, project.roles, time_entries)
+
+    def rewrite(self, project: Project) -> None:
+        """Save a project whose earlier entries were inserted or changed."""
+        self.save(project)
+
+    def last_time_entry(self, project_name: str) -> Optional[TimeEntry]:
+        """The project's most recent time entry, None if it has none."""
+        last_time_entry = None
+        for last_time_entry in self.stream(project_name).time_entries:
+            pass
+        return last_time_entry
+
 
 class FileVault(VaultAdapter):
-    def __init__(self, base_path):
+    # bytes read from the end of a project file to find its last entry
+    tail_block = 4096
+
+    def __init__(self, base_path, compact: bool = False):
         os.makedirs(base_path, exist_ok=True)
         self.base_path = base_path
+        self.compact = compact
 
     def use_vault(self, vault_path: str) -> None:
         self.base_path = vault_path
 
     def path(self, project_name: str) -> str:
-        return f"{self.base_path}/{project_name}.json"
+        return f"{self.base_path}/{project_name}{PROJECT_SUFFIX}"
 
     def load(self, project_name: str) -> Project:
-        if self.exists(project_name):
-            with open(self.path(project_name), "r") as f:
-                project_dict = json.load(f)
-            return self._load_objects(project_dict)
-        else:
+        return self._load_objects(self._load_header(project_name))
+
+    def stream(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> ProjectStream:
+        if not self.exists(project_name):
             raise ProjectNotFoundError(project_name)
 
+        header: dict = {"name": str(project_name), "roles": []}
+        has_entries = False
+        with open(self.path(project_name), "r") as f:
+            for key, value in iter_json_members(f):
+                if key == "time_entries":
+                    has_entries = True
+                    break
+                if key == "roles":
+                    header["roles"].append(Role(**value))
+                else:
+                    header[key] = value
+
+        if not has_entries:
+            return ProjectStream(header["name"], header["roles"])
+
+        # the file is opened again when the entries are iterated, so a stream
+        # that is dropped half way closes it with its generator
+        def time_entries() -> Iterator[TimeEntry]:
+            with open(self.path(project_name), "r") as f:
+                for key, value in iter_json_members(f):
+                    if key == "time_entries":
+                        yield TimeEntry(**value)
+
+        return ProjectStream(
+            header["name"], header["roles"], in_range(time_entries(), since, until)
+        )
+
     def save(self, project: Project) -> None:
         project_path = self.path(project.name)
         file_path = os.path.join(os.getcwd(), project_path)
 
-        with open(file_path, "w") as f:
-            json.dump(asdict(project), f, indent=4)
+        with phase("vault.dump") as record, open(file_path, "w") as f:
+            self.write_project(project, f)
+            record["bytes_written"] = f.tell()
 
     def exists(self, project_name: str) -> bool:
         return os.path.exists(self.path(project_name))
 
+    def last_time_entry(self, project_name: str) -> Optional[TimeEntry]:
+        """The last entry, parsed from the end of the project file.
+
+        Blocks are read backwards until the last element of the trailing
+        ``time_entries`` array parses; files laid out otherwise are streamed.
+        """
+        if not self.exists(project_name):
+            raise ProjectNotFoundError(project_name)
+        decoder = json.JSONDecoder()
+        with phase("vault.tail") as record, open(self.path(project_name), "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            block = self.tail_block
+            while True:
+                f.seek(max(size - block, 0))
+                tail = f.read().decode(errors="ignore")
+                record["bytes_read"] = len(tail)
+                pos = len(tail)
+                while True:
+                    pos = tail.rfind("{", 0, pos)
+                    if pos < 0:
+                        break
+                    try:
+                        value, end = decoder.raw_decode(tail, pos)
+                    except ValueError:
+                        continue
+                    rest = "".join(tail[end:].split())
+                    if isinstance(value, dict) and rest == "]}":
+                        return TimeEntry(**value)
+                if block >= size:
+                    break
+                block *= 4
+        return super().last_time_entry(project_name)
+
+    def read_project(self, f) -> Project:
+        """Parse a project from an open file in the readable JSON format."""
+        return self._load_objects(json.load(f))
+
+    def write_project(self, project: Project, f) -> None:
+        """Write a project to an open file in the readable JSON format."""
+        json.dump(self._dump_objects(project), f, indent=4)
+
+    def _load_header(self, project_name: str) -> dict:
+        """The project file's contents, entries included for a plain vault."""
+        if not self.exists(project_name):
+            raise ProjectNotFoundError(project_name)
+        with phase("vault.parse") as record, open(self.path(project_name)) as f:
+            record["bytes_read"] = file_size(f)
+            return json.load(f)
+
     def _load_objects(self, project_dict: dict) -> Project:
-        project = Project(**project_dict)
-        project.roles = [Role(**role_dict) for role_dict in project_dict["roles"]]
-        project.time_entries = [
-            TimeEntry(**te_dict) for te_dict in project_dict["time_entries"]
+        with phase("vault.build") as record:
+            project = Project(**project_dict)
+            project.roles = [Role(**role_dict) for role_dict in project_dict["roles"]]
+            if self.compact:
+                project.time_entries = CompactTimeEntries.from_dicts(
+                    project_dict["time_entries"]
+                )
+            else:
+                project.time_entries = [
+                    TimeEntry(**te_dict) for te_dict in project_dict["time_entries"]
+                ]
+            record["entries"] = len(project.time_entries)
+        return project
+
+    def _dump_objects(self, project: Project) -> dict:
+        if isinstance(project.time_entries, CompactTimeEntries):
+            project_dict = asdict(replace(project, time_entries=[]))
+            project_dict["time_entries"] = project.time_entries.to_dicts()
+            return project_dict
+        return asdict(project)
+
+
+class JournalVault(FileVault):
+    """File vault that appends start/stop events to a journal on save.
+
+    The project file written by FileVault acts as a snapshot; events recorded
+    since then live in a JSON lines journal next to it and are replayed on
+    load. The snapshot is rewritten when the journal grows past
+    ``snapshot_every`` records or when a change can't be expressed as events
+    (edited roles, removed entries or a different open entry). Closed entries
+    are treated as immutable, call ``snapshot`` after editing one by hand.
+    Only the last entry of each role is expected to be open.
+    """
+
+    snapshot_every = 500
+
+    def __init__(self, base_path, compact: bool = False):
+        super().__init__(base_path, compact)
+        self._synced: dict = {}
+
+    def journal_path(self, project_name: str) -> str:
+        return f"{self.base_path}/{project_name}{JOURNAL_SUFFIX}"
+
+    def load(self, project_name: str) -> Project:
+        project = super().load(project_name)
+        records = self._read_journal(project.name)
+        self._replay(project, records)
+        self._remember(project, len(records))
+        return project
+
+    def stream(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> ProjectStream:
+        snapshot = super().stream(project_name)
+        records = self._read_journal(snapshot.name)
+        if not records:
+            time_entries = in_range(snapshot.time_entries, since, until)
+            return ProjectStream(snapshot.name, snapshot.roles, time_entries)
+
+        stops = {
+            (record["role_name"], record["start_time"]): record["end_time"]
+            for record in records
+            if record["op"] == "stop"
+        }
+
+        def time_entries() -> Iterator[TimeEntry]:
+            last_starts = {}
+            for time_entry in snapshot.time_entries:
+                key = (time_entry.role_name, time_entry.start_time)
+                if time_entry.is_open() and key in stops:
+                    time_entry.end_time = stops[key]
+                last_starts[time_entry.role_name] = time_entry.start_time
+                yield time_entry
+
+            # same idempotent replay as load for the journaled starts
+            for record in records:
+                role_name, start_time = record["role_name"], record["start_time"]
+                if record["op"] == "start" and last_starts.get(role_name) != start_time:
+                    last_starts[role_name] = start_time
+                    yield TimeEntry(
+                        role_name, start_time, stops.get((role_name, start_time), "")
+                    )
+
+        return ProjectStream(
+            snapshot.name, snapshot.roles, in_range(time_entries(), since, until)
+        )
+
+    def save(self, project: Project) -> None:
+        events = self._events(project)
+        if events is None:
+            self.snapshot(project)
+            return
+
+        journal_length = self._synced[project.name]["journal"] + len(events)
+        if journal_length > self.snapshot_every:
+            self.snapshot(project)
+            return
+
+        if events:
+            with phase("journal.append") as record:
+                with open(self.journal_path(project.name), "a") as f:
+                    start = f.tell()
+                    f.writelines(
+                        json.dumps(event, separators=(",", ":")) + "\n"
+                        for event in events
+                    )
+                    record["bytes_written"] = f.tell() - start
+                record["records"] = len(events)
+        self._remember(project, journal_length)
+
+    def last_time_entry(self, project_name: str) -> Optional[TimeEntry]:
+        """The snapshot's last entry with the journal's starts and stops on top."""
+        last_time_entry = super().last_time_entry(project_name)
+        records = self._read_journal(project_name)
+        starts = [record for record in records if record["op"] == "start"]
+        if starts:
+            last_time_entry = TimeEntry(
+                starts[-1]["role_name"], starts[-1]["start_time"]
+            )
+        if last_time_entry is not None and last_time_entry.is_open():
+            for record in records:
+                if record["op"] == "stop" and (
+                    record["role_name"],
+                    record["start_time"],
+                ) == (last_time_entry.role_name, last_time_entry.start_time):
+                    last_time_entry.end_time = record["end_time"]
+        return last_time_entry
+
+    def rewrite(self, project: Project) -> None:
+        # journal events only describe appends and stops of open entries
+        self.snapshot(project)
+
+    def snapshot(self, project: Project) -> None:
+        """Rewrite the project file and truncate the journal."""
+        super().save(project)
+        if os.path.exists(self.journal_path(project.name)):
+            os.remove(self.journal_path(project.name))
+        self._remember(project, 0)
+
+    def _read_journal(self, project_name: str) -> list:
+        if not os.path.exists(self.journal_path(project_name)):
+            return []
+        with phase("journal.read") as record:
+            with open(self.journal_path(project_name), "r") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+                record["bytes_read"] = file_size(f)
+            record["records"] = len(records)
+        return records
+
+    def _replay(self, project: Project, records: list) -> None:
+        with phase("journal.replay") as record:
+            record["records"] = len(records)
+            self._apply(project, records)
+
+    def _apply(self, project: Project, records: list) -> None:
+        entries = project.time_entries
+
+        for record in records:
+            role_name = record["role_name"]
+
+            # replay is idempotent so a crash between writing the snapshot
+            # and removing the journal doesn't duplicate entries
+            if record["op"] == "start":
+                tail = project.last_time_entry(role_name)
+                if tail.start_time != record["start_time"]:
+                    entries.append(TimeEntry(role_name, record["start_time"]))
+            elif record["op"] == "stop":
+                index = project.open_timers().get(role_name)
+                if index is None:
+                    continue
+                tail = entries[index]
+                if tail.start_time == record["start_time"]:
+                    tail.end_time = record["end_time"]
+                    entries[index] = tail
+
+    def _remember(self, project: Project, journal_length: int) -> None:
+        self._synced[project.name] = {
+            "roles": [asdict(role) for role in project.roles],
+            "entries": len(project.time_entries),
+            "open": {
+                index: (role_name, project.time_entries[index].start_time)
+                for role_name, index in project.open_timers().items()
+            },
+            "journal": journal_length,
+        }
+
+    def _events(self, project: Project):
+        """Events since the last load or save, None if a snapshot is needed."""
+        state = self._synced.get(project.name)
+        entries = project.time_entries
+        if state is None or len(entries) < state["entries"]:
+            return None
+        if state["roles"] != [asdict(role) for role in project.roles]:
+            return None
+
+        events = []
+        for index, (role_name, start_time) in state["open"].items():
+            entry = entries[index]
+            if (entry.role_name, entry.start_time) != (role_name, start_time):
+                return None
+            if entry.end_time:
+                events.append(self._stop_event(entry))
+
+        for entry in entries[state["entries"] :]:
+            events.append(
+                {
+                    "op": "start",
+                    "role_name": entry.role_name,
+                    "start_time": entry.start_time,
+                }
+            )
+            if entry.end_time:
+                events.append(self._stop_event(entry))
+        return events
+
+    def _stop_event(self, entry: TimeEntry) -> dict:
+        return {
+            "op": "stop",
+            "role_name": entry.role_name,
+            "start_time": entry.start_time,
+            "end_time": entry.end_time,
+        }
+
+
+class SegmentedVault(FileVault):
+    """File vault that shards a project's time entries into monthly segments.
+
+    The project file keeps the name and roles, the entries live in
+    ``<name>.segments/YYYY-MM.json`` sorted by start time. A manifest records
+    every segment's entry count, first and last start and checksum, so a
+    ranged stream only opens the months that overlap the range. Like
+    JournalVault, a save only reads and writes the months of new and stopped
+    entries; closed entries are treated as immutable and ``rewrite`` writes
+    every segment after other edits.
+    """
+
+    manifest_filename = "manifest.json"
+
+    def __init__(self, base_path, compact: bool = False):
+        super().__init__(base_path, compact)
+        self._synced: dict = {}
+
+    def manifest_path(self, project_name: str) -> str:
+        return f"{self.segments_path(project_name)}/{self.manifest_filename}"
+
+    def segments_path(self, project_name: str) -> str:
+        return f"{self.base_path}/{project_name}{SEGMENTS_SUFFIX}"
+
+    def segment_path(self, project_name: str, month: str) -> str:
+        return f"{self.segments_path(project_name)}/{month}{PROJECT_SUFFIX}"
+
+    def load(self, project_name: str) -> Project:
+        project_dict = self._load_header(project_name)
+        project_dict["time_entries"] = [
+            te_dict
+            for month in sorted(self.load_manifest(project_name))
+            for te_dict in self._read_segment(project_name, month)
         ]
+        project = self._load_objects(project_dict)
+        self._remember(project)
         return project
+
+    def stream(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> ProjectStream:
+        """Stream the entries starting in [since, until).
+
+        Segments outside the range are never opened, the entries of the
+        others are filtered by parsed start time like every other vault's.
+        """
+        project_dict = self._load_header(project_name)
+        roles = [Role(**role_dict) for role_dict in project_dict["roles"]]
+        manifest = self.load_manifest(project_name)
+        months = [
+            month
+            for month, segment in sorted(manifest.items())
+            if _overlaps(segment, since, until)
+        ]
+
+        def time_entries() -> Iterator[TimeEntry]:
+            for month in months:
+                te_dicts = self._read_segment(project_name, month)
+                yield from in_range(
+                    (TimeEntry(**te_dict) for te_dict in te_dicts), since, until
+                )
+
+        return ProjectStream(project_dict["name"], roles, time_entries())
+
+    def save(self, project: Project) -> None:
+        if not self._save_changes(project):
+            self.rewrite(project)
+
+    def rewrite(self, project: Project) -> None:
+        """Write every segment that changed, the manifest and project file."""
+        if isinstance(project.time_entries, CompactTimeEntries):
+            te_dicts = project.time_entries.to_dicts()
+        else:
+            te_dicts = [asdict(te) for te in project.time_entries]
+        te_dicts.sort(key=lambda te_dict: te_dict["start_time"])
+
+        segments: dict = {}
+        for te_dict in te_dicts:
+            segments.setdefault(te_dict["start_time"][:7], []).append(te_dict)
+
+        os.makedirs(self.segments_path(project.name), exist_ok=True)
+        old_manifest = self.load_manifest(project.name)
+        manifest = {}
+        for month, segment in segments.items():
+            manifest[month] = self._describe(segment)
+            if old_manifest.get(month) != manifest[month]:
+                write_json_atomically(self.segment_path(project.name, month), segment)
+
+        for month in old_manifest.keys() - manifest.keys():
+            segment_path = self.segment_path(project.name, month)
+            if os.path.exists(segment_path):
+                os.remove(segment_path)
+
+        write_json_atomically(self.manifest_path(project.name), {"segments": manifest})
+        project_dict = self._dump_objects(replace(project, time_entries=[]))
+        write_json_atomically(self.path(project.name), project_dict, indent=4)
+        self._remember(project)
+
+    def _remember(self, project: Project) -> None:
+        self._synced[project.name] = {
+            "roles": [asdict(role) for role in project.roles],
+            "entries": len(project.time_entries),
+            "manifest": _file_signature(self.manifest_path(project.name)),
+            "open": {
+                index: (role_name, project.time_entries[index].start_time)
+                for role_name, index in project.open_timers().items()
+            },
+        }
+
+    def _save_changes(self, project: Project) -> bool:
+        """Write the months of new and stopped entries, False if that won't do."""
+        state = self._synced.get(project.name)
+        entries = project.time_entries
+        if state is None or len(entries) < state["entries"]:
+            return False
+        if state["roles"] != [asdict(role) for role in project.roles]:
+            return False
+        manifest_path = self.manifest_path(project.name)
+        if state["manifest"] is None or (
+            _file_signature(manifest_path) != state["manifest"]
+        ):
+            # written by someone else since
+            return False
+
+        stopped = []
+        for index, (role_name, start_time) in state["open"].items():
+            entry = entries[index]
+            if (entry.role_name, entry.start_time) != (role_name, start_time):
+                return False
+            if entry.end_time:
+                stopped.append(entry)
+        added = [entries[index] for index in range(state["entries"], len(entries))]
+        if not stopped and not added:
+            return True
+
+        manifest = self.load_manifest(project.name)
+        segments: dict = {}
+        for entry in stopped + added:
+            month = entry.start_time[:7]
+            if month not in segments:
+                segments[month] = (
+                    self._read_segment(project.name, month) if month in manifest else []
+                )
+        for entry in stopped:
+            segment = segments[entry.start_time[:7]]
+            key = (entry.role_name, entry.start_time, "")
+            for te_dict in segment:
+                if (
+                    te_dict["role_name"],
+                    te_dict["start_time"],
+                    te_dict["end_time"],
+                ) == key:
+                    te_dict["end_time"] = entry.end_time
+                    break
+            else:
+                return False
+        for entry in added:
+            segments[entry.start_time[:7]].append(asdict(entry))
+
+        with phase("segments.patch") as record:
+            for month, segment in sorted(segments.items()):
+                segment.sort(key=lambda te_dict: te_dict["start_time"])
+                write_json_atomically(self.segment_path(project.name, month), segment)
+                manifest[month] = self._describe(segment)
+            record["segments"] = len(segments)
+        write_json_atomically(manifest_path, {"segments": manifest})
+        self._remember(project)
+        return True
+
+    def _describe(self, segment: list) -> dict:
+        """A segment's manifest record."""
+        return {
+            "entries": len(segment),
+            "first": segment[0]["start_time"],
+            "last": segment[-1]["start_time"],
+            **_start_bounds(segment),
+            "checksum": zlib.crc32(json.dumps(segment).encode()),
+        }
+
+    def last_time_entry(self, project_name: str) -> Optional[TimeEntry]:
+        """The last entry of the latest month, no other segment is read."""
+        if not self.exists(project_name):
+            raise ProjectNotFoundError(project_name)
+        manifest = self.load_manifest(project_name)
+        if not manifest:
+            return None
+        return TimeEntry(**self._read_segment(project_name, max(manifest))[-1])
+
+    def load_manifest(self, project_name: str) -> dict:
+        manifest_path = self.manifest_path(project_name)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "r") as f:
+            return json.load(f)["segments"]
+
+    def _read_segment(self, project_name: str, month: str) -> list:
+        with open(self.segment_path(project_name, month), "r") as f:
+            return json.load(f)
+
+
+class BinaryVault(FileVault):
+    """File vault that packs time entries into fixed-width binary records.
+
+    The project file keeps the name and roles, the entries live in
+    ``<name>.entries``: a magic number, a length-prefixed JSON header with
+    the role names that record role ids point into, then one record per
+    entry. The file is read through ``mmap``, so the last entry is a single
+    unpack at the end of the file and loading copies each column out of the
+    records in one go. Like JournalVault, a save appends new records and
+    patches the ones of stopped timers in place; closed entries are treated
+    as immutable and ``rewrite`` writes the whole file after other edits.
+    """
+
+    magic = b"TKB1"
+    header_struct = struct.Struct("<4sI")
+    # role id, spelled flags, padding, start ticks, end ticks
+    record_struct = struct.Struct("<IB3xqq")
+
+    def __init__(self, base_path, compact: bool = False):
+        super().__init__(base_path, compact)
+        self._synced: dict = {}
+
+    def entries_path(self, project_name: str) -> str:
+        return f"{self.base_path}/{project_name}{BINARY_SUFFIX}"
+
+    def load(self, project_name: str) -> Project:
+        project_dict = self._load_header(project_name)
+        project_dict["time_entries"] = []
+        project = self._load_objects(project_dict)
+        with phase("binary.unpack") as record:
+            with self._map(project_name) as (header, records):
+                role_ids, spelled, starts, ends = self._columns(records)
+                record["bytes_read"] = len(records)
+            record["entries"] = len(starts)
+        time_entries = CompactTimeEntries.from_columns(
+            header["role_names"],
+            role_ids,
+            starts,
+            ends,
+            spelled,
+            self._spellings(header),
+        )
+        project.time_entries = time_entries if self.compact else list(time_entries)
+        self._remember(project, header["role_names"])
+        return project
+
+    def stream(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> ProjectStream:
+        project_dict = self._load_header(project_name)
+        roles = [Role(**role_dict) for role_dict in project_dict["roles"]]
+
+        def time_entries() -> Iterator[TimeEntry]:
+            with self._map(project_name) as (header, records):
+                entries = self._entries(header)
+                unpack_from, size = (
+                    self.record_struct.unpack_from,
+                    self.record_struct.size,
+                )
+                for row, offset in enumerate(range(0, len(records), size)):
+                    yield entries.entry(row, *unpack_from(records, offset))
+
+        return ProjectStream(
+            project_dict["name"], roles, in_range(time_entries(), since, until)
+        )
+
+    def last_time_entry(self, project_name: str) -> Optional[TimeEntry]:
+        if not self.exists(project_name):
+            raise ProjectNotFoundError(project_name)
+        with self._map(project_name) as (header, records):
+            if not records:
+                return None
+            rows = len(records) // self.record_struct.size
+            record = self.record_struct.unpack_from(
+                records, len(records) - self.record_struct.size
+            )
+            return self._entries(header).entry(rows - 1, *record)
+
+    def save(self, project: Project) -> None:
+        if not self._save_changes(project):
+            self.rewrite(project)
+
+    def rewrite(self, project: Project) -> None:
+        """Write the whole entries file and the project file."""
+        time_entries = project.time_entries
+        if not isinstance(time_entries, CompactTimeEntries):
+            time_entries = CompactTimeEntries(time_entries)
+        header = json.dumps(
+            {
+                "role_names": time_entries.role_names,
+                "spellings": [
+                    [row, flag, text]
+                    for (row, flag), text in sorted(time_entries.spellings.items())
+                ],
+            }
+        ).encode()
+        pack = self.record_struct.pack
+        records = b"".join(
+            pack(role_id, spelled, start, end)
+            for role_id, spelled, start, end in zip(
+                time_entries.role_ids,
+                time_entries.spelled,
+                time_entries.starts,
+                time_entries.ends,
+            )
+        )
+
+        entries_path = self.entries_path(project.name)
+        temp_path = f"{entries_path}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+        try:
+            with open(temp_path, "xb") as f:
+                f.write(self.header_struct.pack(self.magic, len(header)))
+                f.write(header)
+                f.write(records)
+            os.replace(temp_path, entries_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        project_dict = self._dump_objects(replace(project, time_entries=[]))
+        write_json_atomically(self.path(project.name), project_dict, indent=4)
+        self._remember(project, time_entries.role_names)
+
+    def _remember(self, project: Project, role_names: list) -> None:
+        mtime, size = _file_signature(self.entries_path(project.name))
+        count = len(project.time_entries)
+        self._synced[project.name] = {
+            "roles": [asdict(role) for role in project.roles],
+            "role_names": list(role_names),
+            "entries": count,
+            "mtime": mtime,
+            "offset": size - count * self.record_struct.size,
+            "open": {
+                index: (role_name, project.time_entries[index].start_time)
+                for role_name, index in project.open_timers().items()
+            },
+        }
+
+    def _save_changes(self, project: Project) -> bool:
+        """Append new records and patch stopped ones, False if that won't do."""
+        state = self._synced.get(project.name)
+        entries = project.time_entries
+        if state is None or len(entries) < state["entries"]:
+            return False
+        if state["roles"] != [asdict(role) for role in project.roles]:
+            return False
+        size = self.record_struct.size
+        entries_path = self.entries_path(project.name)
+        expected_size = state["offset"] + state["entries"] * size
+        if _file_signature(entries_path) != [state["mtime"], expected_size]:
+            # written by someone else since
+            return False
+
+        rows = []
+        for index, (role_name, start_time) in state["open"].items():
+            entry = entries[index]
+            if (entry.role_name, entry.start_time) != (role_name, start_time):
+                return False
+            if entry.end_time:
+                rows.append(index)
+        rows.extend(range(state["entries"], len(entries)))
+        if not rows:
+            return True
+
+        # packed against the file's role names, a new role or spelling
+        # changes the header and needs a rewrite
+        packed = CompactTimeEntries.from_columns(
+            state["role_names"], array("I"), array("q"), array("q"), array("B")
+        )
+        packed.extend(entries[row] for row in rows)
+        if packed.role_names != state["role_names"] or packed.spellings:
+            return False
+
+        with phase("binary.patch") as record:
+            with open(entries_path, "r+b") as f:
+                for row, values in zip(
+                    rows,
+                    zip(packed.role_ids, packed.spelled, packed.starts, packed.ends),
+                ):
+                    f.seek(state["offset"] + row * size)
+                    f.write(self.record_struct.pack(*values))
+            record["records"] = len(rows)
+            record["bytes_written"] = len(rows) * size
+        self._remember(project, state["role_names"])
+        return True
+
+    def _columns(self, records: memoryview) -> tuple:
+        """Role id, spelled, start and end columns copied out of the records.
+
+        Each column is a strided view of the mapped records, copied into an
+        array at C speed without building a tuple per record.
+        """
+        if sys.byteorder != "little":
+            rows = list(self.record_struct.iter_unpack(records))
+            role_ids, spelled, starts, ends = zip(*rows) if rows else ((),) * 4
+            return (
+                array("I", role_ids),
+                array("B", spelled),
+                array("q", starts),
+                array("q", ends),
+            )
+        # a record is six 32-bit or three 64-bit words, flags are byte 4
+        with records.cast("I") as halves, records.cast("q") as words:
+            return (
+                array("I", halves[0::6].tobytes()),
+                array("B", records[4 :: self.record_struct.size].tobytes()),
+                array("q", words[1::3].tobytes()),
+                array("q", words[2::3].tobytes()),
+            )
+
+    @contextmanager
+    def _map(self, project_name: str) -> Iterator[tuple]:
+        """Map the entries file, yield its header and a view of its records."""
+        with open(self.entries_path(project_name), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, header_size = self.header_struct.unpack_from(mapped)
+                if magic != self.magic:
+                    raise ValueError(f"{f.name} is not a timekeeper entries file")
+                offset = self.header_struct.size + header_size
+                header = json.loads(mapped[self.header_struct.size : offset])
+                records = memoryview(mapped)[offset:]
+                try:
+                    yield header, records
+                finally:
+                    records.release()
+
+    def _entries(self, header: dict) -> CompactTimeEntries:
+        """Empty entries holding the header's roles, to decode records with."""
+        return CompactTimeEntries.from_columns(
+            header["role_names"],
+            array("I"),
+            array("q"),
+            array("q"),
+            array("B"),
+            self._spellings(header),
+        )
+
+    def _spellings(self, header: dict) -> dict:
+        return {(row, flag): text for row, flag, text in header["spellings"]}
+
+
+class RollupStore:
+    """Summary rollups persisted next to a vault's project files."""
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+
+    def path(self, project_name: str) -> str:
+        return f"{self.base_path}/{project_name}{ROLLUP_SUFFIX}"
+
+    def load(self, project_name: str) -> dict:
+        try:
+            with open(self.path(project_name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # a missing or damaged rollup is rebuilt from the entries
+            return {}
+
+    def save(self, project_name: str, rollups: dict) -> None:
+        write_json_atomically(self.path(project_name), rollups)
+
+
+class ArchiveStore:
+    """Compressed, immutable archives of a project's old closed entries.
+
+    Every compaction adds one gzipped JSON segment to ``<name>.archive/``
+    that is never rewritten. The manifest keeps each segment's entry count,
+    first and last start, checksum and its totals in microseconds per day
+    and role, so whole-history summaries never open the segments.
+    """
+
+    manifest_filename = "manifest.json"
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+
+    def archive_path(self, project_name: str) -> str:
+        return f"{self.base_path}/{project_name}{ARCHIVE_SUFFIX}"
+
+    def segment_path(self, project_name: str, segment_name: str) -> str:
+        return f"{self.archive_path(project_name)}/{segment_name}.json.gz"
+
+    def exists(self, project_name: str) -> bool:
+        return os.path.isdir(self.archive_path(project_name))
+
+    def load_manifest(self, project_name: str) -> dict:
+        manifest_path = f"{self.archive_path(project_name)}/{self.manifest_filename}"
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "r") as f:
+            return json.load(f)["segments"]
+
+    def add_segment(self, project_name: str, time_entries: list) -> str:
+        """Archive closed entries as a new segment, returns its name."""
+        te_dicts = sorted(
+            (asdict(te) for te in time_entries),
+            key=lambda te_dict: te_dict["start_time"],
+        )
+        totals: dict = {}
+        for te_dict in te_dicts:
+            self._add_span(totals, TimeEntry(**te_dict))
+
+        os.makedirs(self.archive_path(project_name), exist_ok=True)
+        manifest = self.load_manifest(project_name)
+        segment_name = f"{len(manifest) + 1:06d}"
+        while segment_name in manifest:
+            segment_name = f"{int(segment_name) + 1:06d}"
+        write_json_atomically(
+            self.segment_path(project_name, segment_name), te_dicts, compress=True
+        )
+        manifest[segment_name] = {
+            "entries": len(te_dicts),
+            "first": te_dicts[0]["start_time"],
+            "last": te_dicts[-1]["start_time"],
+            **_start_bounds(te_dicts),
+            "checksum": zlib.crc32(json.dumps(te_dicts).encode()),
+            "totals": totals,
+        }
+        write_json_atomically(
+            f"{self.archive_path(project_name)}/{self.manifest_filename}",
+            {"segments": manifest},
+        )
+        return segment_name
+
+    def time_entries(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> Iterator[TimeEntry]:
+        """Archived entries starting in [since, until), segment by segment."""
+        manifest = self.load_manifest(project_name)
+        for segment_name, segment in sorted(
+            manifest.items(), key=lambda item: item[1]["first"]
+        ):
+            if not _overlaps(segment, since, until):
+                continue
+            te_dicts = self._read_segment(project_name, segment_name)
+            yield from in_range(
+                (TimeEntry(**te_dict) for te_dict in te_dicts), since, until
+            )
+
+    def day_totals(self, project_name: str, since: str = "", until: str = "") -> dict:
+        """Microseconds per day and role of the archived entries.
+
+        The manifest's totals answer whole-history queries; with a bound the
+        overlapping segments are read, since a bound can fall inside a day.
+        """
+        totals: dict = {}
+        if not since and not until:
+            for segment in self.load_manifest(project_name).values():
+                for day, role_names in segment["totals"].items():
+                    day_totals = totals.setdefault(day, {})
+                    for role_name, microseconds in role_names.items():
+                        day_totals[role_name] = (
+                            day_totals.get(role_name, 0) + microseconds
+                        )
+            return totals
+
+        for te in self.time_entries(project_name, since, until):
+            self._add_span(totals, te)
+        return totals
+
+    def remove(self, project_name: str) -> None:
+        import shutil
+
+        shutil.rmtree(self.archive_path(project_name), ignore_errors=True)
+
+    def _add_span(self, totals: dict, time_entry: TimeEntry) -> None:
+        # bucketed by start date, like SummarizeTime
+        day_totals = totals.setdefault(time_entry.start_time[:10], {})
+        day_totals[time_entry.role_name] = (
+            day_totals.get(time_entry.role_name, 0)
+            + to_ticks(time_entry.end_time)
+            - to_ticks(time_entry.start_time)
+        )
+
+    def _read_segment(self, project_name: str, segment_name: str) -> list:
+        import gzip
+
+        with phase("archive.read") as record:
+            with gzip.open(self.segment_path(project_name, segment_name), "rt") as f:
+                te_dicts = json.load(f)
+            record["entries"] = len(te_dicts)
+        return te_dicts
+
+
+class SyncStore:
+    """Sync state persisted next to a vault's project files.
+
+    The vault directory gets a random replica id on its first sync. For
+    every project and every replica it was synced with, it keeps the entry
+    hashes and role rates agreed on at their last sync, and the signature
+    of the project's files then, so an untouched project is recognised
+    without loading it.
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+
+    def path(self, project_name: str) -> str:
+        return f"{self.base_path}/{project_name}{SYNC_SUFFIX}"
+
+    def replica_id(self) -> str:
+        replica_path = f"{self.base_path}/{REPLICA_FILENAME}"
+        try:
+            with open(replica_path, "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            os.makedirs(self.base_path, exist_ok=True)
+            replica_id = os.urandom(8).hex()
+            with open(replica_path, "w") as f:
+                f.write(f"{replica_id}\n")
+            return replica_id
+
+    def load(self, project_name: str, replica_id: str) -> dict:
+        """State of the last sync of a project with another replica."""
+        return self._load_states(project_name).get(replica_id, {})
+
+    def save(self, project_name: str, replica_id: str, state: dict) -> None:
+        states = self._load_states(project_name)
+        states[replica_id] = state
+        write_json_atomically(self.path(project_name), states)
+
+    def signature(self, project_name: str) -> list:
+        """Stat of every file a vault may keep the project in."""
+        base = f"{self.base_path}/{project_name}"
+        paths = [
+            f"{base}{suffix}"
+            for suffix in (PROJECT_SUFFIX, JOURNAL_SUFFIX, BINARY_SUFFIX)
+        ]
+        paths.append(f"{base}{SEGMENTS_SUFFIX}/{SegmentedVault.manifest_filename}")
+        paths.append(f"{base}{ARCHIVE_SUFFIX}/{ArchiveStore.manifest_filename}")
+        paths.append(f"{self.base_path}/{SQLITE_FILENAME}")
+        return [_file_signature(path) for path in paths]
+
+    def _load_states(self, project_name: str) -> dict:
+        try:
+            with open(self.path(project_name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # without a state every entry is compared, nothing is lost
+            return {}
+
+
+def list_vault_projects(directory: str) -> list:
+    """Names of the projects stored in a vault directory."""
+    project_names = set()
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(PROJECT_SUFFIX) and name not in REGISTRY_FILENAMES:
+                project_names.add(name[: -len(PROJECT_SUFFIX)])
+    if os.path.exists(f"{directory}/{SQLITE_FILENAME}"):
+        with SqliteVault(directory) as vault:
+            project_names.update(vault.list_projects())
+    return sorted(project_names)
+
+
+class SqliteVault(VaultAdapter):
+    """Vault storing every project of a directory in one SQLite database.
+
+    Saves run in a transaction and only write what changed since the stored
+    copy: new entries, entries that were open and roles. Like JournalVault,
+    closed entries are treated as immutable; ``rewrite`` replaces a project
+    wholesale after editing one by hand.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS roles (
+            project_id INTEGER NOT NULL REFERENCES projects (id),
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            hourly_rate INTEGER NOT NULL,
+            PRIMARY KEY (project_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS time_entries (
+            project_id INTEGER NOT NULL REFERENCES projects (id),
+            position INTEGER NOT NULL,
+            role_name TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            PRIMARY KEY (project_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS time_entries_role_start
+            ON time_entries (project_id, role_name, start_time);
+        CREATE INDEX IF NOT EXISTS time_entries_open
+            ON time_entries (project_id) WHERE end_time = '';
+    """
+
+    def __init__(self, base_path, compact: bool = False):
+        os.makedirs(base_path, exist_ok=True)
+        self.compact = compact
+        self.connection: Optional["sqlite3.Connection"] = None
+        self.use_vault(base_path)
+
+    def __enter__(self) -> "SqliteVault":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def use_vault(self, vault_path: str) -> None:
+        import sqlite3
+
+        self.close()
+        self.base_path = vault_path
+        self.connection = sqlite3.connect(self.path())
+        self.connection.executescript(self.schema)
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def path(self) -> str:
+        return f"{self.base_path}/{SQLITE_FILENAME}"
+
+    def exists(self, project_name: str) -> bool:
+        return self._project_id(project_name) is not None
+
+    def list_projects(self) -> list:
+        rows = self._db.execute("SELECT name FROM projects ORDER BY name")
+        return [name for (name,) in rows]
+
+    def load(self, project_name: str) -> Project:
+        project_id = self._require_project_id(project_name)
+        roles = self._load_roles(project_id)
+        rows = self._db.execute(
+            "SELECT role_name, start_time, end_time FROM time_entries"
+            " WHERE project_id = ? ORDER BY position",
+            (project_id,),
+        )
+        time_entries: MutableSequence[TimeEntry]
+        with phase("sqlite.load") as record:
+            if self.compact:
+                time_entries = CompactTimeEntries.from_dicts(
+                    {"role_name": r, "start_time": s, "end_time": e} for r, s, e in rows
+                )
+            else:
+                time_entries = [TimeEntry(*row) for row in rows]
+            record["entries"] = len(time_entries)
+        return Project(str(project_name), roles, time_entries)
+
+    def stream(
+        self, project_name: str, since: str = "", until: str = ""
+    ) -> ProjectStream:
+        project_id = self._require_project_id(project_name)
+        rows = self._entry_rows(project_id, since, until)
+        return ProjectStream(
+            str(project_name),
+            self._load_roles(project_id),
+            (TimeEntry(*row) for row in rows),
+        )
+
+    def _load_roles(self, project_id: int) -> list[Role]:
+        return [
+            Role(name, hourly_rate)
+            for name, hourly_rate in self._db.execute(
+                "SELECT name, hourly_rate FROM roles"
+                " WHERE project_id = ? ORDER BY position",
+                (project_id,),
+            )
+        ]
+
+    def load_entries(
+        self, project_name: str, since: str = "", until: str = "", role_name: str = ""
+    ) -> list[TimeEntry]:
+        """Entries starting in [since, until), optionally for one role."""
+        project_id = self._require_project_id(project_name)
+        rows = self._entry_rows(project_id, since, until, role_name)
+        return [TimeEntry(*row) for row in rows]
+
+    def _entry_rows(
+        self, project_id: int, since: str = "", until: str = "", role_name: str = ""
+    ) -> "sqlite3.Cursor":
+        query = "SELECT role_name, start_time, end_time FROM time_entries"
+        query += " WHERE project_id = ?"
+        params: list = [project_id]
+        if role_name:
+            query += " AND role_name = ?"
+            params.append(role_name)
+        if since:
+            query += " AND start_time >= ?"
+            params.append(since)
+        if until:
+            query += " AND start_time < ?"
+            params.append(until)
+        query += " ORDER BY position"
+        return self._db.execute(query, params)
+
+    def load_open_entries(self, project_name: str) -> list[TimeEntry]:
+        """Entries with a running timer, without reading the history."""
+        rows = self._db.execute(
+            "SELECT role_name, start_time, end_time FROM time_entries"
+            " WHERE project_id = ? AND end_time = '' ORDER BY position",
+            (self._require_project_id(project_name),),
+        )
+        return [TimeEntry(*row) for row in rows]
+
+    def save(self, project: Project) -> None:
+        with self._db:
+            project_id = self._project_id(project.name)
+            if project_id is None:
+                self._insert_project(project)
+                return
+
+            self._save_roles(project_id, project.roles)
+            stored_count = self._db.execute(
+                "SELECT count(*) FROM time_entries WHERE project_id = ?",
+                (project_id,),
+            ).fetchone()[0]
+            entries = project.time_entries
+            if len(entries) < stored_count:
+                self._db.execute(
+                    "DELETE FROM time_entries WHERE project_id = ? AND position >= ?",
+                    (project_id, len(entries)),
+                )
+
+            open_positions = self._db.execute(
+                "SELECT position FROM time_entries"
+                " WHERE project_id = ? AND end_time = '' AND position < ?",
+                (project_id, len(entries)),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE time_entries SET role_name = ?, start_time = ?, end_time = ?"
+                " WHERE project_id = ? AND position = ?",
+                (
+                    (*self._row(entries[position]), project_id, position)
+                    for (position,) in open_positions
+                ),
+            )
+            self._insert_entries(project_id, entries[stored_count:], stored_count)
+
+    def rewrite(self, project: Project) -> None:
+        """Replace every stored role and entry of the project."""
+        with self._db:
+            project_id = self._project_id(project.name)
+            if project_id is not None:
+                self._delete_project(project_id)
+            self._insert_project(project)
+
+    def _insert_project(self, project: Project) -> None:
+        cursor = self._db.execute(
+            "INSERT INTO projects (name) VALUES (?)", (project.name,)
+        )
+        project_id = cursor.lastrowid
+        self._save_roles(project_id, project.roles)
+        self._insert_entries(project_id, project.time_entries, 0)
+
+    def _delete_project(self, project_id: int) -> None:
+        for table in ("time_entries", "roles"):
+            self._db.execute(f"DELETE FROM {table} WHERE project_id = ?", (project_id,))
+        self._db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    def _save_roles(self, project_id: int, roles: list) -> None:
+        rows = [(role.name, role.hourly_rate) for role in roles]
+        stored = self._db.execute(
+            "SELECT name, hourly_rate FROM roles WHERE project_id = ? ORDER BY position",
+            (project_id,),
+        ).fetchall()
+        if stored == rows:
+            return
+        self._db.execute("DELETE FROM roles WHERE project_id = ?", (project_id,))
+        self._db.executemany(
+            "INSERT INTO roles (project_id, position, name, hourly_rate)"
+            " VALUES (?, ?, ?, ?)",
+            ((project_id, position, *row) for position, row in enumerate(rows)),
+        )
+
+    def _insert_entries(self, project_id: int, entries, first_position: int) -> None:
+        self._db.executemany(
+            "INSERT INTO time_entries"
+            " (project_id, position, role_name, start_time, end_time)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (project_id, position, *self._row(entry))
+                for position, entry in enumerate(entries, first_position)
+            ),
+        )
+
+    def _row(self, entry: TimeEntry) -> tuple:
+        return entry.role_name, entry.start_time, entry.end_time
+
+    def _project_id(self, project_name: str) -> Optional[int]:
+        row = self._db.execute(
+            "SELECT id FROM projects WHERE name = ?", (str(project_name),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _require_project_id(self, project_name: str) -> int:
+        project_id = self._project_id(project_name)
+        if project_id is None:
+            raise ProjectNotFoundError(project_name)
+        return project_id
+
+    @property
+    def _db(self) -> "sqlite3.Connection":
+        if self.connection is None:
+            self.use_vault(self.base_path)
+        assert self.connection is not None
+        return self.connection
+
+
+def open_vault(vault_path: str, project_name: str = "", compact: bool = False):
+    """The vault adapter holding a project in the given vault directory."""
+    if project_name and os.path.isdir(f"{vault_path}/{project_name}{SEGMENTS_SUFFIX}"):
+        return SegmentedVault(vault_path, compact)
+    if project_name and os.path.exists(f"{vault_path}/{project_name}{BINARY_SUFFIX}"):
+        return BinaryVault(vault_path, compact)
+    if os.path.exists(f"{vault_path}/{SQLITE_FILENAME}"):
+        vault = SqliteVault(vault_path, compact)
+        if not project_name or vault.exists(project_name):
+            return vault
+        vault.close()
+    return JournalVault(vault_path, compact)
@@ -0,0 +1,196 @@
+"""Asyncio front end for the vault adapters and the project registry.
+
+The adapters do blocking file and SQLite I/O, so the async classes run it
+on thread pools and let batches of loads and saves overlap. Every project
+is loaded and saved by one task at a time, and SQLite connections never
+leave the thread that opened them.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+
+from timekeeper.adapters import (
+    ProjectRegistry,
+    SqliteVault,
+    VaultAdapter,
+    open_registry,
+    open_vault,
+)
+from timekeeper.entities import Project
+
+
+class AsyncVaultAdapter(ABC):
+    @abstractmethod
+    async def load(self, project_name: str) -> Project:
+        pass
+
+    @abstractmethod
+    async def save(self, project: Project) -> None:
+        pass
+
+    @abstractmethod
+    async def exists(self, project_name: str) -> bool:
+        pass
+
+
+class AsyncFileVault(AsyncVaultAdapter):
+    """Runs a vault directory's blocking I/O on a bounded thread pool.
+
+    Each project keeps the adapter ``open_vault`` picks for it, so journal
+    appends carry over between saves. SQLite adapters are opened and closed
+    inside every call instead, on the worker thread that uses them.
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        compact: bool = False,
+        executor: Optional[Executor] = None,
+        max_workers: int = 4,
+    ):
+        self.base_path = base_path
+        self.compact = compact
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers)
+        self._vaults: dict = {}
+        self._locks: dict = {}
+
+    async def __aenter__(self) -> "AsyncFileVault":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._owns_executor:
+            self.executor.shutdown()
+
+    async def load(self, project_name: str) -> Project:
+        async with self._lock(project_name):
+            return await self._offload(project_name, lambda v: v.load(project_name))
+
+    async def save(self, project: Project) -> None:
+        async with self._lock(project.name):
+            await self._offload(project.name, lambda v: v.save(project))
+
+    async def exists(self, project_name: str) -> bool:
+        return await self._offload(project_name, lambda v: v.exists(project_name))
+
+    def _lock(self, project_name: str) -> asyncio.Lock:
+        lock = self._locks.get(project_name)
+        if lock is None:
+            lock = self._locks[project_name] = asyncio.Lock()
+        return lock
+
+    async def _offload(self, project_name: str, operation: Callable):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self._run, project_name, operation
+        )
+
+    def _run(self, project_name: str, operation: Callable):
+        vault: Optional[VaultAdapter] = self._vaults.get(project_name)
+        if vault is None:
+            vault = open_vault(self.base_path, project_name, self.compact)
+            if isinstance(vault, SqliteVault):
+                with vault:
+                    return operation(vault)
+            self._vaults[project_name] = vault
+        return operation(vault)
+
+
+class AsyncProjectRegistry:
+    """Registry lookups off the event loop, plus batch loads and saves.
+
+    Registry calls share a single worker thread, which also keeps the
+    connection of a SQLite registry on one thread; a registry passed in
+    must not be a SQLite one for that reason. Vault I/O goes to a separate
+    pool of ``max_workers`` threads shared by every vault.
+    """
+
+    def __init__(
+        self, registry: Optional[ProjectRegistry] = None, max_workers: int = 8
+    ):
+        self._registry = registry
+        self._owns_registry = registry is None
+        self._registry_executor = ThreadPoolExecutor(1)
+        self.executor = ThreadPoolExecutor(max_workers)
+        self._vaults: dict = {}
+
+    async def __aenter__(self) -> "AsyncProjectRegistry":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._registry_executor.submit(self._close_registry).result()
+        self._registry_executor.shutdown()
+        self.executor.shutdown()
+
+    def vault(self, vault_path: str, compact: bool = False) -> AsyncFileVault:
+        """The async vault for a directory, sharing this registry's pool."""
+        key = (vault_path, compact)
+        if key not in self._vaults:
+            self._vaults[key] = AsyncFileVault(vault_path, compact, self.executor)
+        return self._vaults[key]
+
+    async def exists(self, project_name: str) -> bool:
+        return await self._call("exists", project_name)
+
+    async def list_projects(self) -> list:
+        return await self._call("list_projects")
+
+    async def list_vaults(self) -> list:
+        return await self._call("list_vaults")
+
+    async def get_project_vault_path(self, project_name: str) -> str:
+        return await self._call("get_project_vault_path", project_name)
+
+    async def update_index(self, project_path: str, project_name: str) -> None:
+        await self._call("update_index", project_path, project_name)
+
+    async def load(self, project_name: str, compact: bool = False) -> Project:
+        vault_path = await self.get_project_vault_path(project_name)
+        return await self.vault(vault_path, compact).load(project_name)
+
+    async def save(self, project: Project, vault_path: str = "") -> None:
+        """Save a project to its vault, or add it to ``vault_path``."""
+        if vault_path:
+            await self.vault(vault_path).save(project)
+            await self.update_index(vault_path, project.name)
+        else:
+            vault_path = await self.get_project_vault_path(project.name)
+            await self.vault(vault_path).save(project)
+
+    async def load_many(
+        self, project_names: Iterable[str], compact: bool = False
+    ) -> dict:
+        """Load projects concurrently, keyed by name in the given order."""
+        project_names = list(project_names)
+        projects = await asyncio.gather(
+            *(self.load(project_name, compact) for project_name in project_names)
+        )
+        return dict(zip(project_names, projects))
+
+    async def save_many(self, projects: Iterable[Project]) -> None:
+        await asyncio.gather(*(self.save(project) for project in projects))
+
+    async def _call(self, method: str, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._registry_executor, self._call_registry, method, args
+        )
+
+    def _call_registry(self, method: str, args: tuple):
+        if self._registry is None:
+            self._registry = open_registry()
+        return getattr(self._registry, method)(*args)
+
+    def _close_registry(self) -> None:
+        close = getattr(self._registry, "close", None)
+        if self._owns_registry and close is not None:
+            close()
@@ -1,19 +1,90 @@
-import argparse
-import json
+import os
+import sys
+from functools import cached_property, partial
+from typing import TYPE_CHECKING
 
-from timekeeper.adapters import FileVault, ProjectRegistry
-from timekeeper.services import ProjectWorkflowService
-from timekeeper.use_cases import (
-    InitializeRole,
-    SaveProject,
-    SummarizeTime,
-    ToggleTrackingInteractor,
-)
+# Modules are imported where they are used so the hot commands, toggle and
+# info, start without loading argparse or the summary machinery. Keep new
+# imports local; benchmarks/startup.py and the tests check the import set.
+if TYPE_CHECKING:
+    from timekeeper.adapters import ProjectRegistry, VaultAdapter
+    from timekeeper.entities import Project, TimeEntry
+
+FAST_COMMANDS = ("toggle", "t", "info")
+DAEMON_COMMANDS = ("toggle", "t", "info", "sum", "s")
+TRACE_ENV = "TK_TRACE"
+NO_DAEMON_ENV = "TK_NO_DAEMON"
+FILE_FORMATS = ("project", "csv", "jsonl")
+
+
+def guess_format(file_path: str) -> str:
+    """Entry format of a file by its extension, the project format otherwise."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "project"
+
+
+def check_date(value: str, option: str) -> str:
+    """A YYYY-MM-DD option value, exits on anything else; '' is passed on."""
+    from datetime import date
+
+    if not value:
+        return value
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        sys.exit(f'{option} "{value}" is not a date of the form YYYY-MM-DD.')
 
 
 class CommandLineInterface:
-    def run(self):
-        parser = argparse.ArgumentParser(description="Time tracking utility.")
+    @cached_property
+    def registry(self) -> "ProjectRegistry":
+        from timekeeper.adapters import open_registry
+
+        return open_registry()
+
+    def run(self, argv=None):
+        argv = sys.argv[1:] if argv is None else list(argv)
+        profiler = ""
+        # parsed here rather than by argparse, which the fast commands skip
+        for index, arg in enumerate(argv):
+            if arg == "--profile" or arg.startswith("--profile="):
+                from timekeeper.instrumentation import PROFILERS
+
+                profiler = arg.partition("=")[2]
+                del argv[index]
+                if not profiler and argv[index:] and argv[index] in PROFILERS:
+                    profiler = argv.pop(index)
+                profiler = profiler or "phases"
+                break
+        trace_path = os.environ.get(TRACE_ENV, "")
+        if not profiler and not trace_path:
+            self.run_command(argv)
+            return
+
+        from timekeeper.instrumentation import PROFILERS, run_profiled
+
+        if profiler and profiler not in PROFILERS:
+            raise ValueError(f"--profile must be one of {', '.join(PROFILERS)}")
+        run_profiled(partial(self.run_command, argv), argv, profiler, trace_path)
+
+    def run_command(self, argv: list) -> None:
+        if self.run_daemon(argv):
+            return
+        if self.run_fast(argv):
+            return
+
+        import argparse
+
+        parser = argparse.ArgumentParser(
+            description="Time tracking utility.",
+            epilog="--profile [cprofile|tracemalloc] before a command prints"
+            " per-phase timings to stderr, cprofile or tracemalloc add a profile."
+            f" {TRACE_ENV}=FILE writes the timings as JSON.",
+        )
         subparsers = parser.add_subparsers(dest="command")
 
         # init subcommand
@@ -36,18 +107,75 @@ class CommandLineInterface:
         )
         parser_sum.add_argument(
             "--period",
-            choices=["daily", "weekly", "monthly"],
+            type=str,
             default="weekly",
-            help="Summary period.",
+            help="Summary period: daily, weekly, monthly, quarterly, yearly,"
+            " fiscal-weekly[:MONTH] for a fiscal year starting in MONTH, or"
+            " custom:DATE,DATE[,DATE...] for the ranges between the dates.",
         )
         parser_sum.add_argument(
             "--project", type=str, help="Display sum for specific project."
         )
+        parser_sum.add_argument(
+            "--all",
+            action="store_true",
+            help="Display one sum for every project in every vault.",
+        )
+        parser_sum.add_argument(
+            "--vault", type=str, help="Display one sum for every project in a vault."
+        )
+        parser_sum.add_argument(
+            "--earnings",
+            action="store_true",
+            help="Sum earnings from the roles' hourly rates per period, project"
+            " and vault, over every project unless --project or --vault is given.",
+        )
+        parser_sum.add_argument(
+            "--stream",
+            action="store_true",
+            help="Read entries one at a time to summarize in constant memory,"
+            " with the python engine.",
+        )
+        parser_sum.add_argument(
+            "--engine",
+            choices=["auto", "python", "numpy", "parallel"],
+            default="auto",
+            help="Aggregation engine, auto uses numpy when it is installed and"
+            " parallel splits a project's entries across processes.",
+        )
+        parser_sum.add_argument(
+            "--format",
+            choices=["text", "json", "csv"],
+            default="text",
+            help="Print the summary as text, JSON lines or CSV rows.",
+        )
+        parser_sum.add_argument(
+            "--since",
+            type=str,
+            default="",
+            help="Only count entries from this date, YYYY-MM-DD.",
+        )
+        parser_sum.add_argument(
+            "--until",
+            type=str,
+            default="",
+            help="Only count entries before this date, YYYY-MM-DD.",
+        )
 
         # info subcommand
         parser_info = subparsers.add_parser("info", help="Show project info.")
         parser_info.add_argument("project_name", type=str, help="Name of the project.")
 
+        # running subcommand
+        parser_running = subparsers.add_parser(
+            "running", help="List the timers running in every vault."
+        )
+        parser_running.add_argument(
+            "--repair",
+            action="store_true",
+            help="Rebuild the list of running timers from every project first.",
+        )
+
         # add_role subcommand
         parser_add_role = subparsers.add_parser(
             "add_role", help="Add a role to an existing project."
@@ -56,62 +184,620 @@ class CommandLineInterface:
             "project_name", type=str, help="Name of the project."
         )
 
+        # migrate subcommand
+        parser_migrate = subparsers.add_parser(
+            "migrate", help="Move a vault's projects into a SQLite vault."
+        )
+        parser_migrate.add_argument(
+            "source", type=str, help="Vault directory to migrate from."
+        )
+        parser_migrate.add_argument(
+            "target", type=str, help="Vault directory holding the SQLite database."
+        )
+
+        # compact subcommand
+        parser_compact = subparsers.add_parser(
+            "compact", help="Move old closed entries into a compressed archive."
+        )
+        parser_compact.add_argument(
+            "project_name", type=str, help="Name of the project."
+        )
+        parser_compact.add_argument(
+            "--before",
+            type=str,
+            default="",
+            help="Archive closed entries started before this date, YYYY-MM-DD,"
+            " 90 days ago by default.",
+        )
+        parser_compact.add_argument(
+            "--expand",
+            action="store_true",
+            help="Move every archived entry back into the project.",
+        )
+
+        # sync subcommand
+        parser_sync = subparsers.add_parser(
+            "sync", help="Merge the projects of two vault directories both ways."
+        )
+        parser_sync.add_argument(
+            "other", type=str, help="Vault directory to sync with, such as a copy."
+        )
+        parser_sync.add_argument(
+            "--vault",
+            type=str,
+            default="",
+            help="Local vault directory, the default vault otherwise.",
+        )
+
+        # segment subcommand
+        parser_segment = subparsers.add_parser(
+            "segment", help="Split a project's entries into monthly segment files."
+        )
+        parser_segment.add_argument(
+            "project_name", type=str, help="Name of the project."
+        )
+
+        # export and import subcommands
+        parser_export = subparsers.add_parser(
+            "export",
+            help="Write a project in the readable JSON format, or its entries.",
+        )
+        parser_export.add_argument(
+            "project_name", type=str, help="Name of the project."
+        )
+        parser_export.add_argument(
+            "file", type=str, nargs="?", help="Output file, stdout by default."
+        )
+        parser_export.add_argument(
+            "--format",
+            choices=FILE_FORMATS,
+            help="Project JSON, or the entries as CSV or JSON lines; guessed"
+            " from the file's extension by default.",
+        )
+        parser_import = subparsers.add_parser(
+            "import",
+            help="Read a project written by export, or entries from CSV or JSONL.",
+        )
+        parser_import.add_argument("file", type=str, help="File to import.")
+        parser_import.add_argument(
+            "--format",
+            choices=FILE_FORMATS,
+            help="Format of the file, guessed from its extension by default.",
+        )
+        parser_import.add_argument(
+            "--project",
+            type=str,
+            default="",
+            help="Project of every entry, for files without a project column.",
+        )
+        parser_import.add_argument(
+            "--role-map",
+            action="append",
+            default=[],
+            metavar="OLD=NEW",
+            help="Import entries of role OLD as role NEW, repeatable.",
+        )
+        parser_import.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Entries read before the projects are saved.",
+        )
+        parser_import.add_argument(
+            "--binary",
+            action="store_true",
+            help="Store the entries in the binary record format.",
+        )
+        parser_import.add_argument(
+            "--vault",
+            type=str,
+            help="Vault directory for a new project, the default vault otherwise.",
+        )
+
+        # serve subcommand
+        parser_serve = subparsers.add_parser(
+            "serve", help="Keep projects in memory and answer toggle, info and sum."
+        )
+        parser_serve.add_argument(
+            "--stop", action="store_true", help="Stop the running daemon."
+        )
+        parser_serve.add_argument(
+            "--interval",
+            type=float,
+            default=0.05,
+            help="Seconds to batch changes for before writing them back.",
+        )
+
         # helper subcommands
         subparsers.add_parser("projects", help="List all projects.", aliases=["p"])
         subparsers.add_parser("vaults", help="List all vaults.", aliases=["v"])
-        subparsers.add_parser("index", help="Show the timekeeper index.", aliases=["i"])
+        parser_index = subparsers.add_parser(
+            "index", help="Show the timekeeper index.", aliases=["i"]
+        )
+        parser_index.add_argument(
+            "--format",
+            choices=["json", "sqlite"],
+            help="Convert the index to this storage format first.",
+        )
+        parser_index.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Rescan every known vault, only re-reading what changed.",
+        )
+        parser_index.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Vaults to scan in parallel when rebuilding.",
+        )
 
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
 
         if args.command == "init":
             self.init_project()
         elif args.command in ["toggle", "t"]:
             self.toggle_tracking(args.project_name, args.role)
         elif args.command in ["sum", "s"]:
-            self.summarize_time(args.period, args.project)
+            if args.earnings:
+                self.summarize_earnings(
+                    args.period, args.project, args.vault, args.format
+                )
+            elif args.all or args.vault:
+                self.summarize_projects(
+                    args.period,
+                    args.vault,
+                    args.engine,
+                    args.format,
+                    args.stream,
+                    args.since,
+                    args.until,
+                )
+            else:
+                self.summarize_time(
+                    args.period,
+                    args.project,
+                    args.engine,
+                    args.stream,
+                    args.since,
+                    args.until,
+                    args.format,
+                )
         elif args.command in ["projects", "p"]:
-            print(ProjectRegistry().list_projects())
+            print(self.registry.list_projects())
         elif args.command in ["vaults", "v"]:
-            print(ProjectRegistry().list_vaults())
+            print(self.registry.list_vaults())
         elif args.command in ["index", "i"]:
-            print(json.dumps(ProjectRegistry().get_index(), indent=2))
+            self.show_index(args.format, args.rebuild, args.workers)
         elif args.command == "info":
             self.project_info(args.project_name)
+        elif args.command == "running":
+            self.running_timers(args.repair)
         elif args.command == "add_role":
             self.add_role(args.project_name)
+        elif args.command == "migrate":
+            self.migrate_vault(args.source, args.target)
+        elif args.command == "export":
+            self.export_project(args.project_name, args.file, args.format)
+        elif args.command == "import":
+            file_format = args.format or guess_format(args.file)
+            if file_format == "project":
+                self.import_project(args.file, args.binary, args.vault)
+            else:
+                self.import_entries(
+                    args.file,
+                    file_format,
+                    args.project,
+                    args.role_map,
+                    args.batch_size,
+                )
+        elif args.command == "serve":
+            self.serve(args.stop, args.interval)
+        elif args.command == "segment":
+            self.segment_project(args.project_name)
+        elif args.command == "compact":
+            self.compact_project(args.project_name, args.before, args.expand)
+        elif args.command == "sync":
+            self.sync_vaults(args.other, args.vault)
         else:
             parser.print_help()
 
+    def run_daemon(self, argv: list) -> bool:
+        """Hand toggle, info and sum to a running ``tk serve`` daemon."""
+        if not argv or argv[0] not in DAEMON_COMMANDS:
+            return False
+        if os.environ.get(NO_DAEMON_ENV):
+            return False
+
+        from timekeeper.config import socket_path
+
+        if not os.path.exists(socket_path()):
+            return False
+
+        from timekeeper.client import send
+
+        return send(socket_path(), argv)
+
+    def run_fast(self, argv: list) -> bool:
+        """Dispatch toggle and info without building the argparse tree."""
+        if not argv or argv[0] not in FAST_COMMANDS:
+            return False
+        if any(arg.startswith("-") for arg in argv):
+            return False
+
+        if argv[0] == "info" and len(argv) == 2:
+            self.project_info(argv[1])
+            return True
+        if argv[0] in ["toggle", "t"] and len(argv) in [2, 3]:
+            # argparse leaves a missing role as None
+            self.toggle_tracking(argv[1], argv[2] if len(argv) == 3 else None)
+            return True
+        return False
+
     def init_project(self) -> None:
-        ProjectWorkflowService().initialize_project_workflow()
+        from timekeeper.services import ProjectWorkflowService
+
+        ProjectWorkflowService(self.registry).initialize_project_workflow()
 
     def toggle_tracking(self, project_name: str, role_name: str = "") -> None:
-        vault_path = ProjectRegistry().get_project_vault_path(project_name)
-        vault = FileVault(vault_path)
-        project = vault.load(project_name)
+        from timekeeper.use_cases import ToggleTrackingInteractor
+
+        vault, project = self.load_project(project_name)
         ToggleTrackingInteractor().execute(project, role_name)
+        self.save_project(vault, project)
+        # only once the project is saved, so a failed save starts no timer
+        self.update_running(project)
+
+    def load_project(self, project_name: str, compact: bool = False) -> tuple:
+        """The vault holding a project and the project loaded from it."""
+        from timekeeper.adapters import open_vault
+
+        vault_path = self.registry.get_project_vault_path(project_name)
+        vault = open_vault(vault_path, project_name, compact)
+        return vault, vault.load(project_name)
+
+    def save_project(self, vault: "VaultAdapter", project: "Project") -> None:
         vault.save(project)
 
-    def summarize_time(self, period: str, project_name: str = "") -> None:
-        vault_path = ProjectRegistry().get_project_vault_path(project_name)
-        project = FileVault(vault_path).load(project_name)
-        SummarizeTime().execute(period, project)
+    def update_running(self, project: "Project") -> None:
+        self.registry.update_running(project)
+
+    def summarize_time(
+        self,
+        period: str,
+        project_name: str = "",
+        engine: str = "auto",
+        stream: bool = False,
+        since: str = "",
+        until: str = "",
+        file_format: str = "text",
+    ) -> None:
+        from timekeeper.adapters import ArchiveStore, RollupStore, open_vault
+        from timekeeper.engines import get_engine
+        from timekeeper.use_cases import SummarizeTime
+
+        since = check_date(since, "--since")
+        until = check_date(until, "--until")
+        if stream and engine not in ("auto", "python"):
+            sys.exit(f"--stream sums entries as they are read, not with {engine}.")
+        if stream or since or until:
+            vault_path = self.registry.get_project_vault_path(project_name)
+            vault = open_vault(vault_path, project_name, compact=True)
+            project = vault.stream(project_name, since, until)
+            engine_name = "python" if stream else engine
+            archives = ArchiveStore(vault_path)
+            SummarizeTime(get_engine(engine_name), archives=archives).execute(
+                period, project, since=since, until=until, file_format=file_format
+            )
+            return
+
+        vault, project = self.load_project(project_name, compact=True)
+        rollups = RollupStore(vault.base_path)
+        archives = ArchiveStore(vault.base_path)
+        SummarizeTime(get_engine(engine), rollups, archives).execute(
+            period, project, file_format=file_format
+        )
+
+    def summarize_projects(
+        self,
+        period: str,
+        vault_path: str = "",
+        engine: str = "auto",
+        file_format: str = "text",
+        stream: bool = False,
+        since: str = "",
+        until: str = "",
+    ) -> None:
+        from timekeeper.adapters import open_vault
+        from timekeeper.engines import get_engine
+        from timekeeper.use_cases import SummarizeProjects
+
+        if stream or since or until:
+            sys.exit("--stream, --since and --until sum a single project.")
+        projects, title = self.select_projects(vault_path)
+        SummarizeProjects(
+            partial(open_vault, compact=True), get_engine(engine)
+        ).execute(period, projects, title, file_format)
+
+    def summarize_earnings(
+        self,
+        period: str,
+        project_name: str = "",
+        vault_path: str = "",
+        file_format: str = "text",
+    ) -> None:
+        from timekeeper.adapters import open_vault
+        from timekeeper.use_cases import SummarizeEarnings
+
+        if project_name:
+            projects = {
+                project_name: self.registry.get_project_vault_path(project_name)
+            }
+            title = f'"{project_name}"'
+        else:
+            projects, title = self.select_projects(vault_path)
+        SummarizeEarnings(partial(open_vault, compact=True)).execute(
+            period, projects, title, file_format
+        )
+
+    def select_projects(self, vault_path: str = "") -> tuple:
+        """Vault path by project name of every project, or of one vault's."""
+        projects = {
+            project_name: self.registry.get_project_vault_path(project_name)
+            for project_name in self.registry.list_projects()
+        }
+        title = "all projects"
+        if vault_path:
+            vault_path = os.path.abspath(vault_path)
+            projects = {
+                project_name: project_vault
+                for project_name, project_vault in projects.items()
+                if os.path.abspath(project_vault) == vault_path
+            }
+            title = f'vault "{vault_path}"'
+        return projects, title
 
     def project_info(self, project_name: str) -> None:
-        vault_path = ProjectRegistry().get_project_vault_path(project_name)
-        project = FileVault(vault_path).load(project_name)
-        if project.last_time_entry().is_open():
+        if self.last_time_entry(project_name).is_open():
             print("Timer Running.")
         else:
             print("No timer running.")
 
+    def running_timers(self, repair: bool = False) -> None:
+        """List running timers from the registry, no project file is read."""
+        if repair:
+            running = self.registry.rebuild_running()
+        else:
+            running = self.registry.running_timers()
+        if not running:
+            print("No timers running.")
+            return
+        for project_name, role_names in sorted(running.items()):
+            for role_name, start_time in sorted(role_names.items()):
+                print(f"{project_name}/{role_name}: running since {start_time}")
+
+    def last_time_entry(self, project_name: str) -> "TimeEntry":
+        from timekeeper.adapters import open_vault
+        from timekeeper.entities import TimeEntry
+
+        vault_path = self.registry.get_project_vault_path(project_name)
+        vault = open_vault(vault_path, project_name)
+        return vault.last_time_entry(project_name) or TimeEntry()
+
     def add_role(self, project_name: str) -> None:
-        vault_path = ProjectRegistry().get_project_vault_path(project_name)
-        vault = FileVault(vault_path)
+        from timekeeper.adapters import open_vault
+        from timekeeper.use_cases import InitializeRole, SaveProject
+
+        vault_path = self.registry.get_project_vault_path(project_name)
+        vault = open_vault(vault_path, project_name)
         project = vault.load(project_name)
         project = InitializeRole(vault, project).execute()
         SaveProject(vault, project).execute()
 
+    def migrate_vault(self, source_path: str, target_path: str) -> None:
+        from timekeeper.adapters import JournalVault, SqliteVault
+        from timekeeper.use_cases import MigrateVault
+
+        registry = self.registry
+        source_path = os.path.abspath(source_path)
+        target_path = os.path.abspath(target_path)
+        project_names = [
+            project_name
+            for project_name in registry.list_projects()
+            if os.path.abspath(registry.get_project_vault_path(project_name))
+            == source_path
+        ]
+        with SqliteVault(target_path) as target:
+            MigrateVault(JournalVault(source_path), target).execute(project_names)
+        for project_name in project_names:
+            registry.update_index(target_path, project_name)
+
+    def segment_project(self, project_name: str) -> None:
+        from timekeeper.adapters import JournalVault, SegmentedVault, open_vault
+        from timekeeper.use_cases import MigrateVault
+
+        vault_path = self.registry.get_project_vault_path(project_name)
+        source = open_vault(vault_path, project_name)
+        if isinstance(source, SegmentedVault):
+            print(f'Project "{project_name}" is already segmented.')
+            return
+        if not isinstance(source, JournalVault):
+            print(f'Project "{project_name}" is not stored in project files.')
+            return
+        MigrateVault(source, SegmentedVault(vault_path)).execute([project_name])
+        # the project file no longer holds the entries the journal builds on
+        journal_path = source.journal_path(project_name)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def compact_project(
+        self, project_name: str, before: str = "", expand: bool = False
+    ) -> None:
+        from datetime import date, timedelta
+
+        from timekeeper.adapters import ArchiveStore
+        from timekeeper.use_cases import CompactProject, ExpandArchive
+
+        vault, project = self.load_project(project_name)
+        archives = ArchiveStore(vault.base_path)
+        if expand:
+            ExpandArchive(vault, archives).execute(project)
+            return
+        before = check_date(before, "--before")
+        before = before or str(date.today() - timedelta(days=90))
+        CompactProject(vault, archives).execute(project, before)
+
+    def sync_vaults(self, other_path: str, vault_path: str = "") -> None:
+        from timekeeper.adapters import SyncStore, list_vault_projects, open_vault
+        from timekeeper.config import vault_path as default_vault_path
+        from timekeeper.use_cases import SyncVaults
+
+        local_path = os.path.abspath(vault_path or default_vault_path())
+        other_path = os.path.abspath(other_path)
+        if local_path == other_path:
+            sys.exit("Cannot sync a vault with itself.")
+        if not os.path.isdir(other_path):
+            sys.exit(f"No vault directory at {other_path}.")
+        project_names = sorted(
+            set(list_vault_projects(local_path)) | set(list_vault_projects(other_path))
+        )
+        stores = SyncStore(local_path), SyncStore(other_path)
+        SyncVaults(open_vault, *stores, self.registry).execute(project_names)
+
+    def export_project(
+        self, project_name: str, file_path: str = "", file_format: str = ""
+    ) -> None:
+        from timekeeper.adapters import FileVault, open_vault
+
+        vault_path = self.registry.get_project_vault_path(project_name)
+        file_format = file_format or guess_format(file_path or "")
+        if file_format != "project":
+            self.export_entries(vault_path, project_name, file_path, file_format)
+            return
+
+        project = open_vault(vault_path, project_name).load(project_name)
+        if not file_path:
+            FileVault(vault_path).write_project(project, sys.stdout)
+            print()
+            return
+        with open(file_path, "w") as f:
+            FileVault(vault_path).write_project(project, f)
+
+    def export_entries(
+        self, vault_path: str, project_name: str, file_path: str, file_format: str
+    ) -> None:
+        """Stream a project's entries as CSV or JSON lines rows."""
+        from timekeeper.adapters import ENTRY_FIELDS, open_vault, write_records
+
+        vault = open_vault(vault_path, project_name, compact=True)
+        project = vault.stream(project_name)
+        rows = (
+            (project.name, te.role_name, te.start_time, te.end_time)
+            for te in project.time_entries
+        )
+        if not file_path:
+            write_records(rows, ENTRY_FIELDS, file_format, sys.stdout)
+            return
+        with open(file_path, "w", newline="") as f:
+            write_records(rows, ENTRY_FIELDS, file_format, f)
+
+    def import_project(
+        self, file_path: str, binary: bool = False, vault_path: str = ""
+    ) -> None:
+        from timekeeper.adapters import (
+            BinaryVault,
+            JournalVault,
+            SqliteVault,
+            open_vault,
+        )
+        from timekeeper.config import vault_path as default_vault_path
+
+        registry = self.registry
+        json_vault = JournalVault(vault_path or default_vault_path())
+        with open(file_path, "r") as f:
+            project = json_vault.read_project(f)
+        if registry.exists(project.name):
+            json_vault.use_vault(registry.get_project_vault_path(project.name))
+
+        vault = open_vault(json_vault.base_path, project.name)
+        if isinstance(vault, (JournalVault, BinaryVault)):
+            binary_vault = BinaryVault(json_vault.base_path)
+            if binary:
+                binary_vault.rewrite(project)
+                stale_path = json_vault.journal_path(project.name)
+            else:
+                json_vault.snapshot(project)
+                stale_path = binary_vault.entries_path(project.name)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+        elif binary:
+            sys.exit(
+                f'"{project.name}" is kept in a {type(vault).__name__},'
+                " it can't be stored as binary records."
+            )
+        elif isinstance(vault, SqliteVault):
+            # SQLite and segmented projects are replaced where they are kept
+            with vault:
+                vault.rewrite(project)
+        else:
+            vault.rewrite(project)
+        registry.update_index(json_vault.base_path, project.name)
+        print(f'Project "{project.name}" imported to {json_vault.base_path}.')
+
+    def import_entries(
+        self,
+        file_path: str,
+        file_format: str,
+        project_name: str = "",
+        role_map: tuple = (),
+        batch_size: int = 10_000,
+    ) -> None:
+        from timekeeper.adapters import iter_entry_rows
+        from timekeeper.use_cases import ImportTimeEntries
+
+        roles = {}
+        for mapping in role_map:
+            old_name, separator, new_name = mapping.partition("=")
+            if not separator:
+                sys.exit(f'Role map "{mapping}" is not of the form OLD=NEW.')
+            roles[old_name] = new_name
+
+        importer = ImportTimeEntries(self.load_project, roles, batch_size)
+        with open(file_path, "r", newline="") as f:
+            importer.execute(iter_entry_rows(f, file_format), project_name)
+
+    def serve(self, stop_daemon: bool = False, interval: float = 0.05) -> None:
+        from timekeeper import client, daemon
+        from timekeeper.config import socket_path
+
+        if stop_daemon:
+            if not client.stop(socket_path()):
+                print("No daemon running.")
+            return
+        os.makedirs(os.path.dirname(socket_path()), exist_ok=True)
+        daemon.serve(socket_path(), interval)
+
+    def show_index(
+        self, storage_format: str = "", rebuild: bool = False, workers: int = 8
+    ) -> None:
+        import json
+
+        from timekeeper.adapters import convert_registry
+
+        if storage_format:
+            self.registry = convert_registry(storage_format)
+        if rebuild:
+            stats = self.registry.rebuild_index(workers)
+            print(
+                f"Indexed {stats['projects']} projects in {stats['vaults']} vaults,"
+                f" {stats['rescanned']} rescanned,"
+                f" {stats['unreachable']} unreachable.",
+                file=sys.stderr,
+            )
+        index = self.registry.get_index()
+        # the scan bookkeeping is for the next rebuild, not for reading
+        index.pop("scan", None)
+        print(json.dumps(index, indent=2))
+
 
 def main():
     try:
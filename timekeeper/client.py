@@ -0,0 +1,62 @@
+"""Tiny client for the ``tk serve`` daemon.
+
+Imported on the toggle/info hot path instead of the adapters, so it only
+needs ``json`` and ``socket``.
+"""
+
+import json
+import os
+import socket
+import sys
+from typing import Optional
+
+from timekeeper.errors import DaemonCommandError
+
+# environment variables that reach the daemon with every command
+ENV_PREFIX = "TK_"
+
+
+def request(path: str, message: dict) -> Optional[dict]:
+    """Send one message to the daemon, None when nothing is listening."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+    with client:
+        client.sendall(json.dumps(message).encode())
+        client.shutdown(socket.SHUT_WR)
+        return json.loads(read_all(client))
+
+
+def send(path: str, argv: list) -> bool:
+    """Run a command on the daemon and replay its output, False if none runs."""
+    env = {
+        name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)
+    }
+    message = {"op": "run", "argv": argv, "cwd": os.getcwd(), "env": env}
+    response = request(path, message)
+    if response is None:
+        return False
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if response["error"]:
+        raise DaemonCommandError(response["error"])
+    if response["status"]:
+        sys.exit(response["status"])
+    return True
+
+
+def stop(path: str) -> bool:
+    """Ask the daemon to write back its changes and exit."""
+    return request(path, {"op": "stop"}) is not None
+
+
+def read_all(connection: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = connection.recv(1 << 16)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
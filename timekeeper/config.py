@@ -2,7 +2,19 @@ import os
 
 VAULT_DIRECTORY = "timekeeper"
 INDEX_FILENAME = "lookup.json"
+INDEX_DB_FILENAME = "lookup.sqlite3"
+RUNNING_FILENAME = "running.json"
 PROJECTS_DIRECTORY = "projects"
+PROJECT_SUFFIX = ".json"
+JOURNAL_SUFFIX = ".journal"
+ROLLUP_SUFFIX = ".rollup"
+SEGMENTS_SUFFIX = ".segments"
+BINARY_SUFFIX = ".entries"
+ARCHIVE_SUFFIX = ".archive"
+SYNC_SUFFIX = ".sync"
+REPLICA_FILENAME = "replica.id"
+SOCKET_FILENAME = "daemon.sock"
+SQLITE_FILENAME = "vault.sqlite3"
 
 
 def config_path():
@@ -12,3 +24,7 @@ def config_path():
 
 def vault_path():
     return os.path.join(config_path(), VAULT_DIRECTORY)
+
+
+def socket_path():
+    return os.path.join(vault_path(), SOCKET_FILENAME)
@@ -0,0 +1,338 @@
+"""Resident daemon that keeps the registry and loaded projects in memory.
+
+``tk serve`` listens on a Unix socket in the default vault. The CLI hands
+toggle, info and sum to it through ``timekeeper.client`` while the socket
+exists and runs them itself otherwise. Commands run in the client's working
+directory and with its ``TK_`` environment variables. A toggle changes the
+cached project and returns; a writer thread saves changed projects in
+batches and fsyncs the files it wrote.
+"""
+
+import json
+import os
+import socket
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Optional
+
+from timekeeper.adapters import (
+    SegmentedVault,
+    SqliteProjectRegistry,
+    SqliteVault,
+    VaultAdapter,
+    open_registry,
+    open_vault,
+)
+from timekeeper.cli import CommandLineInterface
+from timekeeper.client import ENV_PREFIX, read_all, request
+from timekeeper.config import (
+    BINARY_SUFFIX,
+    JOURNAL_SUFFIX,
+    PROJECT_SUFFIX,
+    SEGMENTS_SUFFIX,
+)
+from timekeeper.entities import Project, TimeEntry
+from timekeeper.errors import DaemonRunningError
+
+
+def written_paths(vault: VaultAdapter, project_name: str) -> list:
+    """Files a vault keeps a project in, SQLite commits durably on its own."""
+    if isinstance(vault, SqliteVault):
+        return []
+    base = f"{vault.base_path}/{project_name}"
+    paths = [
+        f"{base}{suffix}" for suffix in (PROJECT_SUFFIX, JOURNAL_SUFFIX, BINARY_SUFFIX)
+    ]
+    paths.append(f"{base}{SEGMENTS_SUFFIX}/{SegmentedVault.manifest_filename}")
+    return [path for path in paths if os.path.exists(path)]
+
+
+def signature(vault: VaultAdapter, project_name: str) -> tuple:
+    """Changes whenever another process rewrites the project's files."""
+    stats = [os.stat(path) for path in written_paths(vault, project_name)]
+    return tuple((stat.st_ino, stat.st_size, stat.st_mtime_ns) for stat in stats)
+
+
+def unsaved_marks(project: Project) -> tuple:
+    """Entry count and open entries, to tell the toggles made since apart."""
+    return len(project.time_entries), sorted(project.open_timers().values())
+
+
+@contextmanager
+def client_context(cwd: str, env: dict) -> Iterator[None]:
+    """Run a command in the client's directory with its ``TK_`` variables."""
+    previous_cwd = os.getcwd()
+    previous_env = {
+        name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)
+    }
+    for name in previous_env:
+        del os.environ[name]
+    os.environ.update(env)
+    if cwd:
+        os.chdir(cwd)
+    try:
+        yield
+    finally:
+        os.chdir(previous_cwd)
+        for name in env:
+            os.environ.pop(name, None)
+        os.environ.update(previous_env)
+
+
+class ProjectCache:
+    """Loaded projects and the changes that are not written back yet.
+
+    Changed projects are saved by a background thread, at most once per
+    ``interval`` seconds, and the files are fsynced after each batch. A
+    cached project is reloaded when its files change underneath it, say by
+    ``tk compact``, ``tk import`` or ``tk sync``. Toggles waiting to be
+    written are then made again on the reloaded project instead of
+    overwriting the other process's changes.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        import threading
+
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.projects: dict = {}
+        self.dirty: set = set()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+
+    def get(self, project_name: str) -> Optional[tuple]:
+        with self.lock:
+            cached = self.projects.get(project_name)
+            if cached is None:
+                return None
+            vault, project, files, _ = cached
+            if files == signature(vault, project_name):
+                return vault, project
+            if project_name in self.dirty:
+                return self._reload(project_name)
+            del self.projects[project_name]
+            return None
+
+    def put(self, vault: VaultAdapter, project: Project) -> None:
+        with self.lock:
+            self.projects[project.name] = (
+                vault,
+                project,
+                signature(vault, project.name),
+                unsaved_marks(project),
+            )
+
+    def mark_dirty(self, project_name: str) -> None:
+        with self.lock:
+            self.dirty.add(project_name)
+        self._wakeup.set()
+
+    def flush(self) -> None:
+        with self.lock:
+            saved = []
+            for project_name in sorted(self.dirty):
+                try:
+                    vault, project = self.get(project_name)
+                    vault.save(project)
+                    for path in written_paths(vault, project_name):
+                        _fsync(path)
+                except Exception as e:
+                    # stays dirty and is retried with the next batch
+                    print(f"Saving {project_name} failed: {e}", file=sys.__stderr__)
+                    continue
+                self.dirty.discard(project_name)
+                self.put(vault, project)
+                saved.append(project)
+            if saved:
+                self._update_running(saved)
+
+    def _update_running(self, projects: list) -> None:
+        """Record the timers of projects once they are saved.
+
+        The registry is opened here, a SQLite connection can't be shared
+        with the thread that answers commands.
+        """
+        registry = open_registry()
+        try:
+            for project in projects:
+                registry.update_running(project)
+        finally:
+            if isinstance(registry, SqliteProjectRegistry):
+                registry.close()
+
+    def _reload(self, project_name: str) -> tuple:
+        """Load a project changed on disk and redo the unsaved toggles on it."""
+        vault, project, _, (entry_count, open_indexes) = self.projects[project_name]
+        fresh_vault = open_vault(vault.base_path, project_name)
+        fresh = fresh_vault.load(project_name)
+        self.put(fresh_vault, fresh)
+        stored = {(te.role_name, te.start_time): te for te in fresh.time_entries}
+
+        time_entries = project.time_entries
+        toggled = [time_entries[index] for index in open_indexes]
+        toggled.extend(
+            time_entries[index] for index in range(entry_count, len(time_entries))
+        )
+        for time_entry in toggled:
+            key = (time_entry.role_name, time_entry.start_time)
+            if key not in stored:
+                stored[key] = replace(time_entry)
+                fresh.time_entries.append(stored[key])
+            elif time_entry.end_time and stored[key].is_open():
+                stored[key].end_time = time_entry.end_time
+        return fresh_vault, fresh
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait()
+            # let the toggles of one burst share a write
+            self._wakeup.clear()
+            if not self._stopped:
+                self._wakeup.wait(self.interval)
+            self.flush()
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DaemonInterface(CommandLineInterface):
+    """Command line interface that reads and changes cached projects."""
+
+    def __init__(self, cache: ProjectCache):
+        self.cache = cache
+
+    def handle(self, argv: list, cwd: str = "", env: Optional[dict] = None) -> dict:
+        """Run a command as the client would, capturing what it prints."""
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        response = {"error": "", "status": 0}
+        with self.cache.lock, redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                with client_context(cwd, env or {}):
+                    self.run_command(argv)
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    response["error"] = e.code
+                else:
+                    response["status"] = e.code or 0
+            except Exception as e:
+                response["error"] = str(e)
+        response["stdout"] = stdout.getvalue()
+        response["stderr"] = stderr.getvalue()
+        return response
+
+    def run_daemon(self, argv: list) -> bool:
+        return False
+
+    def load_project(self, project_name: str, compact: bool = False) -> tuple:
+        cached = self.cache.get(project_name)
+        if cached is not None:
+            return cached
+        vault, project = super().load_project(project_name)
+        self.cache.put(vault, project)
+        return vault, project
+
+    def save_project(self, vault: VaultAdapter, project: Project) -> None:
+        self.cache.mark_dirty(project.name)
+
+    def update_running(self, project: Project) -> None:
+        # done by the writer once the project is on disk
+        pass
+
+    def last_time_entry(self, project_name: str) -> TimeEntry:
+        _, project = self.load_project(project_name)
+        return project.last_time_entry()
+
+    def summarize_time(
+        self,
+        period: str,
+        project_name: str = "",
+        engine: str = "auto",
+        stream: bool = False,
+        since: str = "",
+        until: str = "",
+        file_format: str = "text",
+    ) -> None:
+        if stream or since or until:
+            # streamed and ranged summaries read the files, not the cache
+            self.cache.flush()
+        super().summarize_time(
+            period, project_name, engine, stream, since, until, file_format
+        )
+
+    def summarize_projects(self, *args) -> None:
+        self.cache.flush()
+        super().summarize_projects(*args)
+
+    def summarize_earnings(self, *args) -> None:
+        self.cache.flush()
+        super().summarize_earnings(*args)
+
+
+def serve(path: str, interval: float = 0.05) -> None:
+    """Answer commands on ``path`` until stopped or interrupted."""
+    import signal
+    import threading
+
+    if os.path.exists(path):
+        if request(path, {"op": "ping"}) is not None:
+            raise DaemonRunningError(path)
+        os.remove(path)
+
+    cache = ProjectCache(interval)
+    cache.start()
+    interface = DaemonInterface(cache)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving on {path}")
+    try:
+        running = True
+        while running:
+            connection, _ = server.accept()
+            with connection:
+                response: dict = {}
+                try:
+                    message = json.loads(read_all(connection))
+                    if message["op"] == "run":
+                        response = interface.handle(
+                            message["argv"], message.get("cwd", ""), message.get("env")
+                        )
+                    elif message["op"] == "stop":
+                        running = False
+                except (ValueError, KeyError, TypeError) as e:
+                    # a bad request is answered, it doesn't stop the daemon
+                    response = {
+                        "error": f"Malformed request: {e!r}",
+                        "status": 1,
+                        "stdout": "",
+                        "stderr": "",
+                    }
+                connection.sendall(json.dumps(response).encode())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(path)
+        cache.stop()
@@ -0,0 +1,251 @@
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Optional
+
+from timekeeper.entities import (
+    DAY_TICKS,
+    NO_TIME,
+    CompactTimeEntries,
+    Project,
+)
+from timekeeper.errors import EngineUnavailableError
+from timekeeper.periods import NO_BUCKET, Period, get_period
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+
+def get_engine(name: str = "auto"):
+    """Summary engine for SummarizeTime, None selects the python engine."""
+    if name == "python":
+        return None
+    if name == "parallel":
+        return ParallelSummaryEngine()
+    try:
+        return NumpySummaryEngine()
+    except EngineUnavailableError:
+        if name == "numpy":
+            raise
+        return None
+
+
+class NumpySummaryEngine:
+    """Vectorized summary aggregation, results match SummarizeTime.summarize.
+
+    Entries are turned into int64 tick columns, every entry gets the day its
+    period starts on as bucket id, and totals are reduced per (bucket, role)
+    group. Keys are only formatted once per bucket.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise EngineUnavailableError("numpy", "the numpy package")
+
+    def summarize(self, period: Period, project: Project) -> dict:
+        role_names, role_ids, starts, ends = self._columns(project)
+        closed = (starts != NO_TIME) & (ends != NO_TIME)
+        role_ids, starts, ends = role_ids[closed], starts[closed], ends[closed]
+        if not len(starts):
+            return {}
+
+        buckets = self._bucket_days(period, starts // DAY_TICKS)
+        counted = buckets != NO_BUCKET
+        if not counted.all():
+            role_ids, starts, ends = role_ids[counted], starts[counted], ends[counted]
+            buckets = buckets[counted]
+            if not len(starts):
+                return {}
+        groups = buckets * len(role_names) + role_ids
+        group_ids, first_index, inverse = np.unique(
+            groups, return_index=True, return_inverse=True
+        )
+        # float64 sums of integer microseconds are exact below 2**53 (285 years)
+        totals = np.bincount(inverse.ravel(), weights=ends - starts).astype(np.int64)
+
+        # insert groups in order of first appearance, like the python engine
+        summary: dict = {}
+        for group in np.argsort(first_index, kind="stable"):
+            bucket, role_id = divmod(int(group_ids[group]), len(role_names))
+            key = period.label(bucket)
+            summary.setdefault(key, {})[role_names[role_id]] = timedelta(
+                microseconds=int(totals[group])
+            )
+        return summary
+
+    def _columns(self, project: Project) -> tuple:
+        time_entries = project.time_entries
+        if isinstance(time_entries, CompactTimeEntries):
+            return (
+                time_entries.role_names,
+                np.frombuffer(time_entries.role_ids, dtype=np.uint32).astype(np.int64),
+                np.frombuffer(time_entries.starts, dtype=np.int64),
+                np.frombuffer(time_entries.ends, dtype=np.int64),
+            )
+
+        closed = [te for te in time_entries if te.is_closed()]
+        role_index: dict = {}
+        role_ids = [
+            role_index.setdefault(te.role_name, len(role_index)) for te in closed
+        ]
+        return (
+            list(role_index),
+            np.array(role_ids, dtype=np.int64),
+            self._ticks([te.start_time for te in closed]),
+            self._ticks([te.end_time for te in closed]),
+        )
+
+    def _ticks(self, timestamps: list) -> "np.ndarray":
+        return np.array(timestamps, dtype="datetime64[us]").astype(np.int64)
+
+    def _bucket_days(self, period: Period, days: "np.ndarray") -> "np.ndarray":
+        """Bucket of each day, looked up in the period's calendar table."""
+        first = int(days.min())
+        table = np.frombuffer(period.table(first, int(days.max())), dtype=np.int64)
+        return table[days - first]
+
+
+class ParallelSummaryEngine:
+    """Map-reduce aggregation over a process pool, results match the serial one.
+
+    The entries' compact columns are copied once into shared memory and each
+    worker aggregates a range of rows into (bucket, role) partials that
+    remember the row every group first appears at. Partials are merged and
+    the groups inserted in order of first appearance, so the summary equals
+    SummarizeTime.summarize's, key and role order included. Projects of one
+    chunk, and runs inside a daemonic worker, are aggregated in-process.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 250_000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def summarize(self, period: Period, project: Project) -> dict:
+        import multiprocessing
+
+        time_entries = project.time_entries
+        if not isinstance(time_entries, CompactTimeEntries):
+            time_entries = CompactTimeEntries(time_entries)
+        rows = len(time_entries)
+        ranges = [
+            (low, min(low + self.chunk_size, rows))
+            for low in range(0, rows, self.chunk_size)
+        ]
+        if (
+            len(ranges) < 2
+            or self.max_workers < 2
+            or multiprocessing.current_process().daemon
+        ):
+            columns = (
+                memoryview(time_entries.role_ids),
+                memoryview(time_entries.starts),
+                memoryview(time_entries.ends),
+            )
+            partials = [aggregate_rows(period.name, *columns, 0, rows)]
+        else:
+            partials = self._map(period.name, time_entries, ranges)
+        return self._reduce(period, time_entries.role_names, partials)
+
+    def _map(self, period_name: str, time_entries: CompactTimeEntries, ranges: list):
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        rows = len(time_entries)
+        memory = shared_memory.SharedMemory(create=True, size=max(1, 20 * rows))
+        try:
+            with _columns(memory.buf, rows) as (role_ids, starts, ends):
+                starts[:] = memoryview(time_entries.starts)
+                ends[:] = memoryview(time_entries.ends)
+                role_ids[:] = memoryview(time_entries.role_ids)
+
+            workers = min(self.max_workers, len(ranges))
+            with ProcessPoolExecutor(workers) as executor:
+                futures = [
+                    executor.submit(
+                        aggregate_shared, memory.name, rows, period_name, low, high
+                    )
+                    for low, high in ranges
+                ]
+                return [future.result() for future in futures]
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def _reduce(self, period: Period, role_names: list, partials: list) -> dict:
+        groups: dict = {}
+        for partial in partials:
+            for group, (first, total) in partial.items():
+                merged = groups.get(group)
+                if merged is None:
+                    groups[group] = [first, total]
+                else:
+                    merged[0] = min(merged[0], first)
+                    merged[1] += total
+
+        summary: dict = {}
+        for (bucket, role_id), (_, total) in sorted(
+            groups.items(), key=lambda item: item[1][0]
+        ):
+            summary.setdefault(period.label(bucket), {})[role_names[role_id]] = (
+                timedelta(microseconds=total)
+            )
+        return summary
+
+
+def aggregate_rows(
+    period_name: str, role_ids, starts, ends, low: int, high: int
+) -> dict:
+    """[first row, microseconds] per (bucket, role id) of rows low to high."""
+    period = get_period(period_name)
+    buckets: dict = {}
+    groups: dict = {}
+    for index, role_id, start, end in zip(
+        range(low, high), role_ids[low:high], starts[low:high], ends[low:high]
+    ):
+        if start == NO_TIME or end == NO_TIME:
+            continue
+        day = start // DAY_TICKS
+        bucket = buckets.get(day)
+        if bucket is None:
+            bucket = buckets[day] = period.bucket(day)
+        if bucket == NO_BUCKET:
+            continue
+        group = groups.get((bucket, role_id))
+        if group is None:
+            groups[(bucket, role_id)] = [index, end - start]
+        else:
+            group[1] += end - start
+    return groups
+
+
+def aggregate_shared(
+    memory_name: str, rows: int, period_name: str, low: int, high: int
+) -> dict:
+    """aggregate_rows over columns in shared memory, runs in worker processes."""
+    from multiprocessing import shared_memory
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        with _columns(memory.buf, rows) as (role_ids, starts, ends):
+            return aggregate_rows(period_name, role_ids, starts, ends, low, high)
+    finally:
+        memory.close()
+
+
+@contextmanager
+def _columns(buffer, rows: int) -> Iterator[tuple]:
+    """Role id, start and end column views of a shared buffer."""
+    views = (
+        buffer[16 * rows : 20 * rows].cast("I"),
+        buffer[: 8 * rows].cast("q"),
+        buffer[8 * rows : 16 * rows].cast("q"),
+    )
+    try:
+        yield views
+    finally:
+        # shared memory can't be closed while a view is exported
+        for view in views:
+            view.release()
@@ -1,5 +1,10 @@
+import zlib
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator, MutableSequence
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 
 from timekeeper.errors import RoleNotFoundError
 
@@ -41,56 +46,396 @@ class TimeEntry:
 
 @dataclass
 class Project:
-    """Represents a project with roles and time entries."""
+    """Represents a project with roles and time entries.
+
+    Roles by name and the last entry of every role are indexed. The indexes
+    follow appends to ``time_entries`` and reassignment of either list; call
+    ``reindex`` after inserting, removing or re-roling entries in place.
+    """
 
     name: str
     roles: list[Role] = field(default_factory=list)
-    time_entries: list[TimeEntry] = field(default_factory=list)
+    time_entries: MutableSequence[TimeEntry] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.reindex()
 
     def __str__(self) -> str:
         return self.name
 
-    def get_role(self, role_name: str) -> Role:
-        # self.role_dict = {role.name: role for role in self.roles}
-        # try:
-        #    return self.role_dict[role_name]
-        # except KeyError:
-        #    raise RoleNotFoundError(role_name)
+    def reindex(self) -> None:
+        """Drop the role and last-entry indexes, they rebuild on next use."""
+        self._roles_source: Optional[list] = None
+        self._roles_length = 0
+        self._roles_by_name: dict[str, Role] = {}
+        self._tails_source: Optional[MutableSequence] = None
+        self._tails_length = 0
+        self._tails: dict[str, int] = {}
 
-        if role_name:
-            for role in self.roles:
-                if role.name == role_name:
-                    return role
-        raise RoleNotFoundError(role_name)
+    def get_role(self, role_name: str) -> Role:
+        try:
+            return self._role_index()[role_name]
+        except KeyError:
+            raise RoleNotFoundError(role_name)
 
     def get_default_role(self) -> Role:
         return self.roles[0]
 
     def has_role(self, role_name: str) -> bool:
-        return bool(role_name in [role.name for role in self.roles])
+        return role_name in self._role_index()
 
     def add_role(self, role: Role) -> None:
         self.roles.append(role)
 
     def last_time_entry(self, role_name: str = "") -> TimeEntry:
-        if role_name:
-            # get the time entries by role
-            time_entries = [te for te in self.time_entries if role_name == te.role_name]
-        else:
-            # get the time entries
-            time_entries = self.time_entries
-
-        # return the last time entry
-        if time_entries:
-            return time_entries[-1]
-        else:
+        index = self._last_index(role_name)
+        if index < 0:
             return TimeEntry()
+        return self.time_entries[index]
+
+    def open_timers(self) -> dict[str, int]:
+        """Index of the last entry of every role whose timer is running."""
+        return {
+            role_name: index
+            for role_name, index in self._tail_index().items()
+            if self.time_entries[index].is_open()
+        }
 
     def start_time_entry(self, role_name: str) -> None:
         time_entry = TimeEntry(role_name)
         time_entry.start()
         self.time_entries.append(time_entry)
+        self._tail_index()
 
     def end_time_entry(self, role_name: str) -> None:
-        time_entry = self.last_time_entry(role_name)
+        index = self._last_index(role_name)
+        if index < 0:
+            return
+        time_entry = self.time_entries[index]
         time_entry.finish()
+        # compact stores hand out copies, so write the entry back
+        self.time_entries[index] = time_entry
+
+    def _last_index(self, role_name: str = "") -> int:
+        if not role_name:
+            return len(self.time_entries) - 1
+        return self._tail_index().get(role_name, -1)
+
+    def _role_index(self) -> dict[str, Role]:
+        if self.roles is not self._roles_source or (
+            len(self.roles) != self._roles_length
+        ):
+            self._roles_by_name = {}
+            for role in self.roles:
+                if role.name:
+                    self._roles_by_name.setdefault(role.name, role)
+            self._roles_source = self.roles
+            self._roles_length = len(self.roles)
+        return self._roles_by_name
+
+    def _tail_index(self) -> dict[str, int]:
+        time_entries = self.time_entries
+        if time_entries is not self._tails_source or (
+            len(time_entries) < self._tails_length
+        ):
+            self._tails_source = time_entries
+            self._tails_length = 0
+            self._tails = {}
+
+        # entries appended since the last call only extend the index
+        if len(time_entries) > self._tails_length:
+            start = self._tails_length
+            if isinstance(time_entries, CompactTimeEntries):
+                role_names = time_entries.role_names
+                new_roles = (role_names[i] for i in time_entries.role_ids[start:])
+            else:
+                new_roles = (
+                    time_entries[index].role_name
+                    for index in range(start, len(time_entries))
+                )
+            for index, role_name in enumerate(new_roles, start):
+                self._tails[role_name] = index
+            self._tails_length = len(time_entries)
+        return self._tails
+
+
+@dataclass
+class ProjectStream:
+    """A project whose time entries are read one at a time."""
+
+    name: str
+    roles: list[Role] = field(default_factory=list)
+    time_entries: Iterator[TimeEntry] = field(default_factory=lambda: iter(()))
+
+
+EPOCH = datetime(1970, 1, 1)
+NO_TIME = -(2**63)
+DAY_TICKS = 86_400_000_000
+_MICROSECOND = timedelta(microseconds=1)
+_START_SPELLED = 1
+_END_SPELLED = 2
+
+
+def to_ticks(timestamp: str) -> int:
+    """Microseconds since the epoch of a naive timestamp, NO_TIME for ''."""
+    if not timestamp:
+        return NO_TIME
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        # on the local wall clock, like the naive timestamps toggles write
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return (parsed - EPOCH) // _MICROSECOND
+
+
+def _is_canonical(timestamp: str) -> bool:
+    """Whether from_ticks reproduces a parsed timestamp, without formatting it."""
+    if len(timestamp) == 26:
+        if timestamp[19] != "." or timestamp.endswith("000000"):
+            return False
+    elif len(timestamp) != 19:
+        return timestamp == ""
+    separators = (timestamp[i] for i in (4, 7, 10, 13, 16))
+    return "".join(separators) == "-- ::"
+
+
+def from_ticks(ticks: int) -> str:
+    """Timestamp string in the format TimeEntry writes, '' for NO_TIME."""
+    if ticks == NO_TIME:
+        return ""
+    return str(EPOCH + timedelta(microseconds=ticks))
+
+
+class CompactTimeEntries(MutableSequence):
+    """Columnar, memory-light alternative to a list of time entries.
+
+    Start and end times are kept as epoch microseconds in ``array`` columns
+    and role names are interned to integer ids. Indexing materializes a
+    ``TimeEntry`` copy, so changes must be written back by assignment.
+    Timestamps not in ``str(datetime)`` format are flagged and keep their
+    original spelling, stored per row and flag.
+    """
+
+    __slots__ = (
+        "role_names",
+        "role_ids",
+        "starts",
+        "ends",
+        "spelled",
+        "_role_ids",
+        "_spellings",
+    )
+
+    def __init__(self, time_entries: Iterable[TimeEntry] = ()):
+        self.role_names: list[str] = []
+        self.role_ids = array("I")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.spelled = array("B")
+        self._role_ids: dict[str, int] = {}
+        self._spellings: dict[tuple[int, int], str] = {}
+        self.extend(time_entries)
+
+    @classmethod
+    def from_dicts(cls, time_entry_dicts: Iterable[dict]) -> "CompactTimeEntries":
+        entries = cls()
+        for te_dict in time_entry_dicts:
+            entries._append(
+                te_dict.get("role_name", ""),
+                te_dict.get("start_time", ""),
+                te_dict.get("end_time", ""),
+            )
+        return entries
+
+    @classmethod
+    def from_columns(
+        cls,
+        role_names: list,
+        role_ids: array,
+        starts: array,
+        ends: array,
+        spelled: array,
+        spellings: Optional[dict] = None,
+    ) -> "CompactTimeEntries":
+        """Entries over existing columns, spellings map (row, flag) to text."""
+        entries = cls()
+        entries.role_names = list(role_names)
+        entries._role_ids = {name: i for i, name in enumerate(entries.role_names)}
+        entries.role_ids = role_ids
+        entries.starts = starts
+        entries.ends = ends
+        entries.spelled = spelled
+        entries._spellings = dict(spellings or {})
+        return entries
+
+    @property
+    def spellings(self) -> dict:
+        """Original text of flagged timestamps, keyed by row and flag."""
+        return self._spellings
+
+    def to_dicts(self) -> list[dict]:
+        return [
+            {"role_name": role_name, "start_time": start_time, "end_time": end_time}
+            for role_name, start_time, end_time in self._rows()
+        ]
+
+    def closed_spans(self) -> Iterator[tuple[str, int, int]]:
+        """Yield (role name, start ticks, end ticks) of entries with both times."""
+        role_names = self.role_names
+        for role_id, start, end in zip(self.role_ids, self.starts, self.ends):
+            if start != NO_TIME and end != NO_TIME:
+                yield role_names[role_id], start, end
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._slice(index)
+        row = range(len(self))[index]
+        return self.entry(
+            row,
+            self.role_ids[index],
+            self.spelled[index],
+            self.starts[index],
+            self.ends[index],
+        )
+
+    def entry(
+        self, row: int, role_id: int, spelled: int, start: int, end: int
+    ) -> TimeEntry:
+        """The time entry row ``row`` of column values stands for."""
+        return TimeEntry(
+            self.role_names[role_id],
+            self._timestamp(row, start, spelled & _START_SPELLED),
+            self._timestamp(row, end, spelled & _END_SPELLED),
+        )
+
+    def __setitem__(self, index, time_entry: TimeEntry) -> None:
+        if isinstance(index, slice):
+            raise TypeError("CompactTimeEntries does not support slice assignment")
+        row = range(len(self))[index]
+        start, end, spelled = self._pack(
+            row, time_entry.start_time, time_entry.end_time
+        )
+        self.role_ids[index] = self._role_id(time_entry.role_name)
+        self.starts[index] = start
+        self.ends[index] = end
+        self.spelled[index] = spelled
+
+    def __delitem__(self, index) -> None:
+        rows = range(len(self))[index]
+        if isinstance(rows, int):
+            rows = range(rows, rows + 1)
+        removed = sorted(rows)
+        self._renumber(
+            lambda row: None if row in rows else row - bisect_left(removed, row)
+        )
+        del self.role_ids[index]
+        del self.starts[index]
+        del self.ends[index]
+        del self.spelled[index]
+
+    def insert(self, index: int, time_entry: TimeEntry) -> None:
+        # clamped like list.insert
+        row = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        self._renumber(lambda other: other + 1 if other >= row else other)
+        start, end, spelled = self._pack(
+            row, time_entry.start_time, time_entry.end_time
+        )
+        self.role_ids.insert(index, self._role_id(time_entry.role_name))
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.spelled.insert(index, spelled)
+
+    def append(self, time_entry: TimeEntry) -> None:
+        self._append(time_entry.role_name, time_entry.start_time, time_entry.end_time)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (CompactTimeEntries, list)):
+            return list(self._rows()) == [
+                (te.role_name, te.start_time, te.end_time) for te in other
+            ]
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactTimeEntries({list(self)!r})"
+
+    def checksum(self, stop: int, open_rows: Iterable[int] = ()) -> int:
+        """CRC32 of the roles and times of the first ``stop`` entries.
+
+        The ends of ``open_rows`` are hashed as if they were still open.
+        """
+        role_ids = self.role_ids[:stop]
+        used_roles = self.role_names[: max(role_ids, default=-1) + 1]
+        ends = self.ends[:stop]
+        for row in open_rows:
+            ends[row] = NO_TIME
+        crc = zlib.crc32("\x1f".join(used_roles).encode())
+        for column in (role_ids, self.starts[:stop], ends):
+            crc = zlib.crc32(column, crc)
+        return crc
+
+    def _slice(self, index: slice) -> "CompactTimeEntries":
+        entries = CompactTimeEntries()
+        entries.role_names = list(self.role_names)
+        entries._role_ids = dict(self._role_ids)
+        rows = range(len(self))[index]
+        entries._spellings = {
+            ((row - rows.start) // rows.step, flag): text
+            for (row, flag), text in self._spellings.items()
+            if row in rows
+        }
+        entries.role_ids = self.role_ids[index]
+        entries.starts = self.starts[index]
+        entries.ends = self.ends[index]
+        entries.spelled = self.spelled[index]
+        return entries
+
+    def _append(self, role_name: str, start_time: str, end_time: str) -> None:
+        start, end, spelled = self._pack(len(self), start_time, end_time)
+        self.role_ids.append(self._role_id(role_name))
+        self.starts.append(start)
+        self.ends.append(end)
+        self.spelled.append(spelled)
+
+    def _rows(self) -> Iterator[tuple[str, str, str]]:
+        role_names, timestamp = self.role_names, self._timestamp
+        columns = zip(self.role_ids, self.starts, self.ends, self.spelled)
+        for row, (role_id, start, end, spelled) in enumerate(columns):
+            yield (
+                role_names[role_id],
+                timestamp(row, start, spelled & _START_SPELLED),
+                timestamp(row, end, spelled & _END_SPELLED),
+            )
+
+    def _role_id(self, role_name: str) -> int:
+        try:
+            return self._role_ids[role_name]
+        except KeyError:
+            self.role_names.append(role_name)
+            return self._role_ids.setdefault(role_name, len(self.role_names) - 1)
+
+    def _pack(self, row: int, start_time: str, end_time: str) -> tuple[int, int, int]:
+        """Ticks and spelled flags of a row, keeping its spellings."""
+        spelled = 0
+        for flag, timestamp in ((_START_SPELLED, start_time), (_END_SPELLED, end_time)):
+            if _is_canonical(timestamp):
+                self._spellings.pop((row, flag), None)
+            else:
+                self._spellings[(row, flag)] = timestamp
+                spelled |= flag
+        return to_ticks(start_time), to_ticks(end_time), spelled
+
+    def _renumber(self, new_row: Callable[[int], Optional[int]]) -> None:
+        """Move spellings to their rows' new numbers, None drops them."""
+        spellings = {}
+        for (row, flag), text in self._spellings.items():
+            row = new_row(row)
+            if row is not None:
+                spellings[(row, flag)] = text
+        self._spellings = spellings
+
+    def _timestamp(self, row: int, ticks: int, spelled: int) -> str:
+        if spelled:
+            return self._spellings[(row, spelled)]
+        return from_ticks(ticks)
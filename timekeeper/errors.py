@@ -33,3 +33,26 @@ class PreviousTimeEntryClosedException(Exception):
 
     def __init__(self):
         super().__init__("Previous time entry is already closed.")
+
+
+class EngineUnavailableError(Exception):
+    """Exception raised when an optional summary engine can't be used."""
+
+    def __init__(self, engine_name: str, requirement: str):
+        self.engine_name = engine_name
+        super().__init__(f'Engine "{engine_name}" requires {requirement}.')
+
+
+class DaemonCommandError(Exception):
+    """Exception raised when the daemon fails to run a command."""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class DaemonRunningError(Exception):
+    """Exception raised when a daemon already serves the socket."""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        super().__init__(f"A daemon is already listening on {socket_path}.")
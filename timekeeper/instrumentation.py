@@ -0,0 +1,128 @@
+"""Per-phase timing for diagnosing slow commands.
+
+Adapters and use cases wrap their expensive steps in ``phase``. Nothing is
+recorded until ``enable`` is called, so the hot path pays one flag check
+per phase. A record holds the phase name, its wall time and whatever
+counters the phase sets, such as ``bytes_read``, ``bytes_written`` or
+``entries``.
+"""
+
+import os
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+PROFILERS = ("phases", "cprofile", "tracemalloc")
+
+_enabled = False
+_phases: list = []
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+@contextmanager
+def phase(name: str) -> Iterator[dict]:
+    """Time the block, counters set on the yielded record are kept with it."""
+    if not _enabled:
+        yield {}
+        return
+
+    record = {"phase": name}
+    depth = sum(1 for other in _phases if "ms" not in other)
+    record["depth"] = depth
+    _phases.append(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["ms"] = (time.perf_counter() - started) * 1000
+
+
+def phases() -> list:
+    """Finished phase records in the order they started."""
+    return [dict(record) for record in _phases if "ms" in record]
+
+
+def reset() -> None:
+    _phases.clear()
+
+
+def file_size(f) -> int:
+    """Size in bytes of an open file."""
+    return os.fstat(f.fileno()).st_size
+
+
+def print_phases(file=None) -> None:
+    file = file or sys.stderr
+    print(f"{'phase':<36} {'ms':>9}  counters", file=file)
+    for record in phases():
+        name = "  " * record.pop("depth") + record.pop("phase")
+        ms = record.pop("ms")
+        counters = "  ".join(f"{key}={value}" for key, value in record.items())
+        print(f"{name:<36} {ms:9.3f}  {counters}".rstrip(), file=file)
+
+
+def write_trace(path: str, argv: list, extra: dict) -> None:
+    import json
+
+    trace = {"argv": argv, "phases": phases(), **extra}
+    with open(path, "w") as f:
+        json.dump(trace, f, indent=4)
+
+
+def run_profiled(
+    run: Callable[[], None], argv: list, profiler: str = "", trace_path: str = ""
+) -> None:
+    """Run a command with phase timing on and report it.
+
+    ``profiler`` prints the phases, or wraps the run in cProfile or
+    tracemalloc and prints their top entries as well. ``trace_path`` gets
+    the phases as JSON.
+    """
+    enable()
+    reset()
+    extra: dict = {}
+    try:
+        with phase("command"):
+            if profiler == "cprofile":
+                import cProfile
+                import pstats
+
+                profile = cProfile.Profile()
+                profile.runcall(run)
+                stats = pstats.Stats(profile, stream=sys.stderr)
+                stats.sort_stats("cumulative").print_stats(25)
+            elif profiler == "tracemalloc":
+                import tracemalloc
+
+                tracemalloc.start()
+                try:
+                    run()
+                    snapshot = tracemalloc.take_snapshot()
+                    extra["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+                finally:
+                    tracemalloc.stop()
+                print(f"peak memory {extra['peak_kb']:.1f} KiB", file=sys.stderr)
+                for stat in snapshot.statistics("lineno")[:10]:
+                    print(stat, file=sys.stderr)
+            else:
+                run()
+    finally:
+        disable()
+        if profiler:
+            print_phases()
+        if trace_path:
+            write_trace(trace_path, argv, extra)
@@ -0,0 +1,226 @@
+"""Summary periods and the calendar table that buckets days into them.
+
+A period maps every day, counted in days since the epoch like the tick
+columns, to a bucket: the day number its period starts on, or NO_BUCKET
+when a custom period leaves the day out. Buckets are looked up in a table
+that is precomputed a year at a time and kept for the life of the
+process, and every bucket's label is formatted once.
+
+``get_period`` parses a period name: daily, weekly, monthly, quarterly,
+yearly, ``fiscal-weekly[:MONTH]`` for weeks counted from the start of a
+fiscal year beginning in MONTH, or ``custom:DATE,DATE[,...]`` for the
+ranges between consecutive dates, the last date excluded.
+"""
+
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from timekeeper.entities import EPOCH, NO_TIME
+
+PERIODS = ("daily", "weekly", "monthly", "quarterly", "yearly", "fiscal-weekly")
+NO_BUCKET = NO_TIME
+EPOCH_ORDINAL = EPOCH.toordinal()
+# days precomputed around a lookup that falls outside the table
+TABLE_MARGIN = 366
+
+
+def to_day(day: date) -> int:
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def from_day(day: int) -> date:
+    return date.fromordinal(day + EPOCH_ORDINAL)
+
+
+class Period(ABC):
+    """Buckets days by table lookup and labels each bucket once."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._first = 0
+        self._table = array("q")
+        self._labels: dict = {}
+
+    def __str__(self) -> str:
+        return self.name
+
+    @abstractmethod
+    def start(self, day: date) -> Optional[date]:
+        """First day of the period containing ``day``, None if there is none."""
+
+    @abstractmethod
+    def describe(self, start: date) -> str:
+        """Label of the period starting on ``start``."""
+
+    def bucket(self, day: int) -> int:
+        index = day - self._first
+        if not 0 <= index < len(self._table):
+            self._extend(day, day)
+            index = day - self._first
+        return self._table[index]
+
+    def table(self, first: int, last: int) -> array:
+        """Bucket of every day from ``first`` to ``last`` included."""
+        self._extend(first, last)
+        return self._table[first - self._first : last - self._first + 1]
+
+    def label(self, bucket: int) -> str:
+        label = self._labels.get(bucket)
+        if label is None:
+            label = self._labels[bucket] = self.describe(from_day(bucket))
+        return label
+
+    def key(self, day: int) -> Optional[str]:
+        """Label of the bucket of ``day``, None for days outside the period."""
+        bucket = self.bucket(day)
+        return None if bucket == NO_BUCKET else self.label(bucket)
+
+    def _extend(self, first: int, last: int) -> None:
+        end = self._first + len(self._table)
+        if self._table and self._first <= first and last < end:
+            return
+        if not self._table:
+            self._first = end = first
+        if first < self._first:
+            first = min(first, self._first - TABLE_MARGIN)
+            self._table = self._build(first, self._first) + self._table
+            self._first = first
+        if last >= end:
+            self._table.extend(self._build(end, max(last + 1, end + TABLE_MARGIN)))
+
+    def _build(self, first: int, stop: int) -> array:
+        table = array("q")
+        day = from_day(first)
+        for _ in range(first, stop):
+            start = self.start(day)
+            table.append(NO_BUCKET if start is None else to_day(start))
+            day += timedelta(days=1)
+        return table
+
+
+class Daily(Period):
+    def start(self, day: date) -> date:
+        return day
+
+    def describe(self, start: date) -> str:
+        return f"{start} ({start.strftime('%A')})"
+
+
+class Weekly(Period):
+    def start(self, day: date) -> date:
+        return day - timedelta(days=day.weekday())
+
+    def describe(self, start: date) -> str:
+        return f"{start} ({start.isocalendar()[1]})"
+
+
+class Monthly(Period):
+    def start(self, day: date) -> date:
+        return day.replace(day=1)
+
+    def describe(self, start: date) -> str:
+        return f"{start} ({start.strftime('%B')})"
+
+
+class Quarterly(Period):
+    def start(self, day: date) -> date:
+        return date(day.year, day.month - (day.month - 1) % 3, 1)
+
+    def describe(self, start: date) -> str:
+        return f"{start} (Q{(start.month - 1) // 3 + 1} {start.year})"
+
+
+class Yearly(Period):
+    def start(self, day: date) -> date:
+        return date(day.year, 1, 1)
+
+    def describe(self, start: date) -> str:
+        return f"{start} ({start.year})"
+
+
+class FiscalWeekly(Period):
+    """Weeks counted from the first day of a fiscal year.
+
+    The fiscal year starts on the first of ``start_month`` and is named
+    after the calendar year it ends in. Its last week can be short.
+    """
+
+    def __init__(self, name: str, start_month: int = 1):
+        super().__init__(name)
+        self.start_month = start_month
+
+    def start(self, day: date) -> date:
+        year_start = self._year_start(day)
+        return year_start + timedelta(days=(day - year_start).days // 7 * 7)
+
+    def describe(self, start: date) -> str:
+        year_start = self._year_start(start)
+        fiscal_year = year_start.year + (1 if self.start_month > 1 else 0)
+        week = (start - year_start).days // 7 + 1
+        return f"{start} (FY{fiscal_year} W{week:02d})"
+
+    def _year_start(self, day: date) -> date:
+        year_start = date(day.year, self.start_month, 1)
+        if day < year_start:
+            year_start = year_start.replace(year=day.year - 1)
+        return year_start
+
+
+class CustomRanges(Period):
+    """The ranges between consecutive boundary dates, days outside are left out."""
+
+    def __init__(self, name: str, boundaries: list):
+        super().__init__(name)
+        self.boundaries = sorted(set(boundaries))
+
+    def start(self, day: date) -> Optional[date]:
+        index = bisect_right(self.boundaries, day)
+        if index == 0 or index == len(self.boundaries):
+            return None
+        return self.boundaries[index - 1]
+
+    def describe(self, start: date) -> str:
+        index = self.boundaries.index(start)
+        end = self.boundaries[index + 1] - timedelta(days=1)
+        return f"{start} (to {end})"
+
+
+PERIOD_CLASSES = {
+    "daily": Daily,
+    "weekly": Weekly,
+    "monthly": Monthly,
+    "quarterly": Quarterly,
+    "yearly": Yearly,
+}
+
+
+@lru_cache(maxsize=None)
+def get_period(name: str) -> Period:
+    """The period called ``name``, shared so its table is only built once."""
+    kind, _, argument = name.partition(":")
+    if kind in PERIOD_CLASSES and not argument:
+        return PERIOD_CLASSES[kind](name)
+    try:
+        if kind == "fiscal-weekly":
+            start_month = int(argument or 1)
+            if 1 <= start_month <= 12:
+                return FiscalWeekly(name, start_month)
+        elif kind == "custom":
+            boundaries = [date.fromisoformat(value) for value in argument.split(",")]
+            if len(set(boundaries)) > 1:
+                return CustomRanges(name, boundaries)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid period {name!r}")
+
+
+def is_period(name: str) -> bool:
+    try:
+        get_period(name)
+    except ValueError:
+        return False
+    return True
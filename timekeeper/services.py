@@ -1,4 +1,12 @@
-from timekeeper.adapters import FileVault, ProjectRegistry
+from typing import Optional
+
+from timekeeper.adapters import (
+    JournalVault,
+    ProjectRegistry,
+    VaultAdapter,
+    open_registry,
+    open_vault,
+)
 from timekeeper.entities import Project
 from timekeeper.errors import UserQuitException
 from timekeeper.use_cases import (
@@ -12,19 +20,20 @@ from timekeeper.use_cases import (
 class ProjectWorkflowService:
     """Application Service for orchestrating project initialization workflows."""
 
-    def __init__(self):
-        self.registry = ProjectRegistry()
+    def __init__(self, registry: Optional[ProjectRegistry] = None):
+        self.registry = registry or open_registry()
 
     def initialize_project_workflow(self) -> Project:
         """Orchestrates the complete project initialization workflow."""
-        vault = InitializeVault(FileVault).execute()
+        vault = InitializeVault(JournalVault).execute()
 
         print()
         project_name = input("Enter project name: ")
 
         # Handle existing project with globally unique name constraint
         if self.registry.exists(project_name):
-            project = self._handle_existing_project(project_name)
+            # the project stays in the vault and storage it already uses
+            vault, project = self._handle_existing_project(project_name)
         else:
             project = InitializeProject().execute(project_name)
 
@@ -33,7 +42,9 @@ class ProjectWorkflowService:
         self.registry.update_index(vault.base_path, project.name)
         return project
 
-    def _handle_existing_project(self, project_name: str) -> Project:
+    def _handle_existing_project(
+        self, project_name: str
+    ) -> tuple[VaultAdapter, Project]:
         """Handle workflow when project already exists globally."""
         print(f"Project {project_name} already exists.")
         action = input(
@@ -44,5 +55,5 @@ class ProjectWorkflowService:
 
         # Load existing project from its vault
         vault_path = self.registry.get_project_vault_path(project_name)
-        vault = FileVault(vault_path)
-        return vault.load(project_name)
+        vault = open_vault(vault_path, project_name)
+        return vault, vault.load(project_name)
@@ -1,16 +1,47 @@
+import heapq
+import os
+import sys
+import zlib
 from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import replace
 from datetime import date, datetime, timedelta
-from typing import Type
+from decimal import ROUND_HALF_UP, Decimal
+from operator import attrgetter
+from typing import Optional, Type, Union
 
-from timekeeper.adapters import VaultAdapter
+from timekeeper.adapters import (
+    ArchiveStore,
+    ProjectRegistry,
+    RollupStore,
+    SqliteVault,
+    SyncStore,
+    VaultAdapter,
+    in_range,
+    write_records,
+)
 from timekeeper.config import vault_path
-from timekeeper.entities import Project, Role
+from timekeeper.entities import (
+    DAY_TICKS,
+    CompactTimeEntries,
+    Project,
+    ProjectStream,
+    Role,
+    TimeEntry,
+    to_ticks,
+)
 from timekeeper.errors import (
     PreviousTimeEntryClosedException,
     PreviousTimeEntryOpenException,
+    ProjectNotFoundError,
     RoleNotFoundError,
     UserQuitException,
 )
+from timekeeper.instrumentation import phase
+from timekeeper.periods import EPOCH_ORDINAL, PERIODS, get_period, is_period, to_day
+
+MICROSECOND = timedelta(microseconds=1)
+HOUR = timedelta(hours=1)
 
 
 class InitializeVault:
@@ -76,6 +107,473 @@ class SaveProject:
         return self.project
 
 
+class MigrateVault:
+    def __init__(self, source: VaultAdapter, target: VaultAdapter):
+        self.source = source
+        self.target = target
+
+    def execute(self, project_names: list) -> dict:
+        """Copy the projects one at a time, returns project and entry counts."""
+        stats = {"projects": 0, "entries": 0}
+        for project_name in project_names:
+            project = self.source.load(project_name)
+            self.target.save(project)
+            stats["projects"] += 1
+            stats["entries"] += len(project.time_entries)
+            print(f'\tProject "{project_name}" migrated to {self.target.base_path}.')
+        return stats
+
+
+class ImportTimeEntries:
+    """Streams rows of historical entries into existing projects.
+
+    Rows are validated as they are read and collected into batches of
+    ``batch_size``. Each batch is mapped onto the projects' roles, sorted,
+    merged into ``time_entries`` without duplicates and saved once per
+    project. Only the current batch and the projects being imported into
+    are held in memory.
+    """
+
+    max_reported_errors = 10
+
+    def __init__(
+        self,
+        open_project: Callable[[str], tuple],
+        role_map: Optional[dict] = None,
+        batch_size: int = 10_000,
+    ):
+        self.open_project = open_project
+        self.role_map = role_map or {}
+        self.batch_size = batch_size
+        self.projects: dict = {}
+        self.written: set = set()
+        self.stats = {"rows": 0, "imported": 0, "duplicates": 0, "skipped": 0}
+
+    def execute(self, rows: Iterable[tuple], project_name: str = "") -> dict:
+        batch: defaultdict = defaultdict(list)
+        pending = 0
+        for line_number, row in rows:
+            self.stats["rows"] += 1
+            try:
+                name, time_entry = self._validate(row, project_name)
+            except ValueError as e:
+                self._skip(line_number, str(e))
+                continue
+            batch[name].append((line_number, time_entry))
+            pending += 1
+            if pending >= self.batch_size:
+                self._write(batch)
+                batch, pending = defaultdict(list), 0
+
+        self._write(batch)
+        print(
+            f"Imported {self.stats['imported']} entries into"
+            f" {len(self.written)} projects, skipped"
+            f" {self.stats['duplicates']} duplicates and"
+            f" {self.stats['skipped']} invalid rows."
+        )
+        return self.stats
+
+    def _validate(self, row, project_name: str) -> tuple:
+        if not isinstance(row, dict):
+            raise ValueError("not a time entry record")
+        name = project_name or self._field(row, "project", "project_name")
+        if not name:
+            raise ValueError("missing project")
+        role_name = self._field(row, "role", "role_name")
+        if not role_name:
+            raise ValueError("missing role")
+        start_time = self._timestamp(self._field(row, "start", "start_time"))
+        end_time = self._timestamp(self._field(row, "end", "end_time"))
+        if end_time < start_time:
+            raise ValueError("end time is before start time")
+        role_name = self.role_map.get(role_name, role_name)
+        return name, TimeEntry(role_name, start_time, end_time)
+
+    def _field(self, row: dict, *names: str) -> str:
+        for name in names:
+            value = row.get(name)
+            if value:
+                return str(value).strip()
+        return ""
+
+    def _timestamp(self, value: str) -> str:
+        """Canonical local timestamp of an ISO 8601 value."""
+        if not value:
+            raise ValueError("historical entries need a start and an end time")
+        if value.endswith("Z"):
+            value = f"{value[:-1]}+00:00"
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"invalid timestamp {value!r}")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return str(parsed)
+
+    def _write(self, batch: dict) -> None:
+        for name, rows in batch.items():
+            loaded = self._load(name)
+            if loaded is None:
+                for line_number, _ in rows:
+                    self._skip(line_number, f'project "{name}" does not exist')
+                continue
+            vault, project, stored = loaded
+
+            new_entries = []
+            for line_number, time_entry in rows:
+                if not project.has_role(time_entry.role_name):
+                    self._skip(line_number, f'unknown role "{time_entry.role_name}"')
+                    continue
+                key = (time_entry.role_name, time_entry.start_time)
+                if key in stored:
+                    self.stats["duplicates"] += 1
+                    continue
+                stored.add(key)
+                new_entries.append(time_entry)
+            if not new_entries:
+                continue
+
+            new_entries.sort(key=attrgetter("start_time"))
+            time_entries = project.time_entries
+            if not time_entries or (
+                new_entries[0].start_time >= time_entries[-1].start_time
+            ):
+                time_entries.extend(new_entries)
+                vault.save(project)
+            else:
+                project.time_entries = type(time_entries)(
+                    heapq.merge(time_entries, new_entries, key=attrgetter("start_time"))
+                )
+                vault.rewrite(project)
+            self.written.add(name)
+            self.stats["imported"] += len(new_entries)
+
+        if batch:
+            print(
+                f"  {self.stats['rows']} rows read,"
+                f" {self.stats['imported']} entries imported"
+            )
+
+    def _load(self, project_name: str) -> Optional[tuple]:
+        if project_name not in self.projects:
+            try:
+                vault, project = self.open_project(project_name)
+            except ProjectNotFoundError:
+                self.projects[project_name] = None
+                return None
+            stored = {(te.role_name, te.start_time) for te in project.time_entries}
+            self.projects[project_name] = (vault, project, stored)
+        return self.projects[project_name]
+
+    def _skip(self, line_number: int, reason: str) -> None:
+        self.stats["skipped"] += 1
+        if self.stats["skipped"] <= self.max_reported_errors:
+            print(f"  line {line_number}: {reason}")
+
+
+class CompactProject:
+    """Moves closed entries that started before a cutoff into the archive.
+
+    The archive segment is written before the project is rewritten, so an
+    interrupted compaction can leave an entry in both places but never in
+    neither; ExpandArchive drops such duplicates.
+    """
+
+    def __init__(self, vault: VaultAdapter, archives: ArchiveStore):
+        self.vault = vault
+        self.archives = archives
+
+    def execute(self, project: Project, before: str) -> int:
+        """Archive the closed entries that started before the date ``before``."""
+        cutoff = to_ticks(before)
+        keep, archived = [], []
+        for time_entry in project.time_entries:
+            if time_entry.is_closed() and to_ticks(time_entry.start_time) < cutoff:
+                archived.append(time_entry)
+            else:
+                keep.append(time_entry)
+        if not archived:
+            print(f'No closed entries of "{project.name}" start before {before}.')
+            return 0
+
+        self.archives.add_segment(project.name, archived)
+        project.time_entries = type(project.time_entries)(keep)
+        self.vault.rewrite(project)
+        print(
+            f'Archived {len(archived)} entries of "{project.name}" started'
+            f" before {before}, {len(keep)} remain."
+        )
+        return len(archived)
+
+
+class ExpandArchive:
+    """Merges a project's archived entries back in and drops the archive."""
+
+    def __init__(self, vault: VaultAdapter, archives: ArchiveStore):
+        self.vault = vault
+        self.archives = archives
+
+    def execute(self, project: Project) -> int:
+        stored = {(te.role_name, te.start_time) for te in project.time_entries}
+        archived = [
+            te
+            for te in self.archives.time_entries(project.name)
+            if (te.role_name, te.start_time) not in stored
+        ]
+        if archived:
+            archived.sort(key=attrgetter("start_time"))
+            project.time_entries = type(project.time_entries)(
+                heapq.merge(
+                    archived, project.time_entries, key=attrgetter("start_time")
+                )
+            )
+            self.vault.rewrite(project)
+        self.archives.remove(project.name)
+        print(f'Restored {len(archived)} archived entries of "{project.name}".')
+        return len(archived)
+
+
+class SyncVaults:
+    """Two-way sync of the projects of two vault directories.
+
+    Entries are identified by role and start time and hashed with their end
+    time. Each directory keeps, per replica it syncs with, the hashes and
+    role rates agreed on at their last sync; comparing a side's current
+    hashes with them shows which entries and rates that side changed since.
+    A change made on one side wins, and only when both sides changed an
+    entry does the later end time win (so a closed entry beats an open
+    one). An entry one side removed is dropped unless the other side
+    changed it. Archived entries count as present and are never dropped;
+    ones archived on the other side are archived here if missing. Projects
+    whose files are unchanged since the last sync of the same two replicas
+    are not loaded, and a side is only written when the merge changes it.
+    """
+
+    def __init__(
+        self,
+        open_vault: Callable[[str, str], VaultAdapter],
+        local: SyncStore,
+        remote: SyncStore,
+        registry: Optional[ProjectRegistry] = None,
+    ):
+        self.open_vault = open_vault
+        self.stores = (local, remote)
+        self.archives = (ArchiveStore(local.base_path), ArchiveStore(remote.base_path))
+        self.registry = registry
+
+    def execute(self, project_names: Iterable[str]) -> dict:
+        stats = {"projects": 0, "synced": 0, "pulled": 0, "pushed": 0}
+        for project_name in project_names:
+            stats["projects"] += 1
+            moved = self.sync_project(project_name)
+            if moved is None:
+                continue
+            pulled, pushed = moved
+            stats["synced"] += 1
+            stats["pulled"] += pulled
+            stats["pushed"] += pushed
+            print(f'"{project_name}": {pulled} entries pulled, {pushed} pushed.')
+        print(
+            f"Synced {stats['synced']} of {stats['projects']} projects,"
+            f" {stats['pulled']} entries pulled and {stats['pushed']} pushed."
+        )
+        return stats
+
+    def sync_project(self, project_name: str) -> Optional[tuple]:
+        """Entries changed locally and remotely, None if both were in sync."""
+        replica_ids = [store.replica_id() for store in self.stores]
+        states = [
+            store.load(project_name, replica_id)
+            for store, replica_id in zip(self.stores, reversed(replica_ids))
+        ]
+        if (
+            states[0]
+            and states[0].get("entries") == states[1].get("entries")
+            and states[0].get("roles") == states[1].get("roles")
+            and all(
+                state.get("signature") == store.signature(project_name)
+                for store, state in zip(self.stores, states)
+            )
+        ):
+            return None
+
+        vaults, projects, archived = [], [], []
+        for index, store in enumerate(self.stores):
+            vault = self.open_vault(store.base_path, project_name)
+            project = vault.load(project_name) if vault.exists(project_name) else None
+            if project is None:
+                # a copy that is gone starts over instead of deleting entries
+                states[index] = {}
+            vaults.append(vault)
+            projects.append(project)
+            archived.append(
+                self._entries(self.archives[index].time_entries(project_name))
+            )
+
+        live = [
+            self._entries(project.time_entries if project is not None else [])
+            for project in projects
+        ]
+        entries = [{**archived[side], **live[side]} for side in (0, 1)]
+        hashes = [self._hashes(side_entries) for side_entries in entries]
+        bases = [state.get("entries", {}) for state in states]
+        merged = self._merge_entries(entries, bases, archived)
+        roles = self._merge_roles(
+            projects, [state.get("roles", {}) for state in states]
+        )
+        merged_hashes = self._hashes(merged)
+        role_rates = {role.name: role.hourly_rate for role in roles}
+
+        moved = []
+        time_entries = sorted(merged.values(), key=attrgetter("start_time"))
+        for side, (vault, project) in enumerate(zip(vaults, projects)):
+            moved.append(
+                sum(
+                    1
+                    for key, content in merged_hashes.items()
+                    if hashes[side].get(key) != content
+                )
+                + sum(1 for key in hashes[side] if key not in merged_hashes)
+            )
+            to_archive = {
+                key: te
+                for key, te in merged.items()
+                if key in archived[1 - side] and key not in entries[side]
+            }
+            if to_archive:
+                self.archives[side].add_segment(project_name, list(to_archive.values()))
+            kept = [
+                te
+                for te in time_entries
+                if (te.role_name, te.start_time) not in archived[side]
+                and (te.role_name, te.start_time) not in to_archive
+            ]
+            if project is None:
+                project = self._copy(Project(project_name), roles, kept)
+                vault.save(project)
+            elif (
+                self._hashes(self._entries(kept)) != self._hashes(live[side])
+                or self._rates(project) != role_rates
+            ):
+                # a save can only append entries and close open ones
+                appended = len(project.time_entries) <= len(kept) and all(
+                    (te.role_name, te.start_time) == (other.role_name, other.start_time)
+                    and (te.is_open() or te.end_time == other.end_time)
+                    for te, other in zip(project.time_entries, kept)
+                )
+                self._copy(project, roles, kept)
+                if appended:
+                    vault.save(project)
+                else:
+                    vault.rewrite(project)
+            if side == 0:
+                self._update_registry(project)
+            if isinstance(vault, SqliteVault):
+                vault.close()
+
+        for store, replica_id in zip(self.stores, reversed(replica_ids)):
+            state = {
+                "entries": merged_hashes,
+                "roles": role_rates,
+                "signature": store.signature(project_name),
+            }
+            store.save(project_name, replica_id, state)
+        return tuple(moved)
+
+    def _merge_entries(self, entries: list, bases: list, archived: list) -> dict:
+        merged: dict = {}
+        for key in [*entries[0], *(key for key in entries[1] if key not in entries[0])]:
+            versions = [side_entries.get(key) for side_entries in entries]
+            key_hash = self._digest(*key)
+            changed = [
+                version is not None
+                and bases[side].get(key_hash) != self._content_hash(version)
+                for side, version in enumerate(versions)
+            ]
+            if all(version is not None for version in versions):
+                # archived entries are immutable, a change made on one side
+                # wins, and of two changes the later end time
+                kept = [key in archived[side] or changed[side] for side in (0, 1)]
+                if kept[0] == kept[1]:
+                    kept = [
+                        versions[0].end_time >= versions[1].end_time,
+                        versions[0].end_time < versions[1].end_time,
+                    ]
+                merged[key] = versions[0] if kept[0] else versions[1]
+                continue
+            side = 0 if versions[0] is not None else 1
+            removed_there = key_hash in bases[1 - side]
+            if key in archived[side] or changed[side] or not removed_there:
+                merged[key] = versions[side]
+        return merged
+
+    def _merge_roles(self, projects: list, bases: list) -> list:
+        """Roles of both sides, a rate changed on one side only wins.
+
+        When both sides changed a rate the higher one is kept, so the result
+        does not depend on which side is local.
+        """
+        roles: dict = {}
+        for side, project in enumerate(projects):
+            for role in project.roles if project is not None else []:
+                current = roles.get(role.name)
+                if current is None:
+                    roles[role.name] = (side, role)
+                    continue
+                other_side, other = current
+                changed = bases[side].get(role.name) != role.hourly_rate
+                other_changed = bases[other_side].get(role.name) != other.hourly_rate
+                if (changed and not other_changed) or (
+                    changed == other_changed and role.hourly_rate > other.hourly_rate
+                ):
+                    roles[role.name] = (side, role)
+        return [role for _, role in roles.values()]
+
+    def _update_registry(self, project: Project) -> None:
+        """Register a project new to the local vault and refresh its timers."""
+        if self.registry is None:
+            return
+        local_path = os.path.abspath(self.stores[0].base_path)
+        if not self.registry.exists(project.name):
+            self.registry.update_index(local_path, project.name)
+        registered_path = self.registry.get_project_vault_path(project.name)
+        if os.path.abspath(registered_path) == local_path:
+            self.registry.update_running(project)
+
+    def _entries(self, time_entries: Iterable[TimeEntry]) -> dict:
+        return {(te.role_name, te.start_time): te for te in time_entries}
+
+    def _hashes(self, entries: dict) -> dict:
+        return {
+            self._digest(*key): self._content_hash(time_entry)
+            for key, time_entry in entries.items()
+        }
+
+    def _content_hash(self, time_entry: TimeEntry) -> str:
+        return self._digest(
+            time_entry.role_name, time_entry.start_time, time_entry.end_time
+        )
+
+    def _digest(self, *fields: str) -> str:
+        import hashlib
+
+        return hashlib.blake2b("\x1f".join(fields).encode(), digest_size=8).hexdigest()
+
+    def _rates(self, project: Optional[Project]) -> Optional[dict]:
+        if project is None:
+            return None
+        return {role.name: role.hourly_rate for role in project.roles}
+
+    def _copy(self, project: Project, roles: list, time_entries: list) -> Project:
+        """Give a project its own copies of the merged roles and entries."""
+        project.roles = [replace(role) for role in roles]
+        project.time_entries = type(project.time_entries)(
+            replace(time_entry) for time_entry in time_entries
+        )
+        return project
+
+
 class ToggleTrackingInteractor:
     def execute(self, project: Project, role_name: str) -> None:
         try:
@@ -118,26 +616,38 @@ class StopTracking:
 
 
 class SummarizeTime:
-    def execute(self, period: str, project: Project, precise=False) -> None:
-        period_summary: defaultdict = defaultdict(lambda: defaultdict(timedelta))
+    periods = PERIODS
+    fields = ("period", "role", "hours")
 
-        for time_entry in project.time_entries:
-            if time_entry.is_closed():
-                start = datetime.fromisoformat(time_entry.start_time)
-                end = datetime.fromisoformat(time_entry.end_time)
-                delta = end - start
-
-                if period == "daily":
-                    key = self._daily_key(start.date())
-                elif period == "weekly":
-                    key = self._weekly_key(start.date())
-                elif period == "monthly":
-                    key = self._monthly_key(start.date())
-                else:
-                    print("Invalid period")
-                    return
+    def __init__(
+        self,
+        engine=None,
+        rollups: Optional[RollupStore] = None,
+        archives: Optional[ArchiveStore] = None,
+    ):
+        self.engine = engine
+        self.rollups = rollups
+        self.archives = archives
 
-                period_summary[key][time_entry.role_name] += delta
+    def execute(
+        self,
+        period: str,
+        project: Union[Project, ProjectStream],
+        precise=False,
+        since: str = "",
+        until: str = "",
+        file_format: str = "text",
+    ) -> None:
+        if not is_period(period):
+            print("Invalid period")
+            return
+
+        period_summary = self.summarize(period, project, since, until)
+        if file_format != "text":
+            write_records(
+                self.rows(period_summary), self.fields, file_format, sys.stdout
+            )
+            return
 
         print(f'{period} summary for "{project.name}"')
         for key, role_names in sorted(period_summary.items()):
@@ -147,18 +657,441 @@ class SummarizeTime:
                 formatted_total_time = f"{total_hours:.2f}"
                 print(f"  {role_name}: {formatted_total_time}")
 
-    def _daily_key(self, start_date: date) -> str:
-        weekday_name = start_date.strftime("%A")
-        return f"{start_date} ({weekday_name})"
-
-    def _weekly_key(self, start_date: date) -> str:
-        # Get the date of the beginning of the week
-        start_of_week = start_date - timedelta(days=start_date.weekday())
-        start_of_week_str = start_of_week.strftime("%Y-%m-%d")
-        week_number = start_date.isocalendar()[1]
-        return f"{start_of_week_str} ({week_number})"
-
-    def _monthly_key(self, start_date: date) -> str:
-        start_of_month = start_date.replace(day=1)
-        month_name = start_of_month.strftime("%B")
-        return f"{start_of_month} ({month_name})"
+    def rows(self, period_summary: dict) -> Iterator[tuple]:
+        """(period key, role name, hours) in period order."""
+        for key, role_names in sorted(period_summary.items()):
+            for role_name, total_time in role_names.items():
+                yield key, role_name, total_time / HOUR
+
+    def summarize(
+        self,
+        period: str,
+        project: Union[Project, ProjectStream],
+        since: str = "",
+        until: str = "",
+    ) -> dict:
+        """Total time per period key and role of the project's closed entries.
+
+        Only entries starting in [since, until) are counted when a bound is
+        given. A ProjectStream is aggregated as its entries are read, without
+        rollups. Entries compacted into ``archives`` are counted from the
+        archive's day totals.
+        """
+        summary = self._summarize_entries(period, project, since, until)
+        if self.archives is None:
+            return summary
+        archived = self._archived(period, project.name, since, until)
+        self._merge(archived, summary)
+        return archived
+
+    def _summarize_entries(
+        self,
+        period: str,
+        project: Union[Project, ProjectStream],
+        since: str,
+        until: str,
+    ) -> dict:
+        if since or until:
+            project = ProjectStream(
+                project.name,
+                project.roles,
+                in_range(project.time_entries, since, until),
+            )
+        # rollups are kept per period name, one for every parameterised
+        # period ("custom:…", "fiscal-weekly:N") would pile up forever
+        if self.rollups is None or isinstance(project, ProjectStream) or ":" in period:
+            return self._aggregate(period, project)
+
+        # closed entries are folded into a persisted rollup, entries still
+        # open are kept pending and folded once closed
+        time_entries = project.time_entries
+        rollups = self.rollups.load(project.name)
+        rollup = rollups.get(period, {})
+        folded = rollup.get("folded", 0)
+        if not self._is_valid(rollup, time_entries):
+            folded, rollup = 0, {}
+
+        summary = {
+            key: {
+                role_name: timedelta(microseconds=microseconds)
+                for role_name, microseconds in role_names.items()
+            }
+            for key, role_names in rollup.get("totals", {}).items()
+        }
+        closed = [
+            time_entries[index]
+            for index, _, _ in rollup.get("pending", [])
+            if time_entries[index].is_closed()
+        ]
+        if not closed and folded == len(time_entries):
+            return summary
+
+        if closed:
+            closed_project = replace(project, time_entries=type(time_entries)(closed))
+            self._merge(summary, self._aggregate(period, closed_project))
+        new_project = replace(project, time_entries=time_entries[folded:])
+        self._merge(summary, self._aggregate(period, new_project))
+        open_rows = sorted(project.open_timers().values())
+        rollups[period] = {
+            "folded": len(time_entries),
+            "checksum": self._checksum(time_entries, len(time_entries), open_rows),
+            "pending": [
+                [index, time_entries[index].role_name, time_entries[index].start_time]
+                for index in open_rows
+            ],
+            "totals": {
+                key: {
+                    role_name: total_time // MICROSECOND
+                    for role_name, total_time in role_names.items()
+                }
+                for key, role_names in summary.items()
+            },
+        }
+        self.rollups.save(project.name, rollups)
+        return summary
+
+    def _aggregate(self, period: str, project: Union[Project, ProjectStream]) -> dict:
+        with phase("summarize.aggregate") as record:
+            record["engine"] = type(self.engine).__name__ if self.engine else "python"
+            if not isinstance(project, ProjectStream):
+                record["entries"] = len(project.time_entries)
+            return self._aggregate_totals(period, project)
+
+    def _aggregate_totals(
+        self, period: str, project: Union[Project, ProjectStream]
+    ) -> dict:
+        calendar = get_period(period)
+        if self.engine is not None:
+            return self.engine.summarize(calendar, project)
+
+        keys: dict = {}
+        totals: defaultdict = defaultdict(lambda: defaultdict(int))
+
+        for role_name, day, microseconds in _closed_spans(project):
+            try:
+                key = keys[day]
+            except KeyError:
+                key = keys[day] = calendar.key(day)
+            if key is not None:
+                totals[key][role_name] += microseconds
+
+        return {
+            key: {
+                role_name: timedelta(microseconds=microseconds)
+                for role_name, microseconds in role_names.items()
+            }
+            for key, role_names in totals.items()
+        }
+
+    def _archived(self, period: str, project_name: str, since: str, until: str) -> dict:
+        calendar = get_period(period)
+        summary: dict = {}
+        day_totals = self.archives.day_totals(project_name, since, until)
+        for day, role_names in sorted(day_totals.items()):
+            key = calendar.key(to_day(date.fromisoformat(day)))
+            if key is None:
+                continue
+            totals = summary.setdefault(key, {})
+            for role_name, microseconds in role_names.items():
+                totals[role_name] = totals.get(role_name, timedelta()) + timedelta(
+                    microseconds=microseconds
+                )
+        return summary
+
+    def _merge(self, summary: dict, other: dict) -> None:
+        for key, role_names in other.items():
+            totals = summary.setdefault(key, {})
+            for role_name, total_time in role_names.items():
+                totals[role_name] = totals.get(role_name, timedelta()) + total_time
+
+    def _is_valid(self, rollup: dict, time_entries) -> bool:
+        """Whether a rollup was folded from the entries' first rows.
+
+        Every folded entry's role, start and end goes into the checksum, so
+        an edit anywhere in the history drops the rollup. Entries that were
+        still open are hashed without their end and checked by start.
+        """
+        folded = rollup.get("folded", 0)
+        if folded > len(time_entries):
+            return False
+        pending = rollup.get("pending", [])
+        for index, role_name, start_time in pending:
+            if index >= folded or (
+                (time_entries[index].role_name, time_entries[index].start_time)
+                != (role_name, start_time)
+            ):
+                return False
+        open_rows = [index for index, _, _ in pending]
+        return rollup.get("checksum") == self._checksum(time_entries, folded, open_rows)
+
+    def _checksum(self, time_entries, stop: int, open_rows=()) -> str:
+        """CRC32 of the first ``stop`` entries, ``open_rows`` without an end."""
+        if isinstance(time_entries, CompactTimeEntries):
+            return f"compact:{time_entries.checksum(stop, open_rows)}"
+        open_rows = set(open_rows)
+        crc = 0
+        for index, te in enumerate(time_entries[:stop]):
+            end_time = "" if index in open_rows else te.end_time
+            row = f"{te.role_name}\x1f{te.start_time}\x1f{end_time}\x1e"
+            crc = zlib.crc32(row.encode(), crc)
+        return f"text:{crc}"
+
+
+def _closed_spans(
+    project: Union[Project, ProjectStream],
+) -> Iterator[tuple[str, int, int]]:
+    """Yield (role name, start day since the epoch, duration in microseconds)."""
+    time_entries = project.time_entries
+    if isinstance(time_entries, CompactTimeEntries):
+        # columns are already epoch microseconds, nothing to parse
+        for role_name, start, end in time_entries.closed_spans():
+            yield role_name, start // DAY_TICKS, end - start
+        return
+
+    for time_entry in time_entries:
+        if time_entry.is_closed():
+            start = datetime.fromisoformat(time_entry.start_time)
+            end = datetime.fromisoformat(time_entry.end_time)
+            day = start.toordinal() - EPOCH_ORDINAL
+            yield time_entry.role_name, day, (end - start) // MICROSECOND
+
+
+# an hour in microseconds: earnings are summed as hourly cents times
+# microseconds, and dividing a sum by this gives cents
+MICROSECONDS_PER_HOUR = 3600 * 10**6
+
+
+def hourly_cents(hourly_rate) -> int:
+    """Exact cents of an hourly rate, whether it was stored as int or float."""
+    return int((Decimal(str(hourly_rate)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def to_cents(cent_microseconds: int) -> int:
+    """Round a sum of rate-cents times microseconds to whole cents."""
+    return (cent_microseconds + MICROSECONDS_PER_HOUR // 2) // MICROSECONDS_PER_HOUR
+
+
+def format_cents(cents: int) -> str:
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+class SummarizeEarnings:
+    """Earnings per period, project and vault, from the roles' hourly rates.
+
+    Every project is loaded once and its entries are bucketed and priced in
+    the same pass, with a role name to rate index built per project. Sums
+    are kept exact as integer rate-cents times microseconds and every total
+    is rounded to whole cents once, at the end. ``open_vault`` is called
+    with a vault path and project name.
+    """
+
+    fields = ("section", "name", "cents")
+
+    def __init__(self, open_vault: Callable[[str, str], VaultAdapter]):
+        self.open_vault = open_vault
+
+    def execute(
+        self, period: str, projects: dict, title: str, file_format: str = "text"
+    ) -> None:
+        if not is_period(period):
+            print("Invalid period")
+            return
+
+        earnings = self.summarize(period, projects)
+        if file_format != "text":
+            write_records(self.rows(earnings), self.fields, file_format, sys.stdout)
+            return
+
+        print(f"{period} earnings for {title}")
+        for section in ("periods", "projects", "vaults"):
+            print(f"\n{section.capitalize()}:")
+            for name, cents in sorted(earnings[section].items()):
+                print(f"  {name}: {format_cents(cents)}")
+        print(f"\nTotal: {format_cents(earnings['total'])}")
+
+    def summarize(self, period: str, projects: dict) -> dict:
+        """Cents earned per period key, project name and vault path.
+
+        ``projects`` maps project names to the vault path they live in.
+        """
+        periods: defaultdict = defaultdict(int)
+        project_totals: defaultdict = defaultdict(int)
+        vault_totals: defaultdict = defaultdict(int)
+        for project_name, directory in projects.items():
+            vault = self.open_vault(directory, project_name)
+            project = _load_from(vault, project_name)
+            earnings = self.project_earnings(period, project, ArchiveStore(directory))
+            for key, amount in earnings.items():
+                periods[key] += amount
+                project_totals[project_name] += amount
+                vault_totals[directory] += amount
+
+        return {
+            "periods": {key: to_cents(amount) for key, amount in periods.items()},
+            "projects": {
+                name: to_cents(amount) for name, amount in project_totals.items()
+            },
+            "vaults": {path: to_cents(amount) for path, amount in vault_totals.items()},
+            "total": to_cents(sum(periods.values())),
+        }
+
+    def rows(self, earnings: dict) -> Iterator[tuple]:
+        """(section, name, cents) of every total, the grand total last."""
+        for section in ("periods", "projects", "vaults"):
+            for name, cents in sorted(earnings[section].items()):
+                yield section, name, cents
+        yield "total", "", earnings["total"]
+
+    def project_earnings(
+        self, period: str, project: Project, archives: Optional[ArchiveStore] = None
+    ) -> dict:
+        """Rate-cents times microseconds per period key, exact.
+
+        Entries compacted into ``archives`` are priced from its day totals.
+        """
+        rates: dict = {}
+        for role in project.roles:
+            rates.setdefault(role.name, hourly_cents(role.hourly_rate))
+
+        calendar = get_period(period)
+        keys: dict = {}
+        totals: defaultdict = defaultdict(int)
+        with phase("earnings.aggregate") as record:
+            record["entries"] = len(project.time_entries)
+            for role_name, day, microseconds in _closed_spans(project):
+                try:
+                    key = keys[day]
+                except KeyError:
+                    key = keys[day] = calendar.key(day)
+                if key is not None:
+                    totals[key] += microseconds * rates.get(role_name, 0)
+            if archives is not None:
+                day_totals = archives.day_totals(project.name)
+                for day, role_names in day_totals.items():
+                    key = calendar.key(to_day(date.fromisoformat(day)))
+                    if key is None:
+                        continue
+                    for role_name, microseconds in role_names.items():
+                        totals[key] += microseconds * rates.get(role_name, 0)
+        return totals
+
+
+def _load_from(vault: VaultAdapter, project_name: str) -> Project:
+    """Load a project, closing the connection of a SQLite vault after."""
+    if isinstance(vault, SqliteVault):
+        with vault:
+            return vault.load(project_name)
+    return vault.load(project_name)
+
+
+def summarize_project(
+    period: str,
+    project: Project,
+    engine=None,
+    vault_path: str = "",
+    use_rollups: bool = True,
+) -> tuple[str, dict]:
+    """Summarize one project, runs in SummarizeProjects' worker processes."""
+    rollups = RollupStore(vault_path) if vault_path and use_rollups else None
+    archives = ArchiveStore(vault_path) if vault_path else None
+    summary = SummarizeTime(engine, rollups, archives).summarize(period, project)
+    return project.name, summary
+
+
+class SummarizeProjects:
+    """Summarize many projects, possibly across vaults, into one report.
+
+    Projects are loaded in a thread pool and summarized in a process pool as
+    soon as they are loaded; the per-project summaries are merged by period
+    key. ``open_vault`` is called with a vault path and project name.
+    """
+
+    fields = ("period", "project", "role", "hours")
+
+    def __init__(
+        self,
+        open_vault: Callable[[str, str], VaultAdapter],
+        engine=None,
+        use_rollups: bool = True,
+        max_workers: Optional[int] = None,
+    ):
+        self.open_vault = open_vault
+        self.engine = engine
+        self.use_rollups = use_rollups
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def execute(
+        self, period: str, projects: dict, title: str, file_format: str = "text"
+    ) -> None:
+        if not is_period(period):
+            print("Invalid period")
+            return
+
+        period_summary = self.summarize(period, projects)
+        if file_format != "text":
+            write_records(
+                self.rows(period_summary), self.fields, file_format, sys.stdout
+            )
+            return
+
+        print(f"{period} summary for {title}")
+        for key, project_names in sorted(period_summary.items()):
+            print(f"\n{key}:")
+            for project_name, role_names in sorted(project_names.items()):
+                for role_name, total_time in role_names.items():
+                    total_hours = total_time.total_seconds() / 3600
+                    print(f"  {project_name}/{role_name}: {total_hours:.2f}")
+
+    def rows(self, period_summary: dict) -> Iterator[tuple]:
+        """(period key, project name, role name, hours) in period order."""
+        for key, project_names in sorted(period_summary.items()):
+            for project_name, role_names in sorted(project_names.items()):
+                for role_name, total_time in role_names.items():
+                    yield key, project_name, role_name, total_time / HOUR
+
+    def summarize(self, period: str, projects: dict) -> dict:
+        """Total time per period key, project and role.
+
+        ``projects`` maps project names to the vault path they live in.
+        """
+        period_summary: dict = {}
+        for project_name, summary in self._project_summaries(period, projects):
+            for key, role_names in summary.items():
+                period_summary.setdefault(key, {})[project_name] = role_names
+        return period_summary
+
+    def _project_summaries(self, period: str, projects: dict) -> Iterator:
+        # imported here, the pools aren't needed by the hot CLI commands
+        from concurrent.futures import (
+            ProcessPoolExecutor,
+            ThreadPoolExecutor,
+            as_completed,
+        )
+
+        io_workers = min(len(projects), 4 * self.max_workers) or 1
+        with ThreadPoolExecutor(io_workers) as loaders:
+            loading = {
+                loaders.submit(self._load, vault_path, project_name): vault_path
+                for project_name, vault_path in projects.items()
+            }
+            if len(projects) < 2 or self.max_workers < 2:
+                for future in as_completed(loading):
+                    yield summarize_project(period, *self._task(future, loading))
+                return
+
+            with ProcessPoolExecutor(self.max_workers) as workers:
+                summarizing = [
+                    workers.submit(
+                        summarize_project, period, *self._task(future, loading)
+                    )
+                    for future in as_completed(loading)
+                ]
+                for future in summarizing:
+                    yield future.result()
+
+    def _load(self, vault_path: str, project_name: str) -> Project:
+        return _load_from(self.open_vault(vault_path, project_name), project_name)
+
+    def _task(self, future, loading: dict) -> tuple:
+        return future.result(), self.engine, loading[future], self.use_rollups